@@ -0,0 +1,4 @@
+"""
+Offline benchmarks for the RAG Chatbot. Run from the repository root, e.g.
+python -m benchmarks.async_chat
+"""
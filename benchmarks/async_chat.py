@@ -0,0 +1,79 @@
+"""
+Throughput of N concurrent chats against stubbed backends, comparing the blocking
+RAGService called from the event loop (the old /chat/ behaviour) with AsyncRAGService,
+with and without query micro-batching, and counting the embed and search calls made.
+
+Usage: python -m benchmarks.async_chat [--concurrency 50] [--generate-latency 0.2]
+"""
+import argparse
+import asyncio
+import time
+from benchmarks.stubs import FakeCohereManager, AsyncFakeCohereManager, FakeQdrantManager, AsyncFakeQdrantManager
+from config import Config
+from rag_service import RAGService, AsyncRAGService
+
+
+def seed(qdrant_manager: FakeQdrantManager):
+    FakeQdrantManager.insert_vectors(
+        qdrant_manager,
+        vectors=[[0.0]] * 5,
+        payloads=[{"content": f"Passage {i}", "source": "bench.txt"} for i in range(5)],
+        ids=[str(i) for i in range(5)],
+    )
+
+
+async def run_blocking_service(concurrency: int, embed_latency: float, generate_latency: float):
+    cohere_manager = FakeCohereManager(embed_latency, generate_latency)
+    qdrant_manager = FakeQdrantManager()
+    seed(qdrant_manager)
+    service = RAGService(qdrant_manager, cohere_manager, cohere_manager)
+
+    async def handler(i: int):
+        # Mirrors the previous endpoint: a blocking call made directly inside an async handler
+        return service.retrieve_and_generate(f"question {i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(handler(i) for i in range(concurrency)))
+    return time.perf_counter() - start, cohere_manager.embed_calls, qdrant_manager.search_calls
+
+
+async def run_async_service(concurrency: int, embed_latency: float, generate_latency: float, batching: bool = False):
+    Config.QUERY_BATCHING = batching
+    cohere_manager = AsyncFakeCohereManager(embed_latency, generate_latency)
+    qdrant_manager = AsyncFakeQdrantManager()
+    seed(qdrant_manager)
+    service = AsyncRAGService(qdrant_manager, cohere_manager, cohere_manager)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(service.retrieve_and_generate(f"question {i}") for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    service.close()
+    return elapsed, cohere_manager.embed_calls, qdrant_manager.search_calls
+
+
+async def run_batched_service(concurrency: int, embed_latency: float, generate_latency: float):
+    return await run_async_service(concurrency, embed_latency, generate_latency, batching=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--generate-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{args.concurrency} concurrent chats, embed {args.embed_latency * 1000:.0f} ms, "
+          f"generate {args.generate_latency * 1000:.0f} ms")
+    runners = (
+        ("blocking RAGService", run_blocking_service),
+        ("AsyncRAGService", run_async_service),
+        ("+ query batching", run_batched_service),
+    )
+    for name, runner in runners:
+        elapsed, embed_calls, search_calls = asyncio.run(runner(args.concurrency, args.embed_latency, args.generate_latency))
+        print(f"  {name:<20} {elapsed:7.2f} s  {args.concurrency / elapsed:8.1f} chats/s  "
+              f"{embed_calls:>4} embed calls  {search_calls:>4} search calls")
+
+
+if __name__ == "__main__":
+    main()
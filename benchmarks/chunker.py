@@ -0,0 +1,117 @@
+"""
+Chunking throughput and memory on multi-MB inputs: the original character-walking
+_split_text against the single-pass Chunker (offsets only, and with text materialized).
+
+Usage: python -m benchmarks.chunker [--megabytes 8] [--seed 0]
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from chunker import Chunker, CharTokenizer, RegexTokenizer
+from config import Config
+
+WORDS = ("retrieval augmented generation vector database embedding chunk overlap query answer "
+         "document context model latency token budget sentence paragraph boundary").split()
+
+
+def legacy_split_text(text: str, chunk_size: int, chunk_overlap: int):
+    """
+    The chunker DocumentProcessor shipped with before the Chunker rewrite, kept for comparison
+    """
+    if len(text) <= chunk_size:
+        return [text]
+
+    chunks = []
+    start = 0
+
+    while start < len(text):
+        end = start + chunk_size
+
+        if end < len(text) and chunk_overlap > 0:
+            chunk_text = text[start:end]
+
+            for i in range(min(chunk_overlap, len(chunk_text)), 0, -1):
+                if chunk_text[-i] in '.!?;':
+                    end = start + len(chunk_text) - i
+                    break
+                elif chunk_text[-i] == '\n':
+                    end = start + len(chunk_text) - i
+                    break
+
+            chunks.append(text[start:end])
+            start = end - chunk_overlap
+        else:
+            chunks.append(text[start:end])
+            start = end
+
+    return [chunk.strip() for chunk in chunks if chunk.strip()]
+
+
+def make_corpus(megabytes: float, seed: int, punctuated: bool = True) -> str:
+    """
+    Synthetic prose of the given size; without punctuation it is one long run of words,
+    the worst case for break-point search
+    """
+    if not punctuated:
+        rng = random.Random(seed)
+        return " ".join(rng.choice(WORDS) for _ in range(int(megabytes * 1024 * 1024 / 8)))
+
+    rng = random.Random(seed)
+    target = int(megabytes * 1024 * 1024)
+    paragraphs = []
+    size = 0
+    while size < target:
+        sentences = []
+        for _ in range(rng.randint(2, 8)):
+            words = [rng.choice(WORDS) for _ in range(rng.randint(6, 30))]
+            sentences.append(" ".join(words).capitalize() + rng.choice(".!?;"))
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def measure(func):
+    """
+    Time one untraced run, then measure peak allocations in a second, traced run
+    """
+    start = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megabytes", type=float, default=8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    char_chunker = Chunker(Config.CHUNK_SIZE, Config.CHUNK_OVERLAP, CharTokenizer())
+    # Roughly the same chunk size expressed in words and punctuation instead of characters
+    token_chunker = Chunker(Config.CHUNK_SIZE // 5, Config.CHUNK_OVERLAP // 5, RegexTokenizer())
+
+    for corpus in ("punctuated", "unpunctuated"):
+        text = make_corpus(args.megabytes, args.seed, punctuated=corpus == "punctuated")
+        cases = (
+            ("legacy _split_text", lambda: len(legacy_split_text(text, Config.CHUNK_SIZE, Config.CHUNK_OVERLAP))),
+            ("Chunker offsets", lambda: len(char_chunker.split(text))),
+            ("Chunker + text", lambda: len([text[s.start:s.end] for s in char_chunker.split(text)])),
+            ("Chunker regex tokens", lambda: len(token_chunker.split(text))),
+        )
+
+        print(f"{corpus}: {len(text) / 1024 / 1024:.1f} MB input, chunk size {Config.CHUNK_SIZE}, "
+              f"overlap {Config.CHUNK_OVERLAP}")
+        print(f"  {'implementation':<22} {'chunks':>8} {'seconds':>8} {'chunks/s':>10} {'peak MB':>8}")
+        for name, func in cases:
+            count, elapsed, peak = measure(func)
+            print(f"  {name:<22} {count:>8} {elapsed:>8.2f} {count / elapsed:>10.0f} {peak / 1024 / 1024:>8.1f}")
+
+if __name__ == "__main__":
+    main()
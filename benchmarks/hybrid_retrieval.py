@@ -0,0 +1,217 @@
+"""
+Recall and latency of dense-only, BM25-only and hybrid (RRF-fused) retrieval against an
+in-memory Qdrant collection built with the production schema.
+
+Two query sets are generated from the corpus: "keyword" queries name an identifier that
+occurs in exactly one chunk (a part number, error code or rare name), and "descriptive"
+queries are a run of words taken from one chunk. Recall@k counts the queries whose source
+chunk is among the top k results.
+
+Dense vectors come from a hashed bag-of-words embedder that, like real embedding models,
+carries topic words well but not opaque identifiers; pass --cohere to embed with Cohere instead.
+
+Usage: python -m benchmarks.hybrid_retrieval [--corpus DIR] [--documents 2000] [--queries 200] [--cohere]
+"""
+import argparse
+import os
+import random
+import re
+import statistics
+import time
+import warnings
+import zlib
+from typing import List, Tuple
+from qdrant_client import QdrantClient, models
+from config import Config
+from document_processor import DocumentProcessor
+from qdrant_manager import QdrantManager, collection_params
+from rag_service import build_records
+from sparse_encoder import BM25Encoder, tokenize
+
+TOPICS = {
+    "pump": "pump impeller flow pressure seal bearing valve coolant outlet inlet".split(),
+    "network": "router switch packet latency firewall subnet gateway bandwidth vlan dns".split(),
+    "billing": "invoice payment refund customer account balance charge credit statement tax".split(),
+    "battery": "battery cell charge voltage thermal capacity discharge module lithium fuse".split(),
+    "printer": "printer toner paper tray jam cartridge spool driver nozzle feed".split(),
+}
+FILLER = "the unit should be checked when operators report that it stops during normal operation".split()
+IDENTIFIER = re.compile(r"[0-9a-z]*\d[0-9a-z]*(?:[-_.:/][0-9a-z]+)+|[a-z]+\d+[0-9a-z]*")
+
+
+class HashedBagOfWordsEmbedder:
+    """
+    Deterministic stand-in for an embedding model: hashed word counts, ignoring tokens that contain
+    digits, so similar wording maps to nearby vectors but identifiers carry no signal
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def embed_texts(self, texts: List[str], input_type: str = "search_document") -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, query: str) -> List[float]:
+        return self._embed(query)
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.dim
+        for word in re.findall(r"[a-z]+", text.lower()):
+            if not any(c.isdigit() for c in word):
+                vector[zlib.crc32(word.encode("utf-8")) % self.dim] += 1.0
+        norm = sum(v * v for v in vector) ** 0.5 or 1.0
+        return [v / norm for v in vector]
+
+
+def make_vocabulary(size: int, rng: random.Random) -> List[str]:
+    """Pronounceable pseudo-words standing in for the long tail of a real vocabulary"""
+    syllables = [c + v for c in "bcdfghklmnprstvz" for v in "aeiou"]
+    return sorted({"".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(size)})
+
+
+def synthetic_chunks(documents: int, seed: int) -> List[str]:
+    """
+    Short maintenance notes: topic prose with a Zipf-distributed long-tail vocabulary, plus a
+    part number and an error code unique to each note
+    """
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(5000, rng)
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    chunks = []
+    for i in range(documents):
+        topic = rng.choice(list(TOPICS))
+        length = rng.randint(40, 120)
+        words = [rng.choice(TOPICS[topic] + FILLER) for _ in range(length // 2)]
+        words += rng.choices(vocabulary, weights, k=length - len(words))
+        rng.shuffle(words)
+        part_number = f"{topic[:2].upper()}-{rng.randint(10000, 99999)}-{rng.choice('ABCDEFGH')}"
+        error_code = f"E{i:05d}"
+        words.insert(rng.randrange(len(words)), part_number)
+        words.insert(rng.randrange(len(words)), f"error {error_code}")
+        chunks.append(" ".join(words).capitalize() + ".")
+    return chunks
+
+
+def corpus_chunks(path: str) -> List[str]:
+    """
+    Chunk every PDF/TXT file under path exactly as ingestion would
+    """
+    processor = DocumentProcessor()
+    chunks = []
+    for root, _, files in os.walk(path):
+        for name in sorted(files):
+            if name.lower().endswith((".pdf", ".txt")):
+                chunks.extend(processor.iter_chunks(os.path.join(root, name), name))
+    return chunks
+
+
+def make_queries(chunks: List[str], count: int, seed: int) -> Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]:
+    """
+    Build (query, index of the chunk it came from) pairs for the keyword and descriptive query sets
+    """
+    rng = random.Random(seed)
+    occurrences = {}
+    for index, chunk in enumerate(chunks):
+        for term in set(IDENTIFIER.findall(chunk.lower())):
+            occurrences.setdefault(term, []).append(index)
+    unique_identifiers = [(term, indices[0]) for term, indices in occurrences.items() if len(indices) == 1]
+    rng.shuffle(unique_identifiers)
+    keyword = [(f"What does {term} refer to?", index) for term, index in unique_identifiers[:count]]
+
+    descriptive = []
+    for index in rng.sample(range(len(chunks)), min(count, len(chunks))):
+        words = [word for word in chunks[index].split() if not any(c.isdigit() for c in word)]
+        if len(words) >= 12:
+            start = rng.randrange(len(words) - 11)
+            descriptive.append((" ".join(words[start:start + 12]), index))
+    return keyword, descriptive
+
+
+def sparse_search(client: QdrantClient, collection_name: str, sparse_query, limit: int):
+    indices, values = sparse_query
+    return client.query_points(
+        collection_name=collection_name,
+        query=models.SparseVector(indices=indices, values=values),
+        using=Config.SPARSE_VECTOR_NAME,
+        limit=limit,
+        with_payload=True
+    ).points
+
+
+def evaluate(qdrant_manager: QdrantManager, embedder, encoder: BM25Encoder, queries, ids: List[str], k: int):
+    """
+    Return {mode: (recall@k, latencies in ms)} for the three retrieval modes
+    """
+    results = {}
+    for mode in ("dense", "sparse", "hybrid"):
+        hits = 0
+        latencies = []
+        for query, index in queries:
+            start = time.perf_counter()
+            if mode == "sparse":
+                points = sparse_search(qdrant_manager.client, qdrant_manager.collection_name, encoder.encode_query(query), k)
+            else:
+                query_vector = embedder.embed_query(query)
+                sparse_query = encoder.encode_query(query) if mode == "hybrid" else None
+                points = qdrant_manager.search_vectors(query_vector, limit=k, sparse_query=sparse_query)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits += any(str(point.id) == ids[index] for point in points)
+        results[mode] = (hits / max(len(queries), 1), latencies)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="Directory of PDF/TXT files (default: synthetic maintenance notes)")
+    parser.add_argument("--documents", type=int, default=2000, help="Synthetic notes to generate")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per query set")
+    parser.add_argument("--k", type=int, default=5, help="Results per query, as in retrieve_and_generate")
+    parser.add_argument("--cohere", action="store_true", help="Embed with Cohere instead of the offline embedder")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # Local mode ignores search_params (it always searches exactly)
+    warnings.filterwarnings("ignore", message="Local mode performs exact")
+
+    chunks = corpus_chunks(args.corpus) if args.corpus else synthetic_chunks(args.documents, args.seed)
+    keyword, descriptive = make_queries(chunks, args.queries, args.seed)
+
+    if args.cohere:
+        from cohere_manager import CohereManager
+        embedder = CohereManager()
+    else:
+        embedder = HashedBagOfWordsEmbedder(Config.EMBEDDING_DIMENSION)
+    encoder = BM25Encoder()
+
+    # The benchmark always compares all three modes, whatever HYBRID_SEARCH is set to
+    Config.HYBRID_SEARCH = True
+    qdrant_manager = QdrantManager(QdrantClient(":memory:"))
+    qdrant_manager.sparse_enabled = True
+    qdrant_manager.client.create_collection(collection_name=qdrant_manager.collection_name, **collection_params())
+
+    records = list(build_records(chunks, "benchmark", encoder))
+    ids = [point_id for point_id, _, _ in records]
+    start = time.perf_counter()
+    for offset in range(0, len(records), Config.EMBED_BATCH_SIZE):
+        batch = records[offset:offset + Config.EMBED_BATCH_SIZE]
+        qdrant_manager.insert_vectors(
+            embedder.embed_texts([payload["content"] for _, payload, _ in batch]),
+            [payload for _, payload, _ in batch],
+            [point_id for point_id, _, _ in batch],
+            [sparse_vector for _, _, sparse_vector in batch]
+        )
+    print(f"{len(chunks)} chunks indexed in {time.perf_counter() - start:.1f}s, "
+          f"{sum(len(tokenize(chunk)) for chunk in chunks) / max(len(chunks), 1):.0f} BM25 terms per chunk on average")
+
+    for name, queries in (("keyword", keyword), ("descriptive", descriptive)):
+        print(f"{name}: {len(queries)} queries, recall@{args.k}")
+        print(f"  {'mode':<8} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8}")
+        for mode, (recall, latencies) in evaluate(qdrant_manager, embedder, encoder, queries, ids, args.k).items():
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0.0
+            p50 = statistics.median(latencies) if latencies else 0.0
+            print(f"  {mode:<8} {recall:>7.1%} {p50:>8.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,360 @@
+"""
+Offline load test of the API server. Each scenario runs the FastAPI app in-process, in a fresh
+process of its own, against Qdrant in :memory: mode and deterministic Cohere/Gemini stubs with
+configurable latency, and drives it with concurrent requests over an in-process ASGI transport.
+
+Scenarios:
+  chat         concurrent /chat/ requests against a seeded collection
+  chat_stream  concurrent /chat/stream requests (latency to first byte is reported too)
+  upload       concurrent /upload/ requests of synthetic text documents, each timed until its
+               background job has indexed it (INGEST_WORKERS sets how many run at once)
+  mixed        chats while documents are being uploaded
+
+For each scenario p50/p95/p99 latency, throughput, peak RSS and the mean time per pipeline stage
+are printed and, with --output, written as JSON. With --baseline, a previous JSON result is
+compared against and the exit status is 1 if any scenario's p95 latency or throughput regressed
+by more than --tolerance. Server settings (QUERY_BATCHING, RERANKER, ...) come from the environment
+as usual; with VECTOR_STORE=local the embedded index (in a temporary directory) replaces Qdrant.
+Qdrant's :memory: mode searches in Python, so absolute search times are higher than against a
+server; compare runs with each other, not with production.
+
+Usage: python -m benchmarks.load_test [--scenarios chat,upload] [--requests 200] [--concurrency 20]
+                                      [--output results.json] [--baseline previous.json]
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import platform
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional
+
+SCENARIOS = ("chat", "chat_stream", "upload", "mixed")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of values (0.0 if there are none)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Latency percentiles in milliseconds"""
+    return {
+        "p50": round(1000 * percentile(latencies, 50), 2),
+        "p95": round(1000 * percentile(latencies, 95), 2),
+        "p99": round(1000 * percentile(latencies, 99), 2),
+        "max": round(1000 * max(latencies, default=0.0), 2),
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MiB, or None where the resource module is missing"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def make_documents(count: int, size_kb: int, seed: int) -> List[bytes]:
+    """Synthetic maintenance notes joined into text documents of about size_kb each"""
+    from benchmarks.hybrid_retrieval import synthetic_chunks
+    notes = synthetic_chunks(max(count * size_kb * 2, 1), seed)
+    documents = []
+    position = 0
+    for _ in range(count):
+        parts = []
+        length = 0
+        while length < size_kb * 1024:
+            note = notes[position % len(notes)]
+            position += 1
+            parts.append(note)
+            length += len(note) + 2
+        documents.append("\n\n".join(parts).encode("utf-8"))
+    return documents
+
+
+def make_questions(documents: List[bytes], count: int, seed: int) -> List[str]:
+    """Distinct questions built from words of the documents, so every chat retrieves something"""
+    rng = random.Random(seed)
+    words = [word for document in documents for word in document.decode("utf-8").split() if word.isalpha()]
+    return [f"Question {i}: what about the {' '.join(rng.sample(words, 3))}?" for i in range(count)]
+
+
+def stage_totals() -> Dict[str, List[float]]:
+    """Current {pipeline.stage: [seconds, observations]} of the stage histogram"""
+    from metrics import STAGE_SECONDS
+    totals = {}
+    for metric in STAGE_SECONDS.collect():
+        for sample in metric.samples:
+            if sample.name.endswith(("_sum", "_count")):
+                key = f"{sample.labels['pipeline']}.{sample.labels['stage']}"
+                totals.setdefault(key, [0.0, 0.0])[sample.name.endswith("_count")] = sample.value
+    return totals
+
+
+def stage_means(before: Dict[str, List[float]], after: Dict[str, List[float]]) -> Dict[str, float]:
+    """Mean milliseconds per observation of each stage between two stage_totals snapshots"""
+    means = {}
+    for key, (seconds, count) in sorted(after.items()):
+        seconds -= before.get(key, [0.0, 0.0])[0]
+        count -= before.get(key, [0.0, 0.0])[1]
+        if count:
+            means[key] = round(1000 * seconds / count, 3)
+    return means
+
+
+class StubClientRegistry:
+    """ClientRegistry stand-in: in-memory Qdrant and stub providers in place of the pooled clients"""
+
+    def __init__(self, options: dict):
+        from qdrant_client import AsyncQdrantClient
+        from benchmarks.stubs import AsyncFakeCohereManager
+        from config import Config
+        from job_queue import IngestionQueue
+        from local_vector_store import AsyncLocalVectorStore, LocalVectorStore
+        from qdrant_manager import AsyncQdrantManager
+        from rag_service import AsyncRAGService
+        from vector_store import DeferredVectorStore
+
+        if Config.VECTOR_STORE == "local":
+            self.qdrant = None
+            self.index_dir = tempfile.TemporaryDirectory(prefix="load_test_index_")
+            store = AsyncLocalVectorStore(LocalVectorStore(self.index_dir.name))
+        else:
+            self.qdrant = AsyncQdrantClient(location=":memory:")
+            store = AsyncQdrantManager(self.qdrant)
+
+        async def open_store():
+            await store.create_collection()
+            return store
+
+        self.qdrant_manager = DeferredVectorStore(open_store)
+        self.cohere_manager = AsyncFakeCohereManager(options["embed_latency"], options["generate_latency"])
+        self.gemini_manager = AsyncFakeCohereManager(options["embed_latency"], options["generate_latency"])
+        self.rag_service = AsyncRAGService(self.qdrant_manager, self.cohere_manager, self.gemini_manager)
+        self.ingestion_queue = IngestionQueue(self.rag_service)
+
+    def start(self):
+        self.qdrant_manager.open()
+        self.ingestion_queue.start()
+
+    async def close(self):
+        await self.ingestion_queue.close()
+        self.rag_service.close()
+        await self.qdrant_manager.close()
+        if self.qdrant is not None:
+            await self.qdrant.close()
+        else:
+            self.index_dir.cleanup()
+
+
+async def drive(calls: List[Callable[[], Awaitable[dict]]], concurrency: int) -> dict:
+    """
+    Run the calls with at most concurrency in flight; each returns its timings in seconds
+    ({"latency": ..., optionally "ttfb": ...}) and raises on a failed request
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    timings: List[dict] = []
+    errors = 0
+
+    async def run(call):
+        nonlocal errors
+        async with semaphore:
+            try:
+                timings.append(await call())
+            except Exception:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(call) for call in calls))
+    elapsed = time.perf_counter() - start
+    result = {
+        "requests": len(calls),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(timings) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize([timing["latency"] for timing in timings]),
+    }
+    ttfb = [timing["ttfb"] for timing in timings if "ttfb" in timing]
+    if ttfb:
+        result["ttfb_ms"] = summarize(ttfb)
+    return result
+
+
+async def run_workload(scenario: str, options: dict) -> dict:
+    import httpx
+    import main
+    from benchmarks.stubs import EMBEDDING_DIM
+    from config import Config
+
+    Config.EMBEDDING_DIMENSION = EMBEDDING_DIM
+    main.ClientRegistry = lambda: StubClientRegistry(options)
+
+    documents = make_documents(options["documents"], options["document_kb"], options["seed"])
+    questions = make_questions(documents, options["requests"], options["seed"])
+    uploads = make_documents(options["requests"], options["document_kb"], options["seed"] + 1)
+
+    async def chat(question: str) -> dict:
+        start = time.perf_counter()
+        response = await client.post("/chat/", json={"message": question})
+        response.raise_for_status()
+        return {"latency": time.perf_counter() - start}
+
+    async def chat_stream(question: str) -> dict:
+        start = time.perf_counter()
+        ttfb = None
+        async with client.stream("POST", "/chat/stream", json={"message": question}) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+                if '"type": "error"' in line:
+                    raise Exception(line)
+        return {"latency": time.perf_counter() - start, "ttfb": ttfb or 0.0}
+
+    async def upload(index: int, document: bytes) -> dict:
+        start = time.perf_counter()
+        response = await client.post("/upload/", files={"file": (f"load-{index}.txt", document, "text/plain")})
+        response.raise_for_status()
+        # Latency is until the background job has indexed the document
+        job_id = response.json()["job_id"]
+        while True:
+            await asyncio.sleep(0.01)
+            job = (await client.get(f"/jobs/{job_id}")).json()
+            if job["status"] == "succeeded":
+                return {"latency": time.perf_counter() - start}
+            if job["status"] == "failed":
+                raise Exception(job["error"])
+
+    async with main.lifespan(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+            # Seed the collection outside the measured window
+            if scenario != "upload":
+                for index, document in enumerate(documents):
+                    await upload(-index - 1, document)
+
+            before = stage_totals()
+            if scenario == "chat":
+                result = await drive([lambda q=q: chat(q) for q in questions], options["concurrency"])
+            elif scenario == "chat_stream":
+                result = await drive([lambda q=q: chat_stream(q) for q in questions], options["concurrency"])
+            elif scenario == "upload":
+                calls = [lambda i=i, d=d: upload(i, d) for i, d in enumerate(uploads)]
+                result = await drive(calls, options["concurrency"])
+            else:
+                # One upload for every ten chats, each workload with its own concurrency budget
+                upload_count = max(1, len(questions) // 10)
+                chats, ingests = await asyncio.gather(
+                    drive([lambda q=q: chat(q) for q in questions], options["concurrency"]),
+                    drive([lambda i=i, d=d: upload(i, d) for i, d in enumerate(uploads[:upload_count])],
+                          max(1, options["concurrency"] // 10))
+                )
+                result = dict(chats, upload=ingests)
+            result["stages_ms"] = stage_means(before, stage_totals())
+    return result
+
+
+def run_scenario(scenario: str, options: dict) -> dict:
+    """Entry point of a scenario's process"""
+    import logging
+    import warnings
+    # Local mode ignores search_params (it always searches exactly) and payload indexes
+    warnings.filterwarnings("ignore", message="Local mode performs exact")
+    warnings.filterwarnings("ignore", message="Payload indexes have no effect")
+    logging.disable(logging.WARNING)
+    result = asyncio.run(run_workload(scenario, options))
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Describe every scenario whose p95 latency or throughput is worse than baseline by more than tolerance"""
+    regressions = []
+    for scenario, result in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if previous is None:
+            continue
+        p95, previous_p95 = result["latency_ms"]["p95"], previous["latency_ms"]["p95"]
+        if previous_p95 and p95 > previous_p95 * (1 + tolerance):
+            regressions.append(f"{scenario}: p95 {previous_p95:.1f} -> {p95:.1f} ms")
+        throughput, previous_throughput = result["throughput_rps"], previous["throughput_rps"]
+        if throughput < previous_throughput * (1 - tolerance):
+            regressions.append(f"{scenario}: throughput {previous_throughput:.1f} -> {throughput:.1f} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenarios to run")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="Stub embed call latency (s)")
+    parser.add_argument("--generate-latency", type=float, default=0.2, help="Stub generation latency (s)")
+    parser.add_argument("--documents", type=int, default=20, help="Documents seeded before chat scenarios")
+    parser.add_argument("--document-kb", type=int, default=16, help="Size of each synthetic document")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    options = {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "embed_latency": args.embed_latency,
+        "generate_latency": args.generate_latency,
+        "documents": args.documents,
+        "document_kb": args.document_kb,
+        "seed": args.seed,
+    }
+    results = {"options": options, "python": platform.python_version(), "scenarios": {}}
+
+    print(f"{args.requests} requests per scenario, concurrency {args.concurrency}, "
+          f"embed {args.embed_latency * 1000:.0f} ms, generate {args.generate_latency * 1000:.0f} ms")
+    print(f"  {'scenario':<12} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7} {'RSS MiB':>8}")
+    context = multiprocessing.get_context("spawn")
+    for scenario in scenarios:
+        # A fresh process per scenario keeps peak RSS and metrics from leaking between scenarios
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(run_scenario, scenario, options).result()
+        results["scenarios"][scenario] = result
+        latency = result["latency_ms"]
+        print(f"  {scenario:<12} {result['throughput_rps']:>8.1f} {latency['p50']:>9.1f} {latency['p95']:>9.1f} "
+              f"{latency['p99']:>9.1f} {result['errors']:>7} {result['peak_rss_mb'] or 0:>8.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("options") != options:
+            print("Note: the baseline was recorded with different options")
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
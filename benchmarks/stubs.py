@@ -0,0 +1,141 @@
+"""
+Deterministic stand-ins for the Cohere, Gemini and Qdrant managers with configurable latency
+"""
+import asyncio
+import hashlib
+import time
+from types import SimpleNamespace
+from typing import Any, Dict, List, Set
+
+EMBEDDING_DIM = 64
+
+
+def fake_embedding(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """
+    Derive a stable unit-length vector from the text so equal inputs embed identically
+    """
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    values = [(digest[i % len(digest)] - 127.5) / 127.5 for i in range(dim)]
+    norm = sum(v * v for v in values) ** 0.5
+    return [v / norm for v in values]
+
+
+class FakeCohereManager:
+    def __init__(self, embed_latency: float = 0.02, generate_latency: float = 0.2):
+        self.embed_latency = embed_latency
+        self.generate_latency = generate_latency
+        self.embed_calls = 0
+        self.embed_tokens = 0
+        self.generate_calls = 0
+
+    def embed_texts(self, texts: List[str], input_type: str = "search_document") -> List[List[float]]:
+        self.embed_calls += 1
+        self.embed_tokens += sum(len(text) // 4 for text in texts)
+        time.sleep(self.embed_latency)
+        return [fake_embedding(text) for text in texts]
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.embed_texts([query], input_type="search_query")[0]
+
+    def generate_response(self, prompt: str, history: List[dict] = None) -> str:
+        self.generate_calls += 1
+        time.sleep(self.generate_latency)
+        return f"Stub answer for a prompt of {len(prompt)} characters after {len(history or [])} turns"
+
+
+class AsyncFakeCohereManager(FakeCohereManager):
+    async def embed_texts(self, texts: List[str], input_type: str = "search_document") -> List[List[float]]:
+        self.embed_calls += 1
+        self.embed_tokens += sum(len(text) // 4 for text in texts)
+        await asyncio.sleep(self.embed_latency)
+        return [fake_embedding(text) for text in texts]
+
+    async def embed_query(self, query: str) -> List[float]:
+        return (await self.embed_texts([query], input_type="search_query"))[0]
+
+    async def generate_response(self, prompt: str, history: List[dict] = None) -> str:
+        self.generate_calls += 1
+        await asyncio.sleep(self.generate_latency)
+        return f"Stub answer for a prompt of {len(prompt)} characters after {len(history or [])} turns"
+
+    async def stream_response(self, prompt: str, history: List[dict] = None, tokens: int = 10):
+        self.generate_calls += 1
+        for i in range(tokens):
+            await asyncio.sleep(self.generate_latency / tokens)
+            yield f"token{i} "
+
+
+class FakeQdrantManager:
+    """
+    Keeps points in a dict and returns the first `limit` of them for every search
+    """
+
+    def __init__(self, search_latency: float = 0.005):
+        self.search_latency = search_latency
+        self.points: Dict[str, SimpleNamespace] = {}
+        self.search_calls = 0
+
+    def create_collection(self):
+        pass
+
+    def insert_vectors(self, vectors: List[List[float]], payloads: List[Dict[str, Any]], ids: List[str],
+                       sparse_vectors=None):
+        for point_id, vector, payload in zip(ids, vectors, payloads):
+            self.points[point_id] = SimpleNamespace(id=point_id, vector=vector, payload=payload, score=1.0)
+
+    def search_vectors(self, query_vector: List[float], limit: int = 5, sparse_query=None, filters=None):
+        self.search_calls += 1
+        time.sleep(self.search_latency)
+        return list(self.points.values())[:limit]
+
+    def search_batch(self, requests):
+        self.search_calls += 1
+        time.sleep(self.search_latency)
+        return [list(self.points.values())[:limit] for _, limit, _, _ in requests]
+
+    def get_source_point_ids(self, source: str, tenant: str = None) -> Set[str]:
+        return {point.id for point in self.points.values()
+                if point.payload.get("source") == source and point.payload.get("tenant") == tenant}
+
+    def set_payload(self, ids: List[str], payloads: List[Dict[str, Any]]):
+        for point_id, fields in zip(ids, payloads):
+            if point_id in self.points:
+                self.points[point_id].payload = {**self.points[point_id].payload, **fields}
+
+    def delete_points(self, ids: List[str]):
+        for point_id in ids:
+            self.points.pop(point_id, None)
+
+    def get_collection_info(self):
+        return SimpleNamespace(points_count=len(self.points))
+
+
+class AsyncFakeQdrantManager(FakeQdrantManager):
+    async def create_collection(self):
+        pass
+
+    async def insert_vectors(self, vectors: List[List[float]], payloads: List[Dict[str, Any]], ids: List[str],
+                             sparse_vectors=None):
+        FakeQdrantManager.insert_vectors(self, vectors, payloads, ids)
+
+    async def search_vectors(self, query_vector: List[float], limit: int = 5, sparse_query=None, filters=None):
+        self.search_calls += 1
+        await asyncio.sleep(self.search_latency)
+        return list(self.points.values())[:limit]
+
+    async def search_batch(self, requests):
+        self.search_calls += 1
+        await asyncio.sleep(self.search_latency)
+        return [list(self.points.values())[:limit] for _, limit, _, _ in requests]
+
+    async def get_source_point_ids(self, source: str, tenant: str = None) -> Set[str]:
+        return FakeQdrantManager.get_source_point_ids(self, source, tenant)
+
+    async def set_payload(self, ids: List[str], payloads: List[Dict[str, Any]]):
+        FakeQdrantManager.set_payload(self, ids, payloads)
+
+    async def delete_points(self, ids: List[str]):
+        FakeQdrantManager.delete_points(self, ids)
+
+    async def get_collection_info(self):
+        return SimpleNamespace(points_count=len(self.points))
@@ -0,0 +1,197 @@
+"""
+Bulk ingestion for the RAG Chatbot: index every PDF/TXT file in a directory or a
+zip/tar archive, with several documents in flight and a resumable checkpoint.
+
+Usage: python bulk_ingest.py PATH [--tenant NAME] [--workers 4] [--checkpoint FILE] [--report-every 10]
+"""
+import argparse
+import json
+import logging
+import os
+import posixpath
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Iterator, Optional, Set, Tuple
+from document_processor import is_supported
+from rag_service import RAGService
+
+logger = logging.getLogger("bulk_ingest")
+
+
+def iter_sources(path: str, spool_dir: str) -> Iterator[Tuple[str, Callable[[], Tuple[str, bool]]]]:
+    """
+    Yield (source name, open) for each supported document under path, where open() returns
+    (file path, is_temporary). Archive members are only extracted into spool_dir when opened,
+    so sources already in the checkpoint cost nothing.
+    """
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if is_supported(name):
+                    file_path = os.path.join(root, name)
+                    source = os.path.relpath(file_path, path).replace(os.sep, "/")
+                    yield source, lambda file_path=file_path: (file_path, False)
+    elif zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for member in archive.infolist():
+                if not member.is_dir() and is_supported(member.filename):
+                    yield posixpath.normpath(member.filename), \
+                        lambda member=member: (_spool(archive.open(member), member.filename, spool_dir), True)
+    elif tarfile.is_tarfile(path):
+        with tarfile.open(path) as archive:
+            for member in archive:
+                if member.isfile() and is_supported(member.name):
+                    yield posixpath.normpath(member.name), \
+                        lambda member=member: (_spool(archive.extractfile(member), member.name, spool_dir), True)
+    else:
+        raise ValueError(f"{path} is not a directory, zip or tar archive")
+
+
+def _spool(stream, name: str, spool_dir: str) -> str:
+    """Copy an archive member to a temporary file and return its path"""
+    with stream, tempfile.NamedTemporaryFile(dir=spool_dir, suffix=os.path.splitext(name)[1], delete=False) as temp_file:
+        shutil.copyfileobj(stream, temp_file)
+        return temp_file.name
+
+
+class Checkpoint:
+    """
+    Append-only record of sources that were fully indexed. Re-running with the same checkpoint
+    skips them, so an interrupted run resumes where it stopped.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[str] = set()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        self.done.add(json.loads(line)["source"])
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def mark_done(self, source: str, result: dict):
+        with self._lock:
+            self._file.write(json.dumps({"source": source, "chunks_indexed": result.get("chunks_indexed", 0)}) + "\n")
+            self._file.flush()
+            self.done.add(source)
+
+    def close(self):
+        self._file.close()
+
+
+class Progress:
+    """Counts documents, chunks and billed embedding tokens and logs running throughput"""
+
+    def __init__(self, embedder):
+        self.embedder = embedder
+        self.start = time.perf_counter()
+        self.embed_tokens_at_start = getattr(embedder, "embed_tokens", 0)
+        self.docs = 0
+        self.failed = 0
+        self.skipped = 0
+        self.chunks = 0
+        self.chunks_added = 0
+        self._lock = threading.Lock()
+
+    def record(self, result: dict):
+        with self._lock:
+            self.docs += 1
+            self.chunks += result.get("chunks_indexed", 0)
+            self.chunks_added += result.get("chunks_added", 0)
+
+    def record_failure(self):
+        with self._lock:
+            self.failed += 1
+
+    def report_periodically(self, interval: float, stop: threading.Event):
+        while not stop.wait(interval):
+            self.report()
+
+    def report(self, final: bool = False):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        embed_tokens = getattr(self.embedder, "embed_tokens", 0) - self.embed_tokens_at_start
+        logger.info(
+            f"{'Finished' if final else 'Progress'}: {self.docs} docs ({self.docs / elapsed:.2f}/s), "
+            f"{self.chunks} chunks ({self.chunks / elapsed:.1f}/s, {self.chunks_added} embedded), "
+            f"{embed_tokens} embed tokens ({embed_tokens / elapsed:.0f}/s), "
+            f"{self.skipped} already done, {self.failed} failed, {elapsed:.0f}s elapsed"
+        )
+
+
+def ingest(path: str, workers: int, checkpoint_path: str, report_every: float, tenant: Optional[str] = None) -> Progress:
+    """
+    Index every supported document under path through RAGService, workers documents at a time,
+    as documents of tenant if given
+    """
+    rag_service = RAGService()
+    rag_service.qdrant_manager.create_collection()
+    checkpoint = Checkpoint(checkpoint_path)
+    progress = Progress(rag_service.embedding_manager)
+
+    def process(source: str, file_path: str, is_temporary: bool):
+        try:
+            result = rag_service.process_and_store_document(file_path, source, tenant)
+            checkpoint.mark_done(source, result)
+            progress.record(result)
+        except Exception as e:
+            progress.record_failure()
+            logger.error(f"Failed to index {source}: {e}")
+        finally:
+            if is_temporary:
+                os.unlink(file_path)
+
+    stop_reporting = threading.Event()
+    reporter = threading.Thread(target=progress.report_periodically, args=(report_every, stop_reporting), daemon=True)
+    reporter.start()
+
+    with tempfile.TemporaryDirectory(prefix="bulk_ingest_") as spool_dir, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest") as executor:
+        in_flight = set()
+        for source, open_source in iter_sources(path, spool_dir):
+            if source in checkpoint.done:
+                progress.skipped += 1
+                continue
+            # Bound the number of spooled-but-unprocessed documents
+            if len(in_flight) >= workers * 2:
+                _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            file_path, is_temporary = open_source()
+            in_flight.add(executor.submit(process, source, file_path, is_temporary))
+        wait(in_flight)
+
+    stop_reporting.set()
+    checkpoint.close()
+    rag_service.qdrant_manager.close()
+    # The store created its own Qdrant client, which VectorStore.close leaves to its owner
+    client = getattr(rag_service.qdrant_manager, "client", None)
+    if client is not None:
+        client.close()
+    progress.report(final=True)
+    return progress
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="Directory, .zip or .tar(.gz) archive of PDF/TXT documents")
+    parser.add_argument("--tenant", help="Tenant the documents belong to (default: none)")
+    parser.add_argument("--workers", type=int, default=4, help="Documents processed concurrently")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: PATH.checkpoint.jsonl)")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Seconds between progress reports")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    checkpoint_path = args.checkpoint or os.path.abspath(args.path).rstrip(os.sep) + ".checkpoint.jsonl"
+    progress = ingest(args.path, args.workers, checkpoint_path, args.report_every, args.tenant)
+    if progress.failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
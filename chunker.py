@@ -0,0 +1,192 @@
+import re
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+from config import Config
+
+# A chunk preferably ends after a paragraph break, otherwise after a sentence break
+PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+SENTENCE_BREAK_CHARS = ".!?;\n"
+
+
+class ChunkSpan(NamedTuple):
+    """Character offsets [start, end) of a chunk and the page it starts on (None for unpaged text)"""
+    start: int
+    end: int
+    page: Optional[int]
+
+
+class Chunk(NamedTuple):
+    start: int
+    end: int
+    page: Optional[int]
+    text: str
+
+
+class CharTokenizer:
+    """Measures size in characters: every character is a token"""
+
+    def token_starts(self, text: str) -> Sequence[int]:
+        return range(len(text))
+
+
+class RegexTokenizer:
+    """Approximates subword tokenizers by counting words and punctuation marks"""
+
+    pattern = re.compile(r"\w+|[^\w\s]")
+
+    def token_starts(self, text: str) -> Sequence[int]:
+        return [match.start() for match in self.pattern.finditer(text)]
+
+
+class HuggingFaceTokenizer:
+    """Counts tokens with a Hugging Face `tokenizers` model, e.g. the embedding model's own tokenizer"""
+
+    def __init__(self, name: str):
+        try:
+            from tokenizers import Tokenizer
+        except ImportError:
+            raise ImportError("The 'tokenizers' package is required for CHUNK_TOKENIZER=hf:<model>")
+        self.tokenizer = Tokenizer.from_pretrained(name)
+
+    def token_starts(self, text: str) -> Sequence[int]:
+        encoding = self.tokenizer.encode(text, add_special_tokens=False)
+        return [start for start, _ in encoding.offsets]
+
+
+def get_tokenizer(name: str = None):
+    """
+    Build the tokenizer named by Config.CHUNK_TOKENIZER: "chars", "regex" or "hf:<model name>"
+    """
+    name = name or Config.CHUNK_TOKENIZER
+    if name == "chars":
+        return CharTokenizer()
+    if name == "regex":
+        return RegexTokenizer()
+    if name.startswith("hf:"):
+        return HuggingFaceTokenizer(name[3:])
+    raise ValueError(f"Unknown chunk tokenizer: {name}")
+
+
+def _last_break_in(breaks: List[int], low: int, high: int) -> Optional[int]:
+    """Return the last break offset in (low, high], if any"""
+    index = bisect_right(breaks, high) - 1
+    if index >= 0 and breaks[index] > low:
+        return breaks[index]
+    return None
+
+
+def _last_sentence_break_in(text: str, low: int, high: int) -> Optional[int]:
+    """Return the last sentence break offset (just after the mark) in (low, high], if any"""
+    index = max(text.rfind(char, low, high) for char in SENTENCE_BREAK_CHARS)
+    return index + 1 if index >= low else None
+
+
+class Chunker:
+    """
+    Splits text into overlapping chunks of at most chunk_size tokens in one forward pass.
+
+    Paragraph breaks are found once per text with a regular expression, and sentence breaks only
+    inside each chunk's window; each chunk ends at the last paragraph break, else the last
+    sentence break, inside its final chunk_overlap tokens, and
+    the next chunk starts chunk_overlap tokens before that end. Chunks are described by offsets,
+    and text is only sliced out when a caller asks for it.
+    """
+
+    def __init__(self, chunk_size: int = None, chunk_overlap: int = None, tokenizer=None):
+        self.chunk_size = chunk_size or Config.CHUNK_SIZE
+        self.chunk_overlap = Config.CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+        self.tokenizer = tokenizer or get_tokenizer()
+
+    def split(self, text: str, page: Optional[int] = None) -> List[ChunkSpan]:
+        """
+        Split a complete text into chunk spans without copying any chunk text
+        """
+        spans = []
+        for start, end in self._spans(text, final=True):
+            spans.append(ChunkSpan(start, end, page))
+        return spans
+
+    def iter_chunks(self, pages: Iterable[Tuple[Optional[int], str]]) -> Iterator[Chunk]:
+        """
+        Incrementally chunk a stream of (page number, text) pieces. Chunks may span pages and
+        carry document-wide offsets; only the tail that doesn't yet fill a chunk is buffered.
+        """
+        buffer = ""
+        base = 0  # document offset of buffer[0]
+        page_marks: List[Tuple[int, Optional[int]]] = []  # (document offset, page number)
+
+        for page, text in pages:
+            if not text:
+                continue
+            page_marks.append((base + len(buffer), page))
+            buffer += text
+
+            spans = self._spans(buffer, final=False)
+            consumed = yield from self._materialize(spans, buffer, base, page_marks)
+            if consumed:
+                buffer = buffer[consumed:]
+                base += consumed
+                # Forget pages that lie entirely before the buffer
+                while len(page_marks) > 1 and page_marks[1][0] <= base:
+                    page_marks.pop(0)
+
+        yield from self._materialize(self._spans(buffer, final=True), buffer, base, page_marks)
+
+    @staticmethod
+    def _materialize(spans, buffer: str, base: int, page_marks):
+        """
+        Turn buffer-relative spans into Chunks, returning the offset the spans generator resumed at
+        """
+        mark_offsets = [offset for offset, _ in page_marks]
+        while True:
+            try:
+                start, end = next(spans)
+            except StopIteration as stop:
+                return stop.value
+            index = bisect_right(mark_offsets, base + start) - 1
+            page = page_marks[index][1] if index >= 0 else None
+            yield Chunk(base + start, base + end, page, buffer[start:end])
+
+    def _spans(self, text: str, final: bool):
+        """
+        Yield (start, end) offsets of the chunks in text. Unless final, stop before the last
+        chunk (more text may still extend it) and return the offset where chunking should resume.
+        """
+        starts = self.tokenizer.token_starts(text)
+        token_count = len(starts)
+        paragraph_breaks = [match.end() for match in PARAGRAPH_BREAK.finditer(text)]
+
+        token = 0
+        while token < token_count:
+            limit = token + self.chunk_size
+            if limit >= token_count:
+                if not final:
+                    return starts[token]
+                yield from self._trimmed(text, starts[token], len(text))
+                break
+            if not final and limit >= token_count - 1:
+                # The last buffered token may still grow when the next page arrives
+                return starts[token]
+
+            hard_end = starts[limit]
+            window_start = starts[max(token + 1, limit - self.chunk_overlap)]
+            end = _last_break_in(paragraph_breaks, window_start, hard_end)
+            if end is None:
+                end = _last_sentence_break_in(text, window_start, hard_end)
+            if end is None:
+                end = hard_end
+            yield from self._trimmed(text, starts[token], end)
+
+            end_token = bisect_left(starts, end)
+            token = max(end_token - self.chunk_overlap, token + 1)
+        return len(text)
+
+    @staticmethod
+    def _trimmed(text: str, start: int, end: int):
+        """Yield the span with surrounding whitespace removed, or nothing if it is blank"""
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            yield start, end
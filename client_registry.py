@@ -0,0 +1,110 @@
+import asyncio
+import importlib
+import logging
+from config import Config
+from cohere_manager import AsyncCohereManager, create_client
+from job_queue import IngestionQueue
+from metrics import startup_phase
+from rag_service import AsyncRAGService
+from vector_store import DeferredVectorStore, get_vector_store, sparse_supported
+
+logger = logging.getLogger(__name__)
+
+
+class ClientRegistry:
+    """
+    Application-scoped provider clients for the API server. One pooled keep-alive Qdrant client
+    (REST or gRPC), one pooled HTTP client for Cohere and one RAG service are created per worker
+    process and shared by every request, instead of each caller opening its own connections.
+    Creating the registry is cheap: the vector store is opened in the background by start(), and
+    each provider's SDK is imported and its client created on first use (or by warm_up()).
+    """
+
+    def __init__(self):
+        # Created when the store opens; the embedded local index needs no Qdrant client
+        self.qdrant = None
+        # Created with the Cohere client
+        self.http = None
+
+        self.qdrant_manager = DeferredVectorStore(self._open_vector_store, sparse_enabled=sparse_supported())
+        self.cohere_manager = AsyncCohereManager(client_factory=self._create_cohere_client)
+        # The service creates the Gemini manager, whose SDK keeps its own shared channel
+        self.rag_service = AsyncRAGService(self.qdrant_manager, self.cohere_manager)
+        self.ingestion_queue = IngestionQueue(self.rag_service)
+        self._warm_up = None
+
+    def _create_cohere_client(self):
+        if self.http is None:
+            with startup_phase("http_pool"):
+                import httpx
+                self.http = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=Config.HTTP_POOL_SIZE,
+                        max_keepalive_connections=Config.HTTP_POOL_SIZE,
+                        keepalive_expiry=Config.HTTP_KEEPALIVE_EXPIRY
+                    ),
+                    timeout=Config.HTTP_TIMEOUT
+                )
+        return create_client(asynchronous=True, http_client=self.http)
+
+    async def _open_vector_store(self):
+        with startup_phase("vector_store"):
+            if Config.VECTOR_STORE == "qdrant":
+                # Importing qdrant_client takes most of a cold start: do it off the event loop
+                await asyncio.to_thread(importlib.import_module, "qdrant_manager")
+                from qdrant_client import AsyncQdrantClient
+                from qdrant_manager import client_options
+                self.qdrant = AsyncQdrantClient(**client_options())
+            store = get_vector_store(self.qdrant, asynchronous=True)
+            await store.create_collection()
+        if self.qdrant is not None:
+            logger.info(f"Opened the vector store (Qdrant over {'gRPC' if Config.QDRANT_PREFER_GRPC else 'REST'})")
+        else:
+            logger.info("Opened the vector store (local vector index)")
+        return store
+
+    def start(self):
+        """
+        Start opening the vector store, the background ingestion workers and, with
+        WARM_UP_PROVIDERS, the provider clients' warm-up (needs the running event loop)
+        """
+        self.qdrant_manager.open()
+        self.ingestion_queue.start()
+        if Config.WARM_UP_PROVIDERS:
+            self._warm_up = asyncio.ensure_future(self.warm_up())
+
+    async def warm_up(self):
+        """
+        Create the configured providers' clients now instead of on the first request that needs
+        them. Their SDK imports run off the event loop, one provider at a time, after the vector
+        store (which every request needs) has opened.
+        """
+        try:
+            await self.qdrant_manager.create_collection()
+        except Exception:
+            pass  # Logged (and retried) by the store; providers can warm up regardless
+        loaders = {}
+        if Config.COHERE_API_KEY:
+            loaders["cohere"] = lambda: self.cohere_manager.client
+        if self.rag_service.gemini_manager is not None:
+            loaders["gemini"] = lambda: self.rag_service.gemini_manager.model
+        for name, load in loaders.items():
+            try:
+                await asyncio.to_thread(load)
+            except Exception as e:
+                logger.warning(f"Warming up {name} failed, it will be retried on first use: {str(e)}")
+
+    async def close(self):
+        """
+        Stop the ingestion and service workers and close every pooled connection
+        """
+        if self._warm_up is not None:
+            self._warm_up.cancel()
+        await self.ingestion_queue.close()
+        self.rag_service.close()
+        await self.qdrant_manager.close()
+        if self.qdrant is not None:
+            await self.qdrant.close()
+        if self.http is not None:
+            await self.http.aclose()
+        logger.info("Closed shared clients")
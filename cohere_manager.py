@@ -1,43 +1,190 @@
-import cohere
+import threading
 from config import Config
+from embedding_cache import get_embedding_cache
+from metrics import EMBED_TOKENS, record_tokens, startup_phase
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def create_client(asynchronous: bool = False, http_client=None):
+    """
+    A new Cohere client (an AsyncClient if asynchronous), sending its requests through
+    http_client's connection pool when given. The SDK is only imported here, on first use.
+    """
+    if not Config.COHERE_API_KEY:
+        raise ValueError("COHERE_API_KEY environment variable is required")
+    with startup_phase("cohere"):
+        import cohere
+        client_class = cohere.AsyncClient if asynchronous else cohere.Client
+        if http_client is None:
+            return client_class(Config.COHERE_API_KEY)
+        return client_class(Config.COHERE_API_KEY, httpx_client=http_client)
+
+
+def billed_input_tokens(response) -> int:
+    """
+    Input tokens Cohere billed for a response, or 0 if the response carries no usage metadata
+    """
+    meta = getattr(response, "meta", None)
+    billed_units = getattr(meta, "billed_units", None)
+    return int(getattr(billed_units, "input_tokens", None) or 0)
+
+
+def billed_output_tokens(response) -> int:
+    """
+    Output tokens Cohere billed for a response, or 0 if the response carries no usage metadata
+    """
+    meta = getattr(response, "meta", None)
+    billed_units = getattr(meta, "billed_units", None)
+    return int(getattr(billed_units, "output_tokens", None) or 0)
+
+
+def chat_history(history: list[dict] = None) -> list:
+    """
+    Conversation turns ({"role": "user" | "assistant", "text": ...}) as Cohere chat history
+    """
+    import cohere
+    return [
+        cohere.UserMessage(message=turn["text"]) if turn["role"] == "user" else cohere.ChatbotMessage(message=turn["text"])
+        for turn in history or []
+    ]
+
+
+def record_usage(response):
+    """
+    Export the tokens billed for a chat response
+    """
+    record_tokens("cohere", billed_input_tokens(response), billed_output_tokens(response))
+
+
 class CohereManager:
-    def __init__(self):
-        # Initialize Cohere client
-        self.client = cohere.Client(Config.COHERE_API_KEY)
+    """
+    Cohere embeddings and chat. The request building, caching and usage accounting live here;
+    AsyncCohereManager only overrides the calls that do I/O.
+    """
 
-    def embed_texts(self, texts: list[str], input_type: str = "search_document") -> list[list[float]]:
-        """
-        Generate embeddings for a list of texts
-        """
-        response = self.client.embed(
-            texts=texts,
-            model=Config.EMBEDDING_MODEL,
-            input_type=input_type
-        )
+    asynchronous = False
+
+    def __init__(self, client=None, client_factory=None):
+        # Shared Cohere client if given, else one created on first use by client_factory
+        self._client = client
+        self._client_factory = client_factory or (lambda: create_client(asynchronous=self.asynchronous))
+        self._lock = threading.Lock()
+        self.cache = get_embedding_cache()
+        # Running total of embedding tokens billed by Cohere (cache hits cost nothing)
+        self.embed_tokens = 0
+
+    @property
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = self._client_factory()
+            return self._client
+
+    @property
+    def configured(self) -> bool:
+        """Whether there is a client or an API key to create one with"""
+        return self._client is not None or bool(Config.COHERE_API_KEY)
+
+    @staticmethod
+    def _embed_request(texts: list[str], input_type: str) -> dict:
+        return {"texts": texts, "model": Config.EMBEDDING_MODEL, "input_type": input_type}
+
+    def _embeddings(self, response) -> list[list[float]]:
+        """Count the tokens billed for an embed response and return its embeddings"""
+        tokens = billed_input_tokens(response)
+        self.embed_tokens += tokens
+        EMBED_TOKENS.labels("cohere").inc(tokens)
         return response.embeddings
 
-    def generate_response(self, prompt: str) -> str:
-        """
-        Generate a response using Cohere's chat model
-        """
-        response = self.client.chat(
-            model=Config.COHERE_GENERATION_MODEL,
-            message=prompt,
-            max_tokens=Config.MAX_TOKENS,
-            temperature=Config.TEMPERATURE
-        )
+    @staticmethod
+    def _chat_request(prompt: str, history: list[dict] = None) -> dict:
+        return {
+            "model": Config.COHERE_GENERATION_MODEL,
+            "message": prompt,
+            "chat_history": chat_history(history),
+            "max_tokens": Config.MAX_TOKENS,
+            "temperature": Config.TEMPERATURE,
+        }
 
+    @staticmethod
+    def _answer(response) -> str:
+        """Record the usage of a chat response and return its text"""
+        record_usage(response)
         if response.text:
             return response.text.strip()
         else:
             raise Exception("No response returned from Cohere")
 
+    def embed_texts(self, texts: list[str], input_type: str = "search_document") -> list[list[float]]:
+        """
+        Generate embeddings for a list of texts, only calling Cohere for texts not already cached
+        """
+        if self.cache is None:
+            return self._embed(texts, input_type)
+
+        keys, vectors, missing = self.cache.lookup(texts, Config.EMBEDDING_MODEL, input_type)
+        if not missing:
+            return vectors
+        embedded = self._embed([texts[i] for i in missing], input_type)
+        return self.cache.fill(keys, vectors, missing, embedded)
+
+    def _embed(self, texts: list[str], input_type: str) -> list[list[float]]:
+        return self._embeddings(self.client.embed(**self._embed_request(texts, input_type)))
+
+    def generate_response(self, prompt: str, history: list[dict] = None) -> str:
+        """
+        Generate a response using Cohere's chat model, following the earlier turns of the conversation
+        """
+        return self._answer(self.client.chat(**self._chat_request(prompt, history)))
+
     def embed_query(self, query: str) -> list[float]:
         """
         Generate embedding for a query
         """
-        return self.embed_texts([query], input_type="search_query")[0]
\ No newline at end of file
+        return self.embed_texts([query], input_type="search_query")[0]
+
+
+class AsyncCohereManager(CohereManager):
+    asynchronous = True
+
+    async def embed_texts(self, texts: list[str], input_type: str = "search_document") -> list[list[float]]:
+        """
+        Generate embeddings for a list of texts without blocking the event loop,
+        only calling Cohere for texts not already cached
+        """
+        if self.cache is None:
+            return await self._embed(texts, input_type)
+
+        keys, vectors, missing = await self.cache.alookup(texts, Config.EMBEDDING_MODEL, input_type)
+        if not missing:
+            return vectors
+        embedded = await self._embed([texts[i] for i in missing], input_type)
+        return await self.cache.afill(keys, vectors, missing, embedded)
+
+    async def _embed(self, texts: list[str], input_type: str) -> list[list[float]]:
+        return self._embeddings(await self.client.embed(**self._embed_request(texts, input_type)))
+
+    async def generate_response(self, prompt: str, history: list[dict] = None) -> str:
+        """
+        Generate a response using Cohere's chat model without blocking the event loop,
+        following the earlier turns of the conversation
+        """
+        return self._answer(await self.client.chat(**self._chat_request(prompt, history)))
+
+    async def stream_response(self, prompt: str, history: list[dict] = None):
+        """
+        Yield the response text from Cohere's chat model as it is generated
+        """
+        async for event in self.client.chat_stream(**self._chat_request(prompt, history)):
+            if event.event_type == "text-generation" and event.text:
+                yield event.text
+            elif event.event_type == "stream-end":
+                record_usage(event.response)
+
+    async def embed_query(self, query: str) -> list[float]:
+        """
+        Generate embedding for a query
+        """
+        return (await self.embed_texts([query], input_type="search_query"))[0]
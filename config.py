@@ -6,30 +6,194 @@ load_dotenv()
 
 # Application configuration
 class Config:
-    # Cohere configuration
+    # Provider API keys: only providers whose key is set are enabled (Cohere is still needed for
+    # EMBEDDING_BACKEND=cohere and RERANKER=cohere). Each provider's SDK is imported and its client
+    # created on first use, or in the background right after startup with WARM_UP_PROVIDERS.
     COHERE_API_KEY = os.getenv("COHERE_API_KEY")
-    if not COHERE_API_KEY:
-        raise ValueError("COHERE_API_KEY environment variable is required")
-
-    # Gemini configuration
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-    if not GEMINI_API_KEY:
-        raise ValueError("GEMINI_API_KEY environment variable is required")
+    WARM_UP_PROVIDERS = os.getenv("WARM_UP_PROVIDERS", "true").lower() == "true"
+
+    # Vector store: "qdrant" (a Qdrant server) or "local", an embedded index for single-node
+    # deployments (one API worker process) that needs no database server
+    VECTOR_STORE = os.getenv("VECTOR_STORE", "qdrant").lower()
+    # Local index: vectors in a memory-mapped float32 or int8 matrix under LOCAL_INDEX_PATH, with the
+    # payloads in a SQLite file next to it. Searches scan every vector until the index reaches
+    # LOCAL_IVF_MIN_POINTS (0: never), then an IVF index of LOCAL_IVF_LISTS clusters (0: about
+    # sqrt(points)) is trained at startup and LOCAL_IVF_NPROBE of its clusters are searched per query.
+    # Hybrid (BM25) search needs Qdrant; the local index searches dense vectors only.
+    LOCAL_INDEX_PATH = os.getenv("LOCAL_INDEX_PATH", "local_index")
+    LOCAL_INDEX_DTYPE = os.getenv("LOCAL_INDEX_DTYPE", "float32")
+    LOCAL_IVF_MIN_POINTS = int(os.getenv("LOCAL_IVF_MIN_POINTS", 100000))
+    LOCAL_IVF_LISTS = int(os.getenv("LOCAL_IVF_LISTS", 0))
+    LOCAL_IVF_NPROBE = int(os.getenv("LOCAL_IVF_NPROBE", 16))
 
     # Qdrant configuration
     QDRANT_URL = os.getenv("QDRANT_URL", "localhost")
     QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
     QDRANT_PORT = int(os.getenv("QDRANT_PORT", 6333))
+    QDRANT_PREFER_GRPC = os.getenv("QDRANT_PREFER_GRPC", "false").lower() == "true"
+    QDRANT_GRPC_PORT = int(os.getenv("QDRANT_GRPC_PORT", 6334))
+
+    # Connection pools of the API server's shared clients (per worker process)
+    QDRANT_POOL_SIZE = int(os.getenv("QDRANT_POOL_SIZE", 32))
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 32))
+    HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+    HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 60))
+    # /health answers from collection info at most this many seconds old
+    HEALTH_CACHE_TTL = float(os.getenv("HEALTH_CACHE_TTL", 10))
 
-    # Collection configuration
+    # Collection configuration. COLLECTION_NAME is an alias for a versioned physical collection.
     COLLECTION_NAME = "documents"
+    # Original vectors on disk, with quantized vectors ("none", "scalar" int8 or "binary") kept in RAM
+    VECTORS_ON_DISK = os.getenv("VECTORS_ON_DISK", "true").lower() == "true"
+    QUANTIZATION = os.getenv("QUANTIZATION", "scalar")
+    SEARCH_RESCORE = os.getenv("SEARCH_RESCORE", "true").lower() == "true"
+    SEARCH_OVERSAMPLING = float(os.getenv("SEARCH_OVERSAMPLING", 2.0))
+    HNSW_M = int(os.getenv("HNSW_M", 16))
+    HNSW_EF_CONSTRUCT = int(os.getenv("HNSW_EF_CONSTRUCT", 100))
 
-    # Document processing
+    # Hybrid retrieval: BM25 sparse vectors stored next to the dense vector, fused with RRF
+    HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+    SPARSE_VECTOR_NAME = "bm25"
+    HYBRID_PREFETCH_LIMIT = int(os.getenv("HYBRID_PREFETCH_LIMIT", 20))
+    BM25_K1 = float(os.getenv("BM25_K1", 1.2))
+    BM25_B = float(os.getenv("BM25_B", 0.75))
+    BM25_AVG_DOC_LENGTH = float(os.getenv("BM25_AVG_DOC_LENGTH", 150))
+
+    # Document processing. Chunk size and overlap are counted in CHUNK_TOKENIZER units:
+    # "chars" (default), "regex" (words and punctuation) or "hf:<tokenizer name>"
     CHUNK_SIZE = 1000
     CHUNK_OVERLAP = 200
+    CHUNK_TOKENIZER = os.getenv("CHUNK_TOKENIZER", "chars")
+
+    # Uploads are spooled to disk and text files read in blocks of these sizes
+    UPLOAD_BLOCK_SIZE = int(os.getenv("UPLOAD_BLOCK_SIZE", 1024 * 1024))
+    TEXT_READ_BLOCK_SIZE = int(os.getenv("TEXT_READ_BLOCK_SIZE", 64 * 1024))
+
+    # PDF text extraction: PDFs with at least PDF_PARALLEL_MIN_PAGES pages are extracted
+    # in ranges of PDF_PAGES_PER_TASK pages across PDF_EXTRACT_WORKERS processes
+    PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", os.cpu_count() or 1))
+    PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 32))
+    PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 8))
+
+    # Embedding ingestion (Cohere accepts at most 96 texts per embed call)
+    EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 96))
+    EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", 4))
+    EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", 3))
+    EMBED_RETRY_BACKOFF = float(os.getenv("EMBED_RETRY_BACKOFF", 1.0))
+
+    # Embedding cache (set EMBEDDING_CACHE_PATH to a SQLite file to keep entries across restarts)
+    EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+    EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    EMBEDDING_CACHE_TTL = float(os.getenv("EMBEDDING_CACHE_TTL", 24 * 3600))
+    EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH")
+
+    # Semantic answer cache: near-duplicate questions reuse a previously generated answer
+    SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95))
+    SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 1000))
+    SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", 3600))
+
+    # Conversations: chats sending a session_id have their last CONVERSATION_WINDOW_TURNS exchanges
+    # (up to CONVERSATION_HISTORY_TOKENS estimated tokens) kept server-side and sent to the model as
+    # chat turns. A follow-up whose query embedding has cosine similarity >= CONVERSATION_REUSE_THRESHOLD
+    # with the previous search's reuses its chunks. CONVERSATION_MAX_SESSIONS sessions are kept, each
+    # until idle for CONVERSATION_TTL seconds.
+    CONVERSATION_WINDOW_TURNS = int(os.getenv("CONVERSATION_WINDOW_TURNS", 5))
+    CONVERSATION_HISTORY_TOKENS = int(os.getenv("CONVERSATION_HISTORY_TOKENS", 1500))
+    CONVERSATION_REUSE_THRESHOLD = float(os.getenv("CONVERSATION_REUSE_THRESHOLD", 0.85))
+    CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", 10000))
+    CONVERSATION_TTL = float(os.getenv("CONVERSATION_TTL", 1800))
+
+    # Retrieval: RETRIEVAL_LIMIT chunks at most go into the prompt
+    RETRIEVAL_LIMIT = int(os.getenv("RETRIEVAL_LIMIT", 5))
+
+    # Optional rerank stage ("none", "cohere" or "cross-encoder"). Up to RERANK_CANDIDATES hits are
+    # retrieved; those within RERANK_DEPTH_RATIO of the best score (at least RERANK_MIN_CANDIDATES)
+    # are reranked, unless the top RETRIEVAL_LIMIT already stand out. Reranked chunks scoring below
+    # RERANK_SCORE_CUTOFF are dropped, and the rest are kept up to RERANK_TOKEN_BUDGET prompt tokens.
+    # Hybrid search's fused (RRF) scores only reflect ranks, so the score-ratio checks are skipped for them.
+    RERANKER = os.getenv("RERANKER", "none")
+    RERANK_MODEL = os.getenv("RERANK_MODEL", "rerank-english-v3.0")
+    CROSS_ENCODER_MODEL = os.getenv("CROSS_ENCODER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 50))
+    RERANK_MIN_CANDIDATES = int(os.getenv("RERANK_MIN_CANDIDATES", 10))
+    RERANK_DEPTH_RATIO = float(os.getenv("RERANK_DEPTH_RATIO", 0.8))
+    RERANK_SCORE_CUTOFF = float(os.getenv("RERANK_SCORE_CUTOFF", 0.1))
+    RERANK_TOKEN_BUDGET = int(os.getenv("RERANK_TOKEN_BUDGET", 1500))
+
+    # Prompt context: overlapping or adjacent hits from the same source are merged, passages mostly
+    # repeating text already chosen (CONTEXT_DEDUP_THRESHOLD of their word trigrams) are dropped, and
+    # the rest are added by relevance up to CONTEXT_TOKEN_BUDGET estimated tokens
+    CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", 2000))
+    CONTEXT_DEDUP_THRESHOLD = float(os.getenv("CONTEXT_DEDUP_THRESHOLD", 0.8))
+
+    # Query micro-batching: concurrent chats' query embeddings and searches arriving within
+    # QUERY_BATCH_MAX_WAIT_MS (or until QUERY_BATCH_MAX_SIZE are waiting) go out as one request each
+    QUERY_BATCHING = os.getenv("QUERY_BATCHING", "true").lower() == "true"
+    QUERY_BATCH_MAX_WAIT_MS = float(os.getenv("QUERY_BATCH_MAX_WAIT_MS", 2))
+    QUERY_BATCH_MAX_SIZE = int(os.getenv("QUERY_BATCH_MAX_SIZE", 32))
+
+    # Requests sending "X-Debug-Timing: 1" get a Server-Timing header with their per-stage latencies
+    SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "true").lower() == "true"
+
+    # Generation routing across Cohere and Gemini: ROUTER_POLICY "preferred" tries the provider the
+    # request asked for first, "latency" the one with the lowest p95 over its last ROUTER_LATENCY_WINDOW
+    # calls (once it has ROUTER_MIN_SAMPLES). A failed call falls back to the next provider.
+    ROUTER_POLICY = os.getenv("ROUTER_POLICY", "preferred").lower()
+    ROUTER_LATENCY_WINDOW = int(os.getenv("ROUTER_LATENCY_WINDOW", 100))
+    ROUTER_MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", 10))
+    # Hedging: if the first provider hasn't answered after ROUTER_HEDGE_DELAY_MS (0: its live p95),
+    # the next one is called too and the first answer wins
+    ROUTER_HEDGE = os.getenv("ROUTER_HEDGE", "false").lower() == "true"
+    ROUTER_HEDGE_DELAY_MS = float(os.getenv("ROUTER_HEDGE_DELAY_MS", 0))
+    # After CIRCUIT_FAILURE_THRESHOLD consecutive failures a provider is skipped for
+    # CIRCUIT_RESET_SECONDS, then a single probe call decides whether it is used again
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))
+    CIRCUIT_RESET_SECONDS = float(os.getenv("CIRCUIT_RESET_SECONDS", 30))
+
+    # Background ingestion: uploads are queued as jobs and processed by INGEST_WORKERS workers in the
+    # API process. Uploads beyond INGEST_QUEUE_MAX waiting jobs are refused with 503, and the status of
+    # the last INGEST_JOB_HISTORY jobs is kept (in memory) for GET /jobs/{id}.
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+    INGEST_QUEUE_MAX = int(os.getenv("INGEST_QUEUE_MAX", 100))
+    INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", 1000))
+    # Where uploads wait for their job (default: the system temp directory)
+    INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR") or None
+
+    # Thread pool for blocking work (document parsing) in the async request path
+    BLOCKING_POOL_SIZE = int(os.getenv("BLOCKING_POOL_SIZE", 4))
+
+    # Embedding backend: "cohere" (API) or "local" (sentence-transformers on CPU). Vectors from
+    # different models are not comparable, so switch with migrate_collection.py --reembed.
+    EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "cohere")
+    LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
+    # "torch", or "onnx" with an optional ONNX file from the model repo (e.g. onnx/model_qint8_avx512_vnni.onnx)
+    LOCAL_EMBEDDING_RUNTIME = os.getenv("LOCAL_EMBEDDING_RUNTIME", "torch")
+    LOCAL_EMBEDDING_ONNX_FILE = os.getenv("LOCAL_EMBEDDING_ONNX_FILE")
+    # Dynamic int8 quantization of the torch model's linear layers
+    LOCAL_EMBEDDING_QUANTIZE = os.getenv("LOCAL_EMBEDDING_QUANTIZE", "false").lower() == "true"
+    # Inference threads (0 keeps the runtime's default of one per core)
+    LOCAL_EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", 0))
+    # Concurrent requests are batched together for up to LOCAL_EMBEDDING_MAX_WAIT_MS
+    LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", 32))
+    LOCAL_EMBEDDING_MAX_WAIT_MS = float(os.getenv("LOCAL_EMBEDDING_MAX_WAIT_MS", 5))
 
     # Model configuration
     EMBEDDING_MODEL = "embed-english-v3.0"
+    EMBEDDING_DIMENSIONS = {
+        "embed-english-v3.0": 1024,
+        "embed-multilingual-v3.0": 1024,
+        "embed-english-light-v3.0": 384,
+        "embed-multilingual-light-v3.0": 384,
+        "embed-english-v2.0": 4096,
+        "BAAI/bge-small-en-v1.5": 384,
+        "BAAI/bge-base-en-v1.5": 768,
+        "sentence-transformers/all-MiniLM-L6-v2": 384,
+        "sentence-transformers/all-mpnet-base-v2": 768,
+    }
+    ACTIVE_EMBEDDING_MODEL = LOCAL_EMBEDDING_MODEL if EMBEDDING_BACKEND == "local" else EMBEDDING_MODEL
+    EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", EMBEDDING_DIMENSIONS.get(ACTIVE_EMBEDDING_MODEL, 1024)))
     COHERE_GENERATION_MODEL = "command-r-plus"
     GEMINI_MODEL = "gemini-2.5-flash"
     MAX_TOKENS = 500
@@ -0,0 +1,130 @@
+import re
+from typing import List, NamedTuple, Optional, Set, Tuple
+from config import Config
+from reranker import estimate_tokens
+
+WORD = re.compile(r"\w+")
+# Chunks whose stored offsets are at most this many characters apart (the whitespace the
+# chunker trimmed between them) count as adjacent
+ADJACENT_GAP = 2
+
+
+class Passage(NamedTuple):
+    """A contiguous stretch of one source: a retrieved chunk, or several merged ones"""
+    rank: int  # best relevance rank among the chunks it was built from
+    source: str
+    start: Optional[int]
+    end: Optional[int]
+    text: str
+    uploaded_at: Optional[int] = None  # upload of the document version the offsets refer to
+
+
+def shingles(text: str) -> Set[Tuple[str, ...]]:
+    """Word trigrams of a text (the whole text for fewer than three words)"""
+    words = WORD.findall(text.lower())
+    if len(words) < 3:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i:i + 3]) for i in range(len(words) - 2)}
+
+
+def _merge(first: Passage, second: Passage) -> Optional[Passage]:
+    """
+    Join two passages of the same source whose offsets overlap or touch, with second starting
+    at or after first. Returns None when they can't be joined, including when the stored offsets
+    disagree with the texts (e.g. chunks kept from an earlier version of the document). Joined
+    texts keep one character per offset, so a merged passage can be checked again.
+    """
+    if first.end is None or second.start is None or second.start > first.end + ADJACENT_GAP:
+        return None
+    rank = min(first.rank, second.rank)
+    if second.end <= first.end:
+        # Contained; only trust the offsets if the text really is there
+        if second.text not in first.text:
+            return None
+        return first._replace(rank=rank)
+    overlap = first.end - second.start
+    if overlap <= 0:
+        # No shared text to compare: the offsets must match the texts' lengths and come from the same upload
+        if (len(first.text) != first.end - first.start or len(second.text) != second.end - second.start
+                or first.uploaded_at != second.uploaded_at):
+            return None
+        # The gap is whitespace the chunker trimmed
+        text = first.text + "\n" * -overlap + second.text
+    elif first.text[-overlap:] == second.text[:overlap]:
+        text = first.text + second.text[overlap:]
+    else:
+        return None
+    return Passage(rank, first.source, first.start, second.end, text, first.uploaded_at)
+
+
+def merge_passages(passages: List[Passage]) -> List[Passage]:
+    """Merge overlapping and adjacent passages of each source by their document offsets"""
+    located = sorted((p for p in passages if p.start is not None and p.end is not None),
+                     key=lambda p: (p.source, p.start, p.end))
+    merged = [p for p in passages if p.start is None or p.end is None]
+    current = None
+    for passage in located:
+        if current is not None and current.source == passage.source:
+            joined = _merge(current, passage)
+            if joined is not None:
+                current = joined
+                continue
+        if current is not None:
+            merged.append(current)
+        current = passage
+    if current is not None:
+        merged.append(current)
+    return sorted(merged, key=lambda p: p.rank)
+
+
+def _truncate(text: str, tokens: int) -> str:
+    """Cut text to about the given number of estimated tokens, at a word boundary"""
+    limit = tokens * 4
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > 0 else limit].rstrip() + " ..."
+
+
+def build_context(search_results, token_budget: int = None, dedup_threshold: float = None) -> Tuple[str, List[str]]:
+    """
+    Assemble the prompt context from search results ordered by relevance, returning the context
+    text and the distinct sources it draws on.
+
+    Chunks of the same source that overlap or touch (by their stored start/end offsets) are merged
+    into one passage, so the overlap shared by neighbouring chunks appears once. A passage whose
+    word trigrams are mostly (dedup_threshold) contained in passages already chosen is dropped as
+    a near-duplicate. Passages are then added in relevance order while they fit in token_budget
+    estimated tokens; the most relevant one is always kept, truncated if it alone exceeds the budget.
+    """
+    token_budget = token_budget or Config.CONTEXT_TOKEN_BUDGET
+    dedup_threshold = Config.CONTEXT_DEDUP_THRESHOLD if dedup_threshold is None else dedup_threshold
+
+    passages = []
+    for rank, result in enumerate(search_results):
+        payload = result.payload or {}
+        content = payload.get("content", "")
+        if content:
+            passages.append(Passage(rank, payload.get("source", "Unknown"), payload.get("start"),
+                                    payload.get("end"), content, payload.get("uploaded_at")))
+
+    context_parts = []
+    sources = []
+    seen: Set[Tuple[str, ...]] = set()
+    tokens = 0
+    for passage in merge_passages(passages):
+        passage_shingles = shingles(passage.text)
+        if passage_shingles and len(passage_shingles & seen) >= dedup_threshold * len(passage_shingles):
+            continue
+        passage_tokens = estimate_tokens(passage.text)
+        if context_parts and tokens + passage_tokens > token_budget:
+            # A smaller, less relevant passage may still fit
+            continue
+        text = passage.text if context_parts else _truncate(passage.text, token_budget)
+        context_parts.append(text)
+        tokens += estimate_tokens(text)
+        seen |= passage_shingles
+        if passage.source not in sources:
+            sources.append(passage.source)
+
+    return "\n\n".join(context_parts), sources
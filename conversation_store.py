@@ -0,0 +1,183 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Iterable, List, Optional
+import numpy as np
+from config import Config
+from reranker import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Roles clients use for each side of a conversation, mapped to "user" and "assistant"
+USER_ROLES = {"user", "human"}
+ASSISTANT_ROLES = {"assistant", "chatbot", "model", "bot", "ai"}
+
+
+def normalize_history(history: Optional[List[dict]]) -> List[dict]:
+    """
+    Client-sent history as {"role": "user" | "assistant", "text": ...} turns. Each message may
+    carry its text as "text", "content" or "message"; messages with another role or no text are skipped.
+    """
+    turns = []
+    for message in history or []:
+        role = str(message.get("role", "")).lower()
+        text = message.get("text") or message.get("content") or message.get("message")
+        if not text or not isinstance(text, str):
+            continue
+        if role in USER_ROLES:
+            turns.append({"role": "user", "text": text})
+        elif role in ASSISTANT_ROLES:
+            turns.append({"role": "assistant", "text": text})
+    return window(turns)
+
+
+def window(turns: List[dict], max_turns: int = None, token_budget: int = None) -> List[dict]:
+    """
+    The most recent turns: at most max_turns exchanges (user and assistant message pairs) and
+    token_budget estimated tokens. The window always starts with a user message.
+    """
+    max_turns = max_turns or Config.CONVERSATION_WINDOW_TURNS
+    token_budget = token_budget or Config.CONVERSATION_HISTORY_TOKENS
+    kept = []
+    tokens = 0
+    for turn in reversed(turns[-2 * max_turns:]):
+        tokens += estimate_tokens(turn["text"])
+        if tokens > token_budget:
+            break
+        kept.append(turn)
+    kept.reverse()
+    while kept and kept[0]["role"] != "user":
+        kept.pop(0)
+    return kept
+
+
+def retrieval_query(turns: List[dict], query: str) -> str:
+    """
+    Text to retrieve a follow-up's chunks with: the previous question and the new one, so that
+    "and what about the second one?" is searched for in the context of what it refers to
+    """
+    for turn in reversed(turns):
+        if turn["role"] == "user":
+            return f"{turn['text']}\n{query}"
+    return query
+
+
+@dataclass
+class Conversation:
+    id: str
+    turns: List[dict] = field(default_factory=list)
+    # Embedding of the query the current results were retrieved for, normalized
+    query_vector: Optional[np.ndarray] = None
+    results: list = field(default_factory=list)
+    scope: str = ""
+    last_used: float = field(default_factory=time.time)
+
+    def history(self) -> List[dict]:
+        return window(self.turns)
+
+
+class ConversationStore:
+    """
+    Server-side chat sessions: the recent turns of each conversation and the chunks last
+    retrieved for it. A follow-up whose query embedding has cosine similarity >= reuse_threshold
+    with the query those chunks were retrieved for, within the same search scope, reuses them
+    instead of searching again. At most max_sessions are kept, least recently used evicted first,
+    and a session idle for ttl seconds is dropped.
+    """
+
+    def __init__(self, max_sessions: int = None, ttl: float = None, reuse_threshold: float = None):
+        self.max_sessions = max_sessions or Config.CONVERSATION_MAX_SESSIONS
+        self.ttl = Config.CONVERSATION_TTL if ttl is None else ttl
+        self.reuse_threshold = Config.CONVERSATION_REUSE_THRESHOLD if reuse_threshold is None else reuse_threshold
+        self.reused = 0
+        self.searched = 0
+        self._sessions: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def session(self, session_id: str) -> Conversation:
+        """
+        The conversation with this ID, started afresh if it is unknown or expired
+        """
+        now = time.time()
+        with self._lock:
+            conversation = self._sessions.get(session_id)
+            if conversation is not None and self.ttl and now - conversation.last_used > self.ttl:
+                conversation = None
+            if conversation is None:
+                conversation = Conversation(session_id)
+                self._sessions[session_id] = conversation
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            conversation.last_used = now
+            self._sessions.move_to_end(session_id)
+            return conversation
+
+    def reusable_results(self, conversation: Conversation, query_vector: List[float], scope: str = "") -> Optional[list]:
+        """
+        The chunks retrieved earlier in the conversation if they still fit the new query, else None
+        """
+        with self._lock:
+            vector = conversation.query_vector
+            if (vector is not None and conversation.results and conversation.scope == scope
+                    and vector.shape[0] == len(query_vector)
+                    and float(vector @ self._normalize(query_vector)) >= self.reuse_threshold):
+                self.reused += 1
+                return conversation.results
+            self.searched += 1
+            return None
+
+    def record(self, conversation: Conversation, query: str, answer: str, query_vector: List[float] = None,
+               results: list = None, scope: str = ""):
+        """
+        Add an exchange to the conversation; query_vector and results are given when the answer
+        came from a fresh search, whose chunks follow-ups may then reuse
+        """
+        with self._lock:
+            conversation.turns.append({"role": "user", "text": query})
+            conversation.turns.append({"role": "assistant", "text": answer})
+            # Older turns are never sent again, so don't keep them
+            del conversation.turns[:-2 * Config.CONVERSATION_WINDOW_TURNS]
+            if results is not None:
+                conversation.query_vector = self._normalize(query_vector)
+                conversation.results = list(results)
+                conversation.scope = scope
+
+    def invalidate_sources(self, sources: Iterable[str]) -> int:
+        """
+        Forget the retrieved chunks of every session that used one of the given sources (e.g. after a re-upload)
+        """
+        sources = set(sources)
+        invalidated = 0
+        with self._lock:
+            for conversation in self._sessions.values():
+                if any((result.payload or {}).get("source") in sources for result in conversation.results):
+                    conversation.query_vector = None
+                    conversation.results = []
+                    invalidated += 1
+        if invalidated:
+            logger.info(f"Invalidated retrieved chunks of {invalidated} conversations")
+        return invalidated
+
+    def drop(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def stats(self) -> dict:
+        # Reused retrievals count as hits, fresh searches of a session as misses
+        total = self.reused + self.searched
+        return {
+            "hits": self.reused,
+            "misses": self.searched,
+            "hit_rate": self.reused / total if total else 0.0,
+            "entries": len(self._sessions),
+            "max_entries": self.max_sessions,
+            "threshold": self.reuse_threshold,
+        }
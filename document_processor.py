@@ -1,84 +1,177 @@
 import tempfile
 import os
-from typing import List
+import logging
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, Iterator, List, Optional, Tuple
 from config import Config
-from pypdf import PdfReader
+from chunker import Chunk, Chunker
+
+if TYPE_CHECKING:
+    # pypdf is imported when the first PDF is read, not with the API
+    from pypdf import PdfReader
+
+logger = logging.getLogger(__name__)
+
+# File types documents can be uploaded as
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def is_supported(filename: str) -> bool:
+    return bool(filename) and filename.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def get_pdf_process_pool() -> ProcessPoolExecutor:
+    """
+    Return the shared process pool used for parallel PDF extraction, creating it on first use.
+    Workers are started from a fork server (or spawned), not forked from this process, which runs
+    threads (the event loop's thread pool, client connection pools) whose locks a fork can copy held.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _process_pool = ProcessPoolExecutor(max_workers=Config.PDF_EXTRACT_WORKERS,
+                                                mp_context=multiprocessing.get_context(method))
+        return _process_pool
+
+
+def shutdown_pdf_process_pool():
+    """
+    Stop the PDF extraction worker processes, if they were started
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+
+
+def _extract_page(pdf_reader: "PdfReader", page_number: int) -> str:
+    """
+    Extract the text of one page; a page that fails to parse yields no text instead of
+    failing the whole document
+    """
+    try:
+        return pdf_reader.pages[page_number].extract_text() or ""
+    except Exception as e:
+        logger.warning(f"Skipping page {page_number + 1}, text extraction failed: {e}")
+        return ""
+
+
+def _extract_page_range(file_path: str, start: int, stop: int) -> List[str]:
+    """
+    Extract the text of pages [start, stop) of a PDF. Runs in a worker process.
+    """
+    from pypdf import PdfReader
+    with open(file_path, 'rb') as file:
+        pdf_reader = PdfReader(file)
+        return [_extract_page(pdf_reader, page_number) for page_number in range(start, stop)]
+
 
 class DocumentProcessor:
-    def __init__(self):
-        pass
+    def __init__(self, chunker: Chunker = None):
+        self.chunker = chunker or Chunker()
 
     def process_document(self, file_path: str, filename: str) -> List[str]:
         """
         Process a document and return list of text chunks
         """
+        return list(self.iter_chunks(file_path, filename))
+
+    def iter_chunks(self, file_path: str, filename: str) -> Iterator[str]:
+        """
+        Lazily process a document into text chunks. Pages are read and chunked one at a
+        time, so memory use is bounded by a page plus a chunk rather than the whole file.
+        """
+        return (chunk.text for chunk in self.iter_document_chunks(file_path, filename))
+
+    def iter_document_chunks(self, file_path: str, filename: str) -> Iterator[Chunk]:
+        """
+        Like iter_chunks, but yields Chunks carrying their document offsets and page number
+        """
+        return self.chunker.iter_chunks(self._iter_pages(file_path, filename))
+
+    def _iter_pages(self, file_path: str, filename: str) -> Iterator[Tuple[Optional[int], str]]:
+        """
+        Yield the text of a document piece by piece as (page number, text): numbered pages
+        for PDFs, fixed-size unnumbered blocks for text files
+        """
         # Load document based on file type
         if filename.lower().endswith('.pdf'):
-            content = self._extract_text_from_pdf(file_path)
+            for page_number, text in enumerate(self._extract_text_from_pdf(file_path), start=1):
+                yield page_number, text
         elif filename.lower().endswith('.txt'):
             with open(file_path, 'r', encoding='utf-8', errors='ignore') as file:
-                content = file.read()
+                while block := file.read(Config.TEXT_READ_BLOCK_SIZE):
+                    yield None, block
         else:
             raise ValueError(f"Unsupported file type: {filename}. Please upload PDF or TXT files.")
 
-        # Split the content into chunks
-        chunks = self._split_text(content)
+    def _extract_text_from_pdf(self, file_path: str) -> Iterator[str]:
+        """
+        Extract text from a PDF file, one page at a time and in page order.
+        Large PDFs are extracted in page ranges across a process pool.
+        """
+        # Passing an open file (rather than the path) lets pypdf read pages on demand
+        # instead of loading the whole file into memory first
+        from pypdf import PdfReader
+        with open(file_path, 'rb') as file:
+            pdf_reader = PdfReader(file)
+            page_count = len(pdf_reader.pages)
+
+            # Small files aren't worth the inter-process overhead
+            if Config.PDF_EXTRACT_WORKERS <= 1 or page_count < Config.PDF_PARALLEL_MIN_PAGES:
+                for page_number in range(page_count):
+                    yield _extract_page(pdf_reader, page_number)
+                return
 
-        return chunks
+        yield from self._extract_text_from_pdf_parallel(file_path, page_count)
 
-    def _extract_text_from_pdf(self, file_path: str) -> str:
+    def _extract_text_from_pdf_parallel(self, file_path: str, page_count: int) -> Iterator[str]:
         """
-        Extract text from a PDF file
+        Extract page ranges in worker processes, keeping a bounded window of ranges in flight
+        and yielding pages in document order
         """
-        pdf_reader = PdfReader(file_path)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-        return text
+        pages_per_task = Config.PDF_PAGES_PER_TASK
+        ranges = iter([(start, min(start + pages_per_task, page_count))
+                       for start in range(0, page_count, pages_per_task)])
+        in_flight = deque()
+
+        def submit_next():
+            page_range = next(ranges, None)
+            if page_range is not None:
+                future = get_pdf_process_pool().submit(_extract_page_range, file_path, *page_range)
+                in_flight.append((page_range, future))
+
+        for _ in range(Config.PDF_EXTRACT_WORKERS * 2):
+            submit_next()
+
+        try:
+            while in_flight:
+                (start, stop), future = in_flight.popleft()
+                try:
+                    pages = future.result()
+                except Exception as e:
+                    # A crashed worker only costs its own range, which is retried in-process
+                    logger.warning(f"Parallel extraction of pages {start + 1}-{stop} failed ({e}), retrying in-process")
+                    if isinstance(e, BrokenProcessPool):
+                        shutdown_pdf_process_pool()
+                    pages = _extract_page_range(file_path, start, stop)
+                submit_next()
+                yield from pages
+        finally:
+            for _, future in in_flight:
+                future.cancel()
 
     def _split_text(self, text: str) -> List[str]:
         """
         Split text into chunks of specified size with overlap
         """
-        chunk_size = Config.CHUNK_SIZE
-        chunk_overlap = Config.CHUNK_OVERLAP
-
-        if len(text) <= chunk_size:
-            return [text]
-
-        chunks = []
-        start = 0
-
-        while start < len(text):
-            end = start + chunk_size
-
-            # If this is not the last chunk and we have overlap
-            if end < len(text) and chunk_overlap > 0:
-                # Try to find a sentence boundary within the overlap region
-                overlap_start = end - chunk_overlap
-                chunk_text = text[start:end]
-
-                # Look for a good break point (like sentence or paragraph boundary)
-                break_found = False
-                for i in range(min(chunk_overlap, len(chunk_text)), 0, -1):
-                    if chunk_text[-i] in '.!?;':
-                        end = start + len(chunk_text) - i
-                        break_found = True
-                        break
-                    elif chunk_text[-i] == '\n':
-                        end = start + len(chunk_text) - i
-                        break_found = True
-                        break
-
-                if break_found:
-                    chunks.append(text[start:end])
-                    start = end - chunk_overlap
-                else:
-                    chunks.append(text[start:end])
-                    start = end - chunk_overlap
-            else:
-                chunks.append(text[start:end])
-                start = end
-
-        # Filter out empty chunks
-        return [chunk.strip() for chunk in chunks if chunk.strip()]
\ No newline at end of file
+        return [text[span.start:span.end] for span in self.chunker.split(text)]
@@ -0,0 +1,238 @@
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Rough per-entry bookkeeping cost (OrderedDict node, key string, tuple) on top of the vector itself
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize text so trivially different spellings of the same question share a cache entry
+    """
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def make_cache_key(text: str, model: str, input_type: str) -> str:
+    """
+    Build the cache key from the normalized text, the embedding model and the input type
+    """
+    raw = f"{model}\x00{input_type}\x00{normalize_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LRUEmbeddingStore:
+    """
+    In-process LRU of float32 vectors with a TTL and a size cap measured in bytes
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size_bytes = 0
+        self._entries: "OrderedDict[str, Tuple[array, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _entry_size(vector: array) -> int:
+        return vector.itemsize * len(vector) + ENTRY_OVERHEAD_BYTES
+
+    def get(self, key: str) -> Optional[array]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            vector, stored_at = entry
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return vector
+
+    def put(self, key: str, vector: array):
+        size = self._entry_size(vector)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (vector, time.monotonic())
+            self.size_bytes += size
+            while self.size_bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def _remove(self, key: str):
+        vector, _ = self._entries.pop(key)
+        self.size_bytes -= self._entry_size(vector)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+
+
+class SQLiteEmbeddingStore:
+    """
+    On-disk vector store that survives restarts; vectors are kept as raw float32 blobs
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[array]:
+        with self._lock:
+            row = self._conn.execute("SELECT vector, stored_at FROM embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        blob, stored_at = row
+        if self.ttl and time.time() - stored_at > self.ttl:
+            with self._lock:
+                self._conn.execute("DELETE FROM embeddings WHERE key = ?", (key,))
+                self._conn.commit()
+            return None
+        vector = array("f")
+        vector.frombytes(blob)
+        return vector
+
+    def put_many(self, items: List[Tuple[str, array]]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, stored_at) VALUES (?, ?, ?)",
+                [(key, vector.tobytes(), now) for key, vector in items],
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache: an in-process LRU backed by an optional on-disk store.
+    Hits on disk are promoted into memory. Hit and miss counters are kept for sizing.
+    """
+
+    def __init__(self, max_bytes: int = None, ttl: float = None, disk_path: str = None):
+        ttl = Config.EMBEDDING_CACHE_TTL if ttl is None else ttl
+        self.memory = LRUEmbeddingStore(max_bytes or Config.EMBEDDING_CACHE_MAX_BYTES, ttl)
+        disk_path = disk_path or Config.EMBEDDING_CACHE_PATH
+        self.disk = SQLiteEmbeddingStore(disk_path, ttl) if disk_path else None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[List[float]]:
+        vector = self.memory.get(key)
+        if vector is not None:
+            self.memory_hits += 1
+            return vector.tolist()
+        if self.disk is not None:
+            vector = self.disk.get(key)
+            if vector is not None:
+                self.disk_hits += 1
+                self.memory.put(key, vector)
+                return vector.tolist()
+        self.misses += 1
+        return None
+
+    def put_many(self, keys: List[str], vectors: List[List[float]]):
+        items = [(key, array("f", vector)) for key, vector in zip(keys, vectors)]
+        for key, vector in items:
+            self.memory.put(key, vector)
+        if self.disk is not None:
+            self.disk.put_many(items)
+
+    def lookup(self, texts: List[str], model: str, input_type: str) -> Tuple[List[str], List[Optional[List[float]]], List[int]]:
+        """
+        Resolve texts against the cache, returning their keys, the cached vectors
+        (None where missing) and the indices that still need embedding
+        """
+        keys = [make_cache_key(text, model, input_type) for text in texts]
+        vectors = [self.get(key) for key in keys]
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        return keys, vectors, missing
+
+    def fill(self, keys: List[str], vectors: List[Optional[List[float]]], missing: List[int],
+             embedded: List[List[float]]) -> List[List[float]]:
+        """
+        Store freshly embedded vectors for the missing indices and return the completed list
+        """
+        for i, vector in zip(missing, embedded):
+            vectors[i] = vector
+        self.put_many([keys[i] for i in missing], embedded)
+        return vectors
+
+    async def alookup(self, texts: List[str], model: str, input_type: str) -> Tuple[List[str], List[Optional[List[float]]], List[int]]:
+        """
+        lookup for the event loop: with the disk tier, the SQLite reads run on a worker thread
+        """
+        if self.disk is None:
+            return self.lookup(texts, model, input_type)
+        return await asyncio.to_thread(self.lookup, texts, model, input_type)
+
+    async def afill(self, keys: List[str], vectors: List[Optional[List[float]]], missing: List[int],
+                    embedded: List[List[float]]) -> List[List[float]]:
+        """
+        fill for the event loop: with the disk tier, the SQLite writes run on a worker thread
+        """
+        if self.disk is None:
+            return self.fill(keys, vectors, missing, embedded)
+        return await asyncio.to_thread(self.fill, keys, vectors, missing, embedded)
+
+    def stats(self) -> dict:
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": hits / total if total else 0.0,
+            "entries": len(self.memory),
+            "size_bytes": self.memory.size_bytes,
+            "max_bytes": self.memory.max_bytes,
+        }
+
+    def clear(self):
+        self.memory.clear()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Return the process-wide embedding cache, or None when caching is disabled
+    """
+    global _default_cache
+    if not Config.EMBEDDING_CACHE_ENABLED:
+        return None
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache()
+            logger.info(f"Embedding cache enabled ({Config.EMBEDDING_CACHE_MAX_BYTES} bytes in memory, "
+                        f"disk store: {Config.EMBEDDING_CACHE_PATH or 'none'})")
+        return _default_cache
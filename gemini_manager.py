@@ -1,29 +1,81 @@
-import google.generativeai as genai
+import importlib.util
+import threading
 from config import Config
+from metrics import record_tokens, startup_phase
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def sdk_installed() -> bool:
+    """
+    Whether the Gemini SDK can be imported, checked without importing it
+    """
+    try:
+        return importlib.util.find_spec("google.generativeai") is not None
+    except ImportError:
+        return False
+
+
+def record_usage(response):
+    """
+    Export the prompt and output tokens reported in a response's usage metadata, if any
+    """
+    usage = getattr(response, "usage_metadata", None)
+    record_tokens(
+        "gemini",
+        int(getattr(usage, "prompt_token_count", None) or 0),
+        int(getattr(usage, "candidates_token_count", None) or 0)
+    )
+
+
+def contents(prompt: str, history: list = None):
+    """
+    The prompt following the earlier turns of the conversation, as Gemini contents
+    """
+    if not history:
+        return prompt
+    turns = [{"role": "user" if turn["role"] == "user" else "model", "parts": [turn["text"]]} for turn in history]
+    return turns + [{"role": "user", "parts": [prompt]}]
+
+
 class GeminiManager:
     def __init__(self):
-        # Initialize Gemini client
-        genai.configure(api_key=Config.GEMINI_API_KEY)
-        
-        # Initialize the model
-        self.model = genai.GenerativeModel(
-            model_name=Config.GEMINI_MODEL,
-            generation_config={
-                "temperature": Config.TEMPERATURE,
-                "max_output_tokens": Config.MAX_TOKENS,
-            }
-        )
+        # The SDK is imported and the model created on first use
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                self._model = self._load()
+            return self._model
+
+    def _load(self):
+        if not Config.GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY environment variable is required")
+        with startup_phase("gemini"):
+            import google.generativeai as genai
+            # Initialize Gemini client
+            genai.configure(api_key=Config.GEMINI_API_KEY)
+
+            # Initialize the model
+            return genai.GenerativeModel(
+                model_name=Config.GEMINI_MODEL,
+                generation_config={
+                    "temperature": Config.TEMPERATURE,
+                    "max_output_tokens": Config.MAX_TOKENS,
+                }
+            )
     
-    def generate_response(self, prompt: str) -> str:
+    def generate_response(self, prompt: str, history: list = None) -> str:
         """
-        Generate a response using the Gemini model
+        Generate a response using the Gemini model, following the earlier turns of the conversation
         """
         try:
-            response = self.model.generate_content(prompt)
+            response = self.model.generate_content(contents(prompt, history))
+            record_usage(response)
             
             if response.text:
                 return response.text.strip()
@@ -32,4 +84,40 @@ class GeminiManager:
                 
         except Exception as e:
             logger.error(f"Error generating response with Gemini: {str(e)}")
-            raise e
\ No newline at end of file
+            raise e
+
+
+class AsyncGeminiManager(GeminiManager):
+    async def generate_response(self, prompt: str, history: list = None) -> str:
+        """
+        Generate a response using the Gemini model without blocking the event loop,
+        following the earlier turns of the conversation
+        """
+        try:
+            response = await self.model.generate_content_async(contents(prompt, history))
+            record_usage(response)
+
+            if response.text:
+                return response.text.strip()
+            else:
+                raise Exception("No text returned from Gemini model")
+
+        except Exception as e:
+            logger.error(f"Error generating response with Gemini: {str(e)}")
+            raise e
+
+    async def stream_response(self, prompt: str, history: list = None):
+        """
+        Yield the response text from the Gemini model as it is generated
+        """
+        try:
+            response = await self.model.generate_content_async(contents(prompt, history), stream=True)
+            async for chunk in response:
+                if chunk.text:
+                    yield chunk.text
+            # The aggregated response carries the usage metadata once the stream is done
+            record_usage(response)
+
+        except Exception as e:
+            logger.error(f"Error streaming response with Gemini: {str(e)}")
+            raise e
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from config import Config
+from metrics import timed
+from sparse_encoder import SparseVector
+
+logger = logging.getLogger(__name__)
+
+# A record is a (point_id, payload, sparse_vector) triple; payload["content"] is the text that gets
+# embedded, and the optional BM25 sparse vector is stored alongside for hybrid search
+Record = Tuple[str, Dict[str, Any], Optional[SparseVector]]
+
+
+def make_batches(records: Iterable[Record], batch_size: int) -> Iterator[List[Record]]:
+    """
+    Group records into lists of at most batch_size, consuming the input lazily
+    """
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def amake_batches(records: AsyncIterable[Record], batch_size: int) -> AsyncIterator[List[Record]]:
+    """
+    Group records from an async iterable into lists of at most batch_size
+    """
+    batch = []
+    async for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _aiter(records: Iterable[Record]) -> AsyncIterator[Record]:
+    for record in records:
+        yield record
+
+
+def _columns(batch: List[Record]) -> Tuple[list, list, Optional[list]]:
+    """
+    Split a batch into payloads, ids and sparse vectors (None unless every record has one)
+    """
+    payloads = [payload for _, payload, _ in batch]
+    ids = [point_id for point_id, _, _ in batch]
+    sparse_vectors = [sparse_vector for _, _, sparse_vector in batch]
+    return payloads, ids, None if None in sparse_vectors else sparse_vectors
+
+
+def backoff_delay(attempt: int, base: float) -> float:
+    """
+    Exponential backoff with full jitter for the given (zero-based) retry attempt
+    """
+    return random.uniform(0, base * (2 ** attempt))
+
+
+class IngestionPipeline:
+    """
+    Embeds records in provider-sized batches with several batches in flight at once,
+    and upserts each batch to the vector store as soon as its embeddings arrive.
+
+    The embedder only needs an embed_texts(texts, input_type) method and the vector store
+    an insert_vectors(vectors, payloads, ids, sparse_vectors) method, so either can be replaced by a fake.
+    """
+
+    def __init__(self, embedder, vector_store, batch_size: int = None, max_concurrency: int = None,
+                 max_retries: int = None, retry_backoff: float = None):
+        self.embedder = embedder
+        self.vector_store = vector_store
+        self.batch_size = batch_size or Config.EMBED_BATCH_SIZE
+        self.max_concurrency = max_concurrency or Config.EMBED_CONCURRENCY
+        self.max_retries = Config.EMBED_MAX_RETRIES if max_retries is None else max_retries
+        self.retry_backoff = Config.EMBED_RETRY_BACKOFF if retry_backoff is None else retry_backoff
+
+    def _embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed one batch, retrying transient failures with exponential backoff
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                with timed("ingest", "embed"):
+                    return self.embedder.embed_texts(texts, input_type="search_document")
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.retry_backoff)
+                logger.warning(f"Embedding batch of {len(texts)} failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+
+    def _store(self, batch: List[Record], vectors: List[List[float]]):
+        with timed("ingest", "upsert"):
+            self.vector_store.insert_vectors(vectors, *_columns(batch))
+
+    def run(self, records: Iterable[Record]) -> int:
+        """
+        Embed and store all records, returning the number of points written.
+        At most max_concurrency batches are held in memory at any time.
+        """
+        indexed = 0
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            in_flight = {}
+            for batch in make_batches(records, self.batch_size):
+                if len(in_flight) >= self.max_concurrency:
+                    indexed += self._drain(in_flight, FIRST_COMPLETED)
+                texts = [payload["content"] for _, payload, _ in batch]
+                in_flight[executor.submit(self._embed_with_retry, texts)] = batch
+            while in_flight:
+                indexed += self._drain(in_flight, FIRST_COMPLETED)
+        return indexed
+
+    def _drain(self, in_flight: dict, return_when) -> int:
+        """
+        Wait for in-flight embeddings and upsert the finished batches
+        """
+        done, _ = wait(in_flight, return_when=return_when)
+        stored = 0
+        for future in done:
+            batch = in_flight.pop(future)
+            self._store(batch, future.result())
+            stored += len(batch)
+        return stored
+
+
+class AsyncIngestionPipeline(IngestionPipeline):
+    """
+    Asyncio counterpart of IngestionPipeline for use with the async embedder and vector store.
+    Each batch is embedded and upserted in its own task; at most max_concurrency tasks run at once.
+    """
+
+    async def _embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed one batch, retrying transient failures with exponential backoff
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                with timed("ingest", "embed"):
+                    return await self.embedder.embed_texts(texts, input_type="search_document")
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt, self.retry_backoff)
+                logger.warning(f"Embedding batch of {len(texts)} failed ({e}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _process(self, batch: List[Record]) -> int:
+        vectors = await self._embed_with_retry([payload["content"] for _, payload, _ in batch])
+        with timed("ingest", "upsert"):
+            await self.vector_store.insert_vectors(vectors, *_columns(batch))
+        return len(batch)
+
+    async def run(self, records: Union[Iterable[Record], AsyncIterable[Record]],
+                  on_progress: Callable[[int], None] = None) -> int:
+        """
+        Embed and store all records, returning the number of points written.
+        Records may come from an async iterable, so producing them need not block the event loop.
+        on_progress, if given, is called with the number of points written so far after each batch.
+        """
+        if not hasattr(records, "__aiter__"):
+            records = _aiter(records)
+        indexed = 0
+        in_flight = set()
+        try:
+            async for batch in amake_batches(records, self.batch_size):
+                if len(in_flight) >= self.max_concurrency:
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    indexed += sum(task.result() for task in done)
+                    if on_progress is not None:
+                        on_progress(indexed)
+                in_flight.add(asyncio.create_task(self._process(batch)))
+            if in_flight:
+                done, in_flight = await asyncio.wait(in_flight)
+                indexed += sum(task.result() for task in done)
+                if on_progress is not None:
+                    on_progress(indexed)
+        finally:
+            for task in in_flight:
+                task.cancel()
+        return indexed
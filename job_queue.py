@@ -0,0 +1,177 @@
+import asyncio
+import itertools
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from config import Config
+from metrics import INGEST_JOBS_QUEUED
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(Exception):
+    pass
+
+
+@dataclass
+class IngestJob:
+    id: str
+    filename: str
+    path: str
+    tenant: Optional[str]
+    priority: int
+    status: str = "queued"  # queued, running, succeeded or failed
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: dict = field(default_factory=dict)
+    result: Optional[dict] = None
+    error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "tenant": self.tenant,
+            "priority": self.priority,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class IngestionQueue:
+    """
+    Background ingestion of uploaded documents. Uploads are spooled to disk and queued as jobs,
+    which INGEST_WORKERS worker tasks hand to the RAG service one at a time each, so a burst of
+    large uploads can't take over the event loop, the blocking pool or the embedding provider
+    from chat requests.
+
+    The next job is the highest-priority one; among tenants with jobs of that priority, the
+    tenant served least recently goes first, so one tenant's bulk upload doesn't starve the others.
+    Jobs live in memory: queued jobs and their status are lost on restart.
+    """
+
+    def __init__(self, rag_service, workers: int = None, max_queued: int = None, history_size: int = None):
+        self.rag_service = rag_service
+        self.workers = workers or Config.INGEST_WORKERS
+        self.max_queued = max_queued or Config.INGEST_QUEUE_MAX
+        self.history_size = history_size or Config.INGEST_JOB_HISTORY
+        self.jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._queued: Dict[Optional[str], List[IngestJob]] = {}  # tenant -> its queued jobs
+        self._last_served: Dict[Optional[str], int] = {}
+        self._serial = itertools.count()
+        self._available = asyncio.Condition()
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def queued(self) -> int:
+        return sum(len(jobs) for jobs in self._queued.values())
+
+    def start(self):
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._run(), name=f"ingest-worker-{i}"))
+        logger.info(f"Started {self.workers} ingestion workers")
+
+    async def close(self):
+        """Stop the workers; running jobs are cancelled and queued jobs dropped with their spooled files"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for jobs in self._queued.values():
+            for job in jobs:
+                self._remove_spool(job)
+        self._queued.clear()
+        INGEST_JOBS_QUEUED.set(0)
+
+    async def submit(self, path: str, filename: str, tenant: Optional[str] = None, priority: int = 0) -> IngestJob:
+        """
+        Queue a spooled document for ingestion. The queue takes ownership of the file at path and
+        deletes it once the job is done. Raises QueueFullError when INGEST_QUEUE_MAX jobs are waiting.
+        """
+        if self.queued >= self.max_queued:
+            raise QueueFullError(f"Ingestion queue is full ({self.max_queued} jobs waiting)")
+        job = IngestJob(uuid.uuid4().hex, filename, path, tenant, priority)
+        self.jobs[job.id] = job
+        self._forget_finished()
+        async with self._available:
+            self._queued.setdefault(tenant, []).append(job)
+            INGEST_JOBS_QUEUED.set(self.queued)
+            self._available.notify()
+        logger.info(f"Queued ingestion job {job.id} for {filename} (tenant {tenant}, priority {priority})")
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self.jobs.get(job_id)
+
+    def _next_job(self) -> IngestJob:
+        """Take the highest-priority job, from the least recently served tenant on ties"""
+        def rank(tenant):
+            top = max(job.priority for job in self._queued[tenant])
+            return -top, self._last_served.get(tenant, -1)
+
+        tenant = min(self._queued, key=rank)
+        jobs = self._queued[tenant]
+        job = max(jobs, key=lambda j: (j.priority, -j.created_at))
+        jobs.remove(job)
+        if not jobs:
+            del self._queued[tenant]
+        self._last_served[tenant] = next(self._serial)
+        INGEST_JOBS_QUEUED.set(self.queued)
+        return job
+
+    async def _run(self):
+        while True:
+            async with self._available:
+                await self._available.wait_for(lambda: self._queued)
+                job = self._next_job()
+            await self._process(job)
+
+    async def _process(self, job: IngestJob):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = await self.rag_service.process_and_store_document(
+                job.path, job.filename, job.tenant, on_progress=job.progress.update
+            )
+            job.status = "succeeded"
+        except asyncio.CancelledError:
+            job.status = "failed"
+            job.error = "Cancelled at shutdown"
+            raise
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"Ingestion job {job.id} for {job.filename} failed: {str(e)}")
+        finally:
+            job.finished_at = time.time()
+            self._remove_spool(job)
+        logger.info(f"Ingestion job {job.id} {job.status} in {job.finished_at - job.started_at:.1f}s")
+
+    @staticmethod
+    def _remove_spool(job: IngestJob):
+        try:
+            os.unlink(job.path)
+        except FileNotFoundError:
+            pass
+
+    def _forget_finished(self):
+        """Keep at most INGEST_JOB_HISTORY jobs, dropping the oldest finished ones"""
+        excess = len(self.jobs) - self.history_size
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished_at is not None][:max(excess, 0)]:
+            del self.jobs[job_id]
+
+    def stats(self) -> dict:
+        statuses = {}
+        for job in self.jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {"workers": self.workers, "queued": self.queued, "jobs": statuses}
@@ -0,0 +1,223 @@
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, NamedTuple
+from config import Config
+from embedding_cache import get_embedding_cache
+
+logger = logging.getLogger(__name__)
+
+
+class EmbedRequest(NamedTuple):
+    texts: List[str]
+    input_type: str
+    future: Future
+
+
+class LocalEmbeddingManager:
+    """
+    Embeds texts on the CPU with a sentence-transformers model, as a drop-in replacement for
+    CohereManager's embed_texts and embed_query.
+
+    The model is loaded on first use, not at construction, so server startup stays fast. All
+    inference runs on one worker thread that gathers concurrent requests for up to
+    LOCAL_EMBEDDING_MAX_WAIT_MS into a single forward pass: a burst of chat queries costs about
+    one batched encode instead of one encode each, and the runtime's own intra-op threads
+    (LOCAL_EMBEDDING_THREADS) aren't oversubscribed by competing callers.
+    """
+
+    def __init__(self, model_name: str = None):
+        self.model_name = model_name or Config.LOCAL_EMBEDDING_MODEL
+        self.cache = get_embedding_cache()
+        # Kept for parity with CohereManager; local inference is never billed
+        self.embed_tokens = 0
+        self.requests = 0
+        self.batches = 0
+        self._model = None
+        self._queue: "queue.Queue[EmbedRequest]" = queue.Queue()
+        self._worker = None
+        self._model_lock = threading.Lock()
+        self._worker_lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._model_lock:
+            if self._model is None:
+                self._model = self._load()
+            return self._model
+
+    def _load(self):
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError("The 'sentence-transformers' package is required for EMBEDDING_BACKEND=local")
+
+        start = time.perf_counter()
+        if Config.LOCAL_EMBEDDING_THREADS:
+            torch.set_num_threads(Config.LOCAL_EMBEDDING_THREADS)
+
+        if Config.LOCAL_EMBEDDING_RUNTIME == "onnx":
+            model_kwargs = {"provider": "CPUExecutionProvider"}
+            if Config.LOCAL_EMBEDDING_ONNX_FILE:
+                model_kwargs["file_name"] = Config.LOCAL_EMBEDDING_ONNX_FILE
+            if Config.LOCAL_EMBEDDING_THREADS:
+                import onnxruntime
+                session_options = onnxruntime.SessionOptions()
+                session_options.intra_op_num_threads = Config.LOCAL_EMBEDDING_THREADS
+                model_kwargs["session_options"] = session_options
+            model = SentenceTransformer(self.model_name, device="cpu", backend="onnx", model_kwargs=model_kwargs)
+        elif Config.LOCAL_EMBEDDING_RUNTIME == "torch":
+            model = SentenceTransformer(self.model_name, device="cpu")
+            if Config.LOCAL_EMBEDDING_QUANTIZE:
+                model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        else:
+            raise ValueError(f"Unknown local embedding runtime: {Config.LOCAL_EMBEDDING_RUNTIME}")
+
+        dimension = model.get_sentence_embedding_dimension()
+        if dimension != Config.EMBEDDING_DIMENSION:
+            logger.warning(f"{self.model_name} produces {dimension}-dim vectors but EMBEDDING_DIMENSION is "
+                           f"{Config.EMBEDDING_DIMENSION}; set EMBEDDING_DIMENSION={dimension}")
+        logger.info(f"Loaded {self.model_name} ({Config.LOCAL_EMBEDDING_RUNTIME}) in {time.perf_counter() - start:.1f}s")
+        return model
+
+    def _submit(self, texts: List[str], input_type: str) -> Future:
+        """
+        Queue texts for the batching worker, starting it on first use
+        """
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="local-embedding", daemon=True)
+                self._worker.start()
+        future = Future()
+        self._queue.put(EmbedRequest(texts, input_type, future))
+        return future
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            batch = [request]
+            size = len(request.texts)
+            deadline = time.monotonic() + Config.LOCAL_EMBEDDING_MAX_WAIT_MS / 1000
+            while size < Config.LOCAL_EMBEDDING_BATCH_SIZE:
+                try:
+                    request = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._queue.put(None)
+                    break
+                batch.append(request)
+                size += len(request.texts)
+            self._encode_batch(batch)
+
+    def _encode_batch(self, batch: List[EmbedRequest]):
+        """
+        Encode the queued requests, one forward pass per input type, and resolve their futures
+        """
+        for input_type in {request.input_type for request in batch}:
+            requests = [request for request in batch if request.input_type == input_type]
+            try:
+                vectors = self._encode([text for request in requests for text in request.texts], input_type)
+            except Exception as e:
+                for request in requests:
+                    request.future.set_exception(e)
+                continue
+            self.requests += len(requests)
+            self.batches += 1
+            offset = 0
+            for request in requests:
+                request.future.set_result(vectors[offset:offset + len(request.texts)])
+                offset += len(request.texts)
+
+    def _encode(self, texts: List[str], input_type: str) -> List[List[float]]:
+        model = self.model
+        # Retrieval models such as BGE and E5 expect queries to carry an instruction prefix
+        prompt_name = "query" if input_type == "search_query" and "query" in model.prompts else None
+        embeddings = model.encode(
+            texts,
+            batch_size=Config.LOCAL_EMBEDDING_BATCH_SIZE,
+            prompt_name=prompt_name,
+            normalize_embeddings=True,
+            convert_to_numpy=True
+        )
+        return embeddings.tolist()
+
+    def embed_texts(self, texts: list[str], input_type: str = "search_document") -> list[list[float]]:
+        """
+        Generate embeddings for a list of texts, only encoding texts not already cached
+        """
+        if self.cache is None:
+            return self._submit(texts, input_type).result()
+
+        keys, vectors, missing = self.cache.lookup(texts, self.model_name, input_type)
+        if not missing:
+            return vectors
+        embedded = self._submit([texts[i] for i in missing], input_type).result()
+        return self.cache.fill(keys, vectors, missing, embedded)
+
+    def embed_query(self, query: str) -> list[float]:
+        """
+        Generate embedding for a query
+        """
+        return self.embed_texts([query], input_type="search_query")[0]
+
+    def stats(self) -> dict:
+        return {
+            "model": self.model_name,
+            "loaded": self._model is not None,
+            "requests": self.requests,
+            "batches": self.batches,
+            "average_batch": self.requests / self.batches if self.batches else 0.0,
+        }
+
+    def close(self):
+        """Stop the batching worker once it has finished the queued requests"""
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
+
+
+class AsyncLocalEmbeddingManager(LocalEmbeddingManager):
+    """Awaits the batching worker instead of blocking, so queries from many tasks share batches"""
+
+    async def embed_texts(self, texts: list[str], input_type: str = "search_document") -> list[list[float]]:
+        """
+        Generate embeddings for a list of texts without blocking the event loop,
+        only encoding texts not already cached
+        """
+        if self.cache is None:
+            return await asyncio.wrap_future(self._submit(texts, input_type))
+
+        keys, vectors, missing = await self.cache.alookup(texts, self.model_name, input_type)
+        if not missing:
+            return vectors
+        embedded = await asyncio.wrap_future(self._submit([texts[i] for i in missing], input_type))
+        return await self.cache.afill(keys, vectors, missing, embedded)
+
+    async def embed_query(self, query: str) -> list[float]:
+        """
+        Generate embedding for a query
+        """
+        return (await self.embed_texts([query], input_type="search_query"))[0]
+
+
+def get_embedding_manager(cohere_manager=None, asynchronous: bool = False):
+    """
+    Return the embedder selected by Config.EMBEDDING_BACKEND. For "cohere" this is cohere_manager
+    itself (or a new Cohere manager), so embedding and generation share one client.
+    """
+    if Config.EMBEDDING_BACKEND == "local":
+        return AsyncLocalEmbeddingManager() if asynchronous else LocalEmbeddingManager()
+    if Config.EMBEDDING_BACKEND == "cohere":
+        if cohere_manager is not None:
+            return cohere_manager
+        from cohere_manager import CohereManager, AsyncCohereManager
+        return AsyncCohereManager() if asynchronous else CohereManager()
+    raise ValueError(f"Unknown embedding backend: {Config.EMBEDDING_BACKEND}")
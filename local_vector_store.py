@@ -0,0 +1,533 @@
+import asyncio
+import functools
+import json
+import logging
+import math
+import os
+import shutil
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+import numpy as np
+from config import Config
+from sparse_encoder import SparseVector
+from vector_store import AsyncVectorStore, ScoredPoint, SearchRequest, VectorStore
+
+try:
+    import fcntl
+except ImportError:  # Windows: the index is not locked
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Per-row metadata searches filter on; source -1 marks a free (deleted or never used) row, tenant -1 no tenant
+ROW_DTYPE = np.dtype([("source", np.int32), ("tenant", np.int32), ("uploaded_at", np.int64), ("list", np.int32)])
+# Rows scored per matrix product, bounding the temporary score (and int8 decode) buffers
+SCAN_BLOCK = 16384
+INITIAL_CAPACITY = 1024
+# Points sampled per cluster to train the IVF centroids, and training iterations
+IVF_SAMPLE_PER_LIST = 64
+IVF_ITERATIONS = 10
+# The IVF index is retrained at startup once the index has grown this much since training
+IVF_RETRAIN_GROWTH = 4
+# SQLite's default limit on parameters per statement is 999
+SQL_BATCH = 500
+
+
+class IndexInUseError(Exception):
+    pass
+
+
+class LocalCollectionInfo(NamedTuple):
+    points_count: int
+    dimension: int
+    dtype: str
+    ivf_lists: int
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Embedded vector index for single-node deployments, so they need no Qdrant server and searches
+    make no network hop. Unit-normalized vectors (cosine similarity, as in the Qdrant collection)
+    are kept in a memory-mapped float32 matrix, or an int8 one with a scale per row at a quarter of
+    the size, in .npy files under LOCAL_INDEX_PATH. Opening the index maps the files without reading
+    them, so startup doesn't depend on its size and the OS page cache holds what searches touch.
+    Payloads live in a SQLite file next to the matrix, and the fields searches filter on in a
+    small per-row array, so filters are applied as a mask before scoring.
+
+    Searches score the query (or a batch of them, in one matrix product) against every row, a
+    block at a time. With an IVF index, trained once the index holds LOCAL_IVF_MIN_POINTS points,
+    only the rows of the LOCAL_IVF_NPROBE clusters nearest to the query are scored; filters
+    matching few rows skip the index and score exactly those rows instead.
+
+    One process may have the index open at a time, which an exclusive lock on its lock file
+    enforces, and BM25 sparse vectors are not stored.
+    """
+
+    def __init__(self, path: str = None, dtype: str = None):
+        self.collection_name = Config.COLLECTION_NAME
+        self.path = path or os.path.join(Config.LOCAL_INDEX_PATH, self.collection_name)
+        self.dtype = np.dtype(dtype or Config.LOCAL_INDEX_DTYPE)
+        if self.dtype not in (np.float32, np.int8):
+            raise ValueError(f"Unknown LOCAL_INDEX_DTYPE: {self.dtype}. Use float32 or int8.")
+        self.sparse_enabled = False
+        self.count = 0  # Rows in use or freed; rows past it were never written
+        self.vectors: Optional[np.ndarray] = None
+        self.scales: Optional[np.ndarray] = None
+        self.rows: Optional[np.ndarray] = None
+        self.centroids: Optional[np.ndarray] = None
+        self.ivf_trained_points = 0
+        self._free: List[int] = []
+        self._names: Dict[str, Dict[str, int]] = {"source": {}, "tenant": {}}
+        # Rows of each IVF cluster, rebuilt after writes: _list_rows[_list_offsets[i]:_list_offsets[i + 1]]
+        self._list_rows: Optional[np.ndarray] = None
+        self._list_offsets: Optional[np.ndarray] = None
+        self._db: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._lock_file = None
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def _open(self):
+        if self._db is not None:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        self._acquire()
+        meta = {}
+        if os.path.exists(self._file("meta.json")):
+            with open(self._file("meta.json")) as f:
+                meta = json.load(f)
+
+        if meta:
+            if meta["dtype"] != self.dtype.name:
+                logger.warning(f"Local index at {self.path} stores {meta['dtype']} vectors; "
+                               f"LOCAL_INDEX_DTYPE={self.dtype.name} applies to new indexes only")
+                self.dtype = np.dtype(meta["dtype"])
+            self.count = meta["count"]
+            self.ivf_trained_points = meta.get("ivf_trained_points", 0)
+            self.vectors = np.load(self._file("vectors.npy"), mmap_mode="r+")
+            self.rows = np.load(self._file("rows.npy"), mmap_mode="r+")
+            if self.dtype == np.int8:
+                self.scales = np.load(self._file("scales.npy"), mmap_mode="r+")
+            if os.path.exists(self._file("centroids.npy")):
+                self.centroids = np.load(self._file("centroids.npy"))
+            if self.vectors.shape[1] != Config.EMBEDDING_DIMENSION:
+                logger.warning(
+                    f"Local index at {self.path} stores {self.vectors.shape[1]}-dim vectors but "
+                    f"{Config.ACTIVE_EMBEDDING_MODEL} produces {Config.EMBEDDING_DIMENSION}-dim vectors; "
+                    f"delete it and re-ingest the documents"
+                )
+        else:
+            self._allocate(INITIAL_CAPACITY, Config.EMBEDDING_DIMENSION)
+
+        self._db = sqlite3.connect(self._file("payloads.sqlite"), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS points (
+                row INTEGER PRIMARY KEY, id TEXT NOT NULL UNIQUE, source TEXT, tenant TEXT, payload TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS points_source ON points (source, tenant);
+            CREATE TABLE IF NOT EXISTS names (kind TEXT NOT NULL, name TEXT NOT NULL, code INTEGER NOT NULL,
+                                              PRIMARY KEY (kind, name));
+        """)
+        for kind, name, code in self._db.execute("SELECT kind, name, code FROM names"):
+            self._names[kind][name] = code
+        self._free = np.flatnonzero(self.rows["source"][:self.count] < 0).tolist()
+        self._list_rows = None
+        logger.info(f"Opened local index at {self.path}: {self.points_count} points, {self.dtype.name} vectors"
+                    f"{f', IVF with {len(self.centroids)} lists' if self.centroids is not None else ''}")
+
+    def _acquire(self):
+        """Take the index's exclusive lock, failing at once if another process holds it"""
+        if self._lock_file is not None or fcntl is None:
+            return
+        lock_file = open(self._file("lock"), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise IndexInUseError(f"Local index at {self.path} is open in another process "
+                                  f"(e.g. the API server during a bulk ingestion); stop it first")
+        self._lock_file = lock_file
+
+    def _allocate(self, capacity: int, dimension: int):
+        """Create the matrix files with room for capacity rows, keeping the rows written so far"""
+        arrays = {"vectors.npy": (self.vectors, self.dtype, (capacity, dimension)),
+                  "rows.npy": (self.rows, ROW_DTYPE, (capacity,))}
+        if self.dtype == np.int8:
+            arrays["scales.npy"] = (self.scales, np.float32, (capacity,))
+        resized = {}
+        for name, (old, dtype, shape) in arrays.items():
+            temporary = self._file(name + ".tmp")
+            array = np.lib.format.open_memmap(temporary, mode="w+", dtype=dtype, shape=shape)
+            if old is not None:
+                array[:self.count] = old[:self.count]
+            if name == "rows.npy":
+                array["source"][self.count:] = -1
+            array.flush()
+            del array
+            os.replace(temporary, self._file(name))
+            resized[name] = np.load(self._file(name), mmap_mode="r+")
+        self.vectors = resized["vectors.npy"]
+        self.rows = resized["rows.npy"]
+        self.scales = resized.get("scales.npy")
+
+    def _write_meta(self):
+        meta = {"dtype": self.dtype.name, "count": self.count, "ivf_trained_points": self.ivf_trained_points}
+        with open(self._file("meta.json.tmp"), "w") as f:
+            json.dump(meta, f)
+        os.replace(self._file("meta.json.tmp"), self._file("meta.json"))
+
+    def _flush(self):
+        self.vectors.flush()
+        self.rows.flush()
+        if self.scales is not None:
+            self.scales.flush()
+        self._write_meta()
+
+    @property
+    def points_count(self) -> int:
+        return self.count - len(self._free)
+
+    def _code(self, kind: str, name: Optional[str]) -> int:
+        """Integer code of a source or tenant name, assigned on first use (-1 for no tenant)"""
+        if name is None:
+            return -1
+        codes = self._names[kind]
+        if name not in codes:
+            codes[name] = len(codes)
+            self._db.execute("INSERT INTO names (kind, name, code) VALUES (?, ?, ?)", (kind, name, codes[name]))
+        return codes[name]
+
+    def _rows_of(self, ids: List[str]) -> Dict[str, int]:
+        found = {}
+        for start in range(0, len(ids), SQL_BATCH):
+            batch = ids[start:start + SQL_BATCH]
+            query = f"SELECT id, row FROM points WHERE id IN ({','.join('?' * len(batch))})"
+            found.update(self._db.execute(query, batch).fetchall())
+        return found
+
+    def create_collection(self):
+        """
+        Open the index, creating it if it doesn't exist, and train the IVF index if the index
+        has reached LOCAL_IVF_MIN_POINTS points (or grown a lot since it was trained)
+        """
+        with self._lock:
+            self._open()
+            points = self.points_count
+            if Config.LOCAL_IVF_MIN_POINTS and points >= Config.LOCAL_IVF_MIN_POINTS and (
+                    self.centroids is None or points >= IVF_RETRAIN_GROWTH * self.ivf_trained_points):
+                self.build_index()
+
+    def insert_vectors(self, vectors: List[List[float]], payloads: List[Dict[str, Any]], ids: List[str],
+                       sparse_vectors: Optional[List[SparseVector]] = None):
+        """Insert or overwrite points; sparse vectors are ignored"""
+        with self._lock:
+            self._open()
+            ids = [str(point_id) for point_id in ids]
+            matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+            rows = self._rows_of(ids)
+            for point_id in ids:
+                if point_id not in rows:
+                    rows[point_id] = self._free.pop() if self._free else self._take_row()
+            targets = np.array([rows[point_id] for point_id in ids], dtype=np.int64)
+
+            if self.dtype == np.int8:
+                scales = np.abs(matrix).max(axis=1) / 127
+                scales[scales == 0] = 1
+                self.vectors[targets] = np.round(matrix / scales[:, None]).astype(np.int8)
+                self.scales[targets] = scales
+            else:
+                self.vectors[targets] = matrix
+            lists = np.full(len(ids), -1, dtype=np.int32)
+            if self.centroids is not None:
+                lists = np.argmax(matrix @ self.centroids.T, axis=1).astype(np.int32)
+            for row, payload, list_id in zip(targets, payloads, lists):
+                self.rows[row] = (self._code("source", payload.get("source")), self._code("tenant", payload.get("tenant")),
+                                  payload.get("uploaded_at", 0), list_id)
+
+            self._db.executemany(
+                "INSERT OR REPLACE INTO points (row, id, source, tenant, payload) VALUES (?, ?, ?, ?, ?)",
+                [(int(row), point_id, payload.get("source"), payload.get("tenant"), json.dumps(payload))
+                 for row, point_id, payload in zip(targets, ids, payloads)]
+            )
+            self._db.commit()
+            self._flush()
+            self._list_rows = None
+        logger.info(f"Inserted {len(vectors)} vectors into local index")
+
+    def _take_row(self) -> int:
+        if self.count == len(self.vectors):
+            self._allocate(2 * len(self.vectors), self.vectors.shape[1])
+        self.count += 1
+        return self.count - 1
+
+    def _mask(self, filters: Optional[Dict[str, Any]]) -> np.ndarray:
+        """Rows holding a point that matches the filters (see qdrant_manager.search_filter)"""
+        rows = self.rows[:self.count]
+        mask = rows["source"] >= 0
+        if not filters:
+            return mask
+        if "tenant" in filters and filters["tenant"] is not None:
+            mask &= rows["tenant"] == self._names["tenant"].get(filters["tenant"], -2)
+        if filters.get("sources"):
+            codes = [self._names["source"][source] for source in filters["sources"] if source in self._names["source"]]
+            mask &= np.isin(rows["source"], codes)
+        if filters.get("uploaded_after") is not None:
+            mask &= rows["uploaded_at"] >= filters["uploaded_after"]
+        if filters.get("uploaded_before") is not None:
+            mask &= rows["uploaded_at"] <= filters["uploaded_before"]
+        return mask
+
+    def _decode(self, rows) -> np.ndarray:
+        """Float32 vectors of rows (a slice or an index array)"""
+        if self.dtype == np.int8:
+            return self.vectors[rows].astype(np.float32) * self.scales[rows][:, None]
+        return self.vectors[rows]
+
+    def _scan(self, queries: np.ndarray, k: int, mask: np.ndarray, candidates: np.ndarray = None):
+        """
+        Exact top k rows for each query among candidates (every row when None) where mask is set.
+        Returns (scores, rows) arrays of shape (queries, k), padded with -inf scores.
+        """
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        total = self.count if candidates is None else len(candidates)
+        for start in range(0, total, SCAN_BLOCK):
+            if candidates is None:
+                rows = np.arange(start, min(start + SCAN_BLOCK, total))
+                block = self._decode(slice(start, start + len(rows)))
+            else:
+                rows = np.sort(candidates[start:start + SCAN_BLOCK])
+                block = self._decode(rows)
+            scores = queries @ block.T
+            scores[:, ~mask[rows]] = -np.inf
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, np.broadcast_to(rows, scores.shape)], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        return best_scores, best_rows
+
+    def _cluster_rows(self, list_ids: Iterable[int]) -> np.ndarray:
+        if self._list_rows is None:
+            lists = self.rows["list"][:self.count]
+            valid = np.flatnonzero((self.rows["source"][:self.count] >= 0) & (lists >= 0))
+            self._list_rows = valid[np.argsort(lists[valid], kind="stable")]
+            self._list_offsets = np.searchsorted(lists[self._list_rows], np.arange(len(self.centroids) + 1))
+        return np.concatenate([self._list_rows[self._list_offsets[i]:self._list_offsets[i + 1]] for i in list_ids])
+
+    def _search(self, queries: np.ndarray, k: int, filters: Optional[Dict[str, Any]]) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """Top k (scores, rows) of each of a batch of queries sharing the same filters"""
+        mask = self._mask(filters)
+        if filters and mask.sum() <= max(self.count // 4, Config.LOCAL_IVF_MIN_POINTS):
+            # A selective filter: score exactly the matching rows
+            return list(zip(*self._scan(queries, k, mask, np.flatnonzero(mask))))
+        if self.centroids is None:
+            return list(zip(*self._scan(queries, k, mask)))
+        nprobe = min(Config.LOCAL_IVF_NPROBE, len(self.centroids))
+        probes = np.argpartition(-(queries @ self.centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+        results = []
+        for query, lists in zip(queries, probes):
+            scores, rows = self._scan(query[None], k, mask, self._cluster_rows(lists))
+            results.append((scores[0], rows[0]))
+        return results
+
+    def _points(self, scores: np.ndarray, rows: np.ndarray, limit: int) -> List[ScoredPoint]:
+        order = np.argsort(-scores)[:limit]
+        hits = [(int(rows[i]), float(scores[i])) for i in order if scores[i] > -np.inf]
+        if not hits:
+            return []
+        placeholders = ",".join("?" * len(hits))
+        stored = {row: (point_id, payload) for row, point_id, payload in self._db.execute(
+            f"SELECT row, id, payload FROM points WHERE row IN ({placeholders})", [row for row, _ in hits]
+        )}
+        return [ScoredPoint(stored[row][0], score, json.loads(stored[row][1])) for row, score in hits]
+
+    def search_vectors(self, query_vector: List[float], limit: int = 5, sparse_query: Optional[SparseVector] = None,
+                       filters: Optional[Dict[str, Any]] = None) -> List[ScoredPoint]:
+        """Find the points most similar to the query vector among those matching filters"""
+        return self.search_batch([(query_vector, limit, sparse_query, filters)])[0]
+
+    def search_batch(self, requests: List[SearchRequest]) -> List[List[ScoredPoint]]:
+        """Run several (query_vector, limit, sparse_query, filters) searches, one matrix product per distinct filters"""
+        with self._lock:
+            self._open()
+            results: List[Optional[List[ScoredPoint]]] = [None] * len(requests)
+            groups: Dict[str, List[int]] = {}
+            for i, (_, _, _, filters) in enumerate(requests):
+                groups.setdefault(json.dumps(filters, sort_keys=True), []).append(i)
+            for members in groups.values():
+                queries = _normalize(np.asarray([requests[i][0] for i in members], dtype=np.float32))
+                k = max(requests[i][1] for i in members)
+                if self.count == 0:
+                    for i in members:
+                        results[i] = []
+                    continue
+                for i, (scores, rows) in zip(members, self._search(queries, k, requests[members[0]][3])):
+                    results[i] = self._points(scores, rows, requests[i][1])
+            return results
+
+    def build_index(self, lists: int = None):
+        """
+        Train the IVF index: spherical k-means centroids from a sample of the points, then every
+        point assigned to its nearest centroid. Points inserted later are assigned as they arrive.
+        """
+        with self._lock:
+            self._open()
+            valid = np.flatnonzero(self.rows["source"][:self.count] >= 0)
+            lists = lists or Config.LOCAL_IVF_LISTS or max(1, int(math.sqrt(len(valid))))
+            lists = min(lists, len(valid))
+            if not lists:
+                return
+            logger.info(f"Training IVF index with {lists} lists on {len(valid)} points")
+            rng = np.random.default_rng(0)
+            sample = np.sort(rng.choice(valid, min(len(valid), lists * IVF_SAMPLE_PER_LIST), replace=False))
+            data = self._decode(sample)
+            centroids = data[rng.choice(len(data), lists, replace=False)].copy()
+            for _ in range(IVF_ITERATIONS):
+                assignment = np.argmax(data @ centroids.T, axis=1)
+                order = np.argsort(assignment, kind="stable")
+                sizes = np.bincount(assignment, minlength=lists)
+                # A cluster that lost all its points keeps its previous centroid
+                filled = sizes > 0
+                starts = (np.cumsum(sizes) - sizes)[filled]
+                centroids[filled] = _normalize(np.add.reduceat(data[order], starts, axis=0))
+
+            self.centroids = centroids
+            for start in range(0, self.count, SCAN_BLOCK):
+                block = slice(start, min(start + SCAN_BLOCK, self.count))
+                self.rows["list"][block] = np.argmax(self._decode(block) @ centroids.T, axis=1)
+            np.save(self._file("centroids.npy"), centroids)
+            self.ivf_trained_points = len(valid)
+            self._flush()
+            self._list_rows = None
+            logger.info(f"Trained IVF index with {lists} lists")
+
+    def get_source_point_ids(self, source: str, tenant: Optional[str] = None) -> Set[str]:
+        """Return the IDs of all points stored for a tenant's source (its chunk manifest)"""
+        with self._lock:
+            self._open()
+            cursor = self._db.execute("SELECT id FROM points WHERE source = ? AND tenant IS ?", (source, tenant))
+            return {point_id for point_id, in cursor}
+
+    def set_payload(self, ids: List[str], payloads: List[Dict[str, Any]]):
+        """Merge fields other than source and tenant into the payloads of existing points; unknown IDs are skipped"""
+        with self._lock:
+            self._open()
+            rows = self._rows_of([str(point_id) for point_id in ids])
+            fields_of = {rows[str(point_id)]: fields for point_id, fields in zip(ids, payloads) if str(point_id) in rows}
+            targets = list(fields_of)
+            updates = []
+            for start in range(0, len(targets), SQL_BATCH):
+                batch = targets[start:start + SQL_BATCH]
+                query = f"SELECT row, payload FROM points WHERE row IN ({','.join('?' * len(batch))})"
+                for row, stored in self._db.execute(query, batch):
+                    payload = {**json.loads(stored), **fields_of[row]}
+                    self.rows["uploaded_at"][row] = payload.get("uploaded_at", 0)
+                    updates.append((json.dumps(payload), row))
+            self._db.executemany("UPDATE points SET payload = ? WHERE row = ?", updates)
+            self._db.commit()
+            self._flush()
+        logger.info(f"Updated the payloads of {len(updates)} points in local index")
+
+    def delete_points(self, ids: List[str]):
+        """Delete points by ID; their rows are reused by later inserts"""
+        with self._lock:
+            self._open()
+            rows = list(self._rows_of([str(point_id) for point_id in ids]).values())
+            for start in range(0, len(rows), SQL_BATCH):
+                batch = rows[start:start + SQL_BATCH]
+                self._db.execute(f"DELETE FROM points WHERE row IN ({','.join('?' * len(batch))})", batch)
+            self._db.commit()
+            self.rows["source"][rows] = -1
+            self._free.extend(rows)
+            self._flush()
+            self._list_rows = None
+        logger.info(f"Deleted {len(rows)} vectors from local index")
+
+    def delete_collection(self):
+        """Delete the index files (useful for testing/resetting)"""
+        with self._lock:
+            self.close()
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.vectors = self.rows = self.scales = self.centroids = None
+            self.count = 0
+            self.ivf_trained_points = 0
+            self._names = {"source": {}, "tenant": {}}
+            logger.info(f"Deleted local index at {self.path}")
+
+    def get_collection_info(self) -> LocalCollectionInfo:
+        with self._lock:
+            self._open()
+            return LocalCollectionInfo(self.points_count, self.vectors.shape[1], self.dtype.name,
+                                       0 if self.centroids is None else len(self.centroids))
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._flush()
+                self._db.close()
+                self._db = None
+            if self._lock_file is not None:
+                # Closing the file releases the lock
+                self._lock_file.close()
+                self._lock_file = None
+
+
+class AsyncLocalVectorStore(AsyncVectorStore):
+    """
+    Asyncio front of LocalVectorStore: its CPU-bound scoring and file writes run on a dedicated
+    thread, off the event loop (NumPy's matrix products release the GIL)
+    """
+
+    def __init__(self, store: LocalVectorStore = None):
+        super().__init__()
+        self.store = store or LocalVectorStore()
+        self.collection_name = self.store.collection_name
+        self.sparse_enabled = False
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="local-index")
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def create_collection(self):
+        await self._run(self.store.create_collection)
+
+    async def insert_vectors(self, vectors: List[List[float]], payloads: List[Dict[str, Any]], ids: List[str],
+                             sparse_vectors: Optional[List[SparseVector]] = None):
+        await self._run(self.store.insert_vectors, vectors, payloads, ids)
+
+    async def search_vectors(self, query_vector: List[float], limit: int = 5, sparse_query: Optional[SparseVector] = None,
+                             filters: Optional[Dict[str, Any]] = None) -> List[ScoredPoint]:
+        return await self._run(self.store.search_vectors, query_vector, limit, None, filters)
+
+    async def search_batch(self, requests: List[SearchRequest]) -> List[List[ScoredPoint]]:
+        return await self._run(self.store.search_batch, requests)
+
+    async def get_source_point_ids(self, source: str, tenant: Optional[str] = None) -> Set[str]:
+        return await self._run(self.store.get_source_point_ids, source, tenant)
+
+    async def set_payload(self, ids: List[str], payloads: List[Dict[str, Any]]):
+        await self._run(self.store.set_payload, ids, payloads)
+
+    async def delete_points(self, ids: List[str]):
+        await self._run(self.store.delete_points, ids)
+
+    async def delete_collection(self):
+        await self._run(self.store.delete_collection)
+
+    async def get_collection_info(self) -> LocalCollectionInfo:
+        return await self._run(self.store.get_collection_info)
+
+    async def close(self):
+        await self._run(self.store.close)
+        self.executor.shutdown(wait=False)
@@ -1,91 +1,177 @@
+import time
+# Taken before the other imports, so the startup report includes them
+IMPORT_STARTED = time.perf_counter()
 import os
+import json
 import logging
+from contextlib import asynccontextmanager, suppress
 from typing import List, Optional
-from fastapi import FastAPI, HTTPException, UploadFile, File
-from fastapi.responses import JSONResponse
+from fastapi import Depends, FastAPI, Form, HTTPException, UploadFile, File, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import tempfile
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from config import Config
-from rag_service import RAGService
+from rag_service import AsyncRAGService
+from client_registry import ClientRegistry
+from job_queue import IngestionQueue, QueueFullError
+from document_processor import is_supported
+from embedding_cache import get_embedding_cache
+from metrics import (REQUEST_SECONDS, REQUESTS_IN_FLIGHT, record_startup_phase, server_timing_header,
+                     start_request_timing, startup_phase, startup_report, watch_cache)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+record_startup_phase("import", time.perf_counter() - IMPORT_STARTED)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("Starting up RAG Chatbot API")
+    # Shared, pooled provider clients for the lifetime of this worker. Nothing slow happens
+    # here: provider SDKs are imported on first use and the vector store opens in the background.
+    with startup_phase("clients"):
+        clients = ClientRegistry()
+    app.state.clients = clients
+    watch_cache("embedding", get_embedding_cache())
+    watch_cache("answer", clients.rag_service.answer_cache)
+    watch_cache("conversation", clients.rag_service.conversations)
+    try:
+        clients.start()
+        record_startup_phase("ready", time.perf_counter() - IMPORT_STARTED)
+        yield
+    finally:
+        await clients.close()
 
 # Initialize FastAPI app
 app = FastAPI(
     title="RAG Chatbot API",
     description="A Retrieval-Augmented Generation chatbot using FastAPI, Cohere, and Qdrant",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# Initialize RAG service
-rag_service = RAGService()
+def get_rag_service(request: Request) -> AsyncRAGService:
+    return request.app.state.clients.rag_service
+
+def get_ingestion_queue(request: Request) -> IngestionQueue:
+    return request.app.state.clients.ingestion_queue
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    """
+    Record request latency per route template, and add a Server-Timing header with the
+    per-stage breakdown when the request asks for it with "X-Debug-Timing: 1"
+    """
+    timings = None
+    if Config.SERVER_TIMING_ENABLED and request.headers.get("x-debug-timing") == "1":
+        timings = start_request_timing()
+    REQUESTS_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - start
+        REQUESTS_IN_FLIGHT.dec()
+        # Label by route template, not raw path, to keep the label set bounded
+        route = request.scope.get("route")
+        REQUEST_SECONDS.labels(request.method, route.path if route else "unmatched", status).observe(elapsed)
+    if timings is not None:
+        response.headers["Server-Timing"] = server_timing_header(timings + [("total", elapsed)])
+    return response
 
 # Request/Response models
+class SearchFilters(BaseModel):
+    tenant: Optional[str] = None  # Only search this tenant's documents
+    sources: Optional[List[str]] = None  # Only search these documents
+    uploaded_after: Optional[int] = None  # Unix timestamps bounding the upload time
+    uploaded_before: Optional[int] = None
+
 class MessageRequest(BaseModel):
     message: str
-    history: Optional[List[dict]] = []
+    history: Optional[List[dict]] = []  # Earlier turns: {"role": "user" | "assistant", "text": ...}
+    session_id: Optional[str] = None  # Keep the conversation server-side under this ID instead
     use_gemini: bool = False  # Flag to choose between Cohere and Gemini
+    filters: Optional[SearchFilters] = None  # Pushed down into the vector search
+
+    def search_filters(self) -> Optional[dict]:
+        return self.filters.model_dump(exclude_none=True) if self.filters else None
 
 class DocumentResponse(BaseModel):
     message: str
     documents: List[str]
 
-@app.on_event("startup")
-def startup_event():
-    logger.info("Starting up RAG Chatbot API")
-    # Initialize Qdrant collection on startup
-    from qdrant_manager import QdrantManager
-    qdrant_manager = QdrantManager()
-    qdrant_manager.create_collection()
-
 @app.get("/")
 def read_root():
     return {"message": "RAG Chatbot API is running!"}
 
-@app.post("/upload/")
-async def upload_document(file: UploadFile = File(...)):
+@app.post("/upload/", status_code=202)
+async def upload_document(file: UploadFile = File(...), tenant: Optional[str] = Form(None),
+                          priority: int = Form(0), queue: IngestionQueue = Depends(get_ingestion_queue)):
     """
-    Upload a document (PDF, TXT) to be indexed for RAG
+    Upload a document (PDF, TXT) to be indexed for RAG, optionally as one of a tenant's documents.
+    The document is indexed in the background: the response carries a job ID to poll on
+    /jobs/{job_id}. Jobs with a higher priority are processed first.
     """
     try:
         # Validate file is provided
         if not file:
             raise HTTPException(status_code=400, detail="No file provided")
+        # Reject unsupported types now rather than in a job that is bound to fail
+        if not is_supported(file.filename):
+            raise HTTPException(status_code=400,
+                                detail=f"Unsupported file type: {file.filename}. Please upload PDF or TXT files.")
 
-        # Validate file size (optional but recommended)
-        # Move to the end to get file size
-        await file.seek(0, 2)  # Seek to end of file
-        file_size = await file.tell()  # Get current position (file size)
-        await file.seek(0)  # Reset to beginning of file
-
-        if file_size == 0:
-            raise HTTPException(status_code=400, detail="Uploaded file is empty")
-
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_path = temp_file.name
+        # Spool uploaded file to disk in fixed-size blocks rather than reading it into memory
+        file_size = 0
+        temp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1],
+                                             dir=Config.INGEST_SPOOL_DIR) as temp_file:
+                temp_path = temp_file.name
+                while block := await file.read(Config.UPLOAD_BLOCK_SIZE):
+                    temp_file.write(block)
+                    file_size += len(block)
 
-        # Process and store document using RAG service
-        result = rag_service.process_and_store_document(temp_path, file.filename)
+            # Validate file size
+            if file_size == 0:
+                raise HTTPException(status_code=400, detail="Uploaded file is empty")
 
-        # Clean up temp file
-        os.unlink(temp_path)
+            # The queue owns the spooled file from here and deletes it once the job is done
+            job = await queue.submit(temp_path, file.filename, tenant, priority)
+        except BaseException:
+            # Failed reads, a full disk or queue, or a client that went away: the file is still ours
+            if temp_path is not None:
+                with suppress(OSError):
+                    os.unlink(temp_path)
+            raise
 
-        return result
+        return {"job_id": job.id, "status": job.status, "filename": job.filename}
 
     except HTTPException:
         # Re-raise HTTP exceptions
         raise
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
     except Exception as e:
-        logger.error(f"Error processing document: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing document: {str(e)}")
+        logger.error(f"Error queueing document: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error queueing document: {str(e)}")
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, queue: IngestionQueue = Depends(get_ingestion_queue)):
+    """
+    Status of an ingestion job: queued, running (with progress), succeeded (with the
+    indexing result) or failed (with the error)
+    """
+    job = queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job.as_dict()
 
 @app.post("/chat/", response_model=DocumentResponse)
-async def chat_with_rag(request: MessageRequest):
+async def chat_with_rag(request: MessageRequest, rag_service: AsyncRAGService = Depends(get_rag_service)):
     """
     Chat endpoint with RAG functionality
     """
@@ -94,7 +180,10 @@ async def chat_with_rag(request: MessageRequest):
 
         # Use RAG service to retrieve and generate response
         # Pass the use_gemini flag to determine which model to use
-        answer, sources = rag_service.retrieve_and_generate(query, use_gemini=request.use_gemini)
+        answer, sources = await rag_service.retrieve_and_generate(query, use_gemini=request.use_gemini,
+                                                                  filters=request.search_filters(),
+                                                                  history=request.history,
+                                                                  session_id=request.session_id)
 
         return DocumentResponse(
             message=answer,
@@ -105,19 +194,108 @@ async def chat_with_rag(request: MessageRequest):
         logger.error(f"Error during chat: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error during chat: {str(e)}")
 
+@app.post("/chat/stream")
+async def chat_stream(request: MessageRequest, http_request: Request,
+                      rag_service: AsyncRAGService = Depends(get_rag_service)):
+    """
+    Streaming chat endpoint. Responds with newline-delimited JSON events: the retrieved
+    sources first, then the answer token by token, then a final "done" (or "error") event.
+    """
+    async def event_stream():
+        events = rag_service.retrieve_and_stream(request.message, use_gemini=request.use_gemini,
+                                                 filters=request.search_filters(), history=request.history,
+                                                 session_id=request.session_id)
+        try:
+            async for event in events:
+                # Stop pulling tokens (and close the upstream call) once the client has gone away
+                if await http_request.is_disconnected():
+                    logger.info("Client disconnected, cancelling streamed chat")
+                    break
+                yield json.dumps(event) + "\n"
+        except Exception as e:
+            logger.error(f"Error during streamed chat: {str(e)}")
+            yield json.dumps({"type": "error", "detail": f"Error during chat: {str(e)}"}) + "\n"
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
+
 @app.get("/health")
-def health_check():
+async def health_check(rag_service: AsyncRAGService = Depends(get_rag_service)):
     """
-    Health check endpoint
+    Health check endpoint. Answers from collection info cached for HEALTH_CACHE_TTL seconds,
+    so frequent probes don't each reach Qdrant, and with 503 while the vector store is still opening.
     """
-    from qdrant_manager import QdrantManager
-    qdrant_manager = QdrantManager()
-    qdrant_info = qdrant_manager.get_collection_info()
+    if not rag_service.qdrant_manager.ready:
+        # Still opening the vector store: not ready for traffic yet
+        return JSONResponse(status_code=503, content={"status": "starting", "qdrant_collection": Config.COLLECTION_NAME})
+    qdrant_info = await rag_service.qdrant_manager.get_cached_collection_info()
     if qdrant_info:
         return {"status": "healthy", "qdrant_collection": Config.COLLECTION_NAME, "points_count": qdrant_info.points_count}
     else:
         return {"status": "degraded", "qdrant_collection": Config.COLLECTION_NAME}
 
+@app.get("/startup/stats")
+def startup_stats(rag_service: AsyncRAGService = Depends(get_rag_service)):
+    """
+    Seconds this worker spent in each startup phase: importing the app ("import"), creating its
+    clients ("clients"), until it served ("ready"), and, once done, opening the vector store
+    ("vector_store") and each provider's first-use import and initialization ("http_pool" and
+    "cohere", "gemini")
+    """
+    return {"phases": startup_report(), "vector_store_ready": rag_service.qdrant_manager.ready}
+
+@app.get("/cache/stats")
+def cache_stats(rag_service: AsyncRAGService = Depends(get_rag_service)):
+    """
+    Hit/miss counters and size of the embedding and answer caches, and of chunk reuse across conversations
+    """
+    embedding_cache = get_embedding_cache()
+    answer_cache = rag_service.answer_cache
+    return {
+        "embedding": embedding_cache.stats() if embedding_cache else None,
+        "answer": answer_cache.stats() if answer_cache else None,
+        "conversation": rag_service.conversations.stats(),
+    }
+
+@app.delete("/sessions/{session_id}")
+def end_session(session_id: str, rag_service: AsyncRAGService = Depends(get_rag_service)):
+    """
+    Forget a conversation kept server-side
+    """
+    if not rag_service.conversations.drop(session_id):
+        raise HTTPException(status_code=404, detail=f"Unknown session: {session_id}")
+    return {"message": f"Session {session_id} ended"}
+
+@app.get("/batching/stats")
+def batching_stats(rag_service: AsyncRAGService = Depends(get_rag_service)):
+    """
+    Batch sizes and queueing delay of the query embedding and search micro-batchers
+    """
+    scheduler = rag_service.query_scheduler
+    return scheduler.stats() if scheduler else {"enabled": False}
+
+@app.get("/providers/stats")
+def provider_stats(rag_service: AsyncRAGService = Depends(get_rag_service)):
+    """
+    Circuit state, consecutive failures and live p95 latency of each generation provider
+    """
+    return rag_service.router.stats()
+
+@app.get("/ingestion/stats")
+def ingestion_stats(queue: IngestionQueue = Depends(get_ingestion_queue)):
+    """
+    Ingestion workers, jobs waiting for one and the recent jobs by status
+    """
+    return queue.stats()
+
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus metrics: request and per-stage latency histograms, billed tokens and cache counters
+    """
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,181 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+logger = logging.getLogger(__name__)
+
+# Sub-millisecond cache hits up to minute-long generations and large uploads
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds", "Time spent in each stage of the chat and ingest pipelines",
+    ["pipeline", "stage"], buckets=LATENCY_BUCKETS
+)
+REQUEST_SECONDS = Histogram(
+    "rag_http_request_seconds", "HTTP request latency until the response headers are sent",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_FLIGHT = Gauge("rag_http_requests_in_flight", "HTTP requests currently being handled")
+EMBED_TOKENS = Counter("rag_embed_tokens_total", "Embedding input tokens billed by the provider", ["provider"])
+GENERATION_TOKENS = Counter(
+    "rag_generation_tokens_total", "Generation tokens billed by the provider", ["provider", "kind"]
+)
+PROVIDER_EVENTS = Counter(
+    "rag_provider_events_total", "Generation provider failures, fallbacks, hedges, cancelled hedges and circuit openings",
+    ["provider", "event"]
+)
+PROVIDER_CIRCUIT_OPEN = Gauge("rag_provider_circuit_open", "Whether a provider's circuit breaker is open", ["provider"])
+INGEST_JOBS_QUEUED = Gauge("rag_ingest_jobs_queued", "Ingestion jobs waiting for a worker")
+STARTUP_SECONDS = Gauge(
+    "rag_startup_seconds", "Time spent importing and initializing each part of the worker, at startup or on first use",
+    ["phase"]
+)
+
+# Startup phases timed so far in this process, in the order they finished
+_startup_phases: Dict[str, float] = {}
+
+# Stage timings of the current request, collected only when it asked for a Server-Timing header
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timing():
+    """Collect the stage timings of the current request; returns the list they are appended to"""
+    timings = []
+    _request_timings.set(timings)
+    return timings
+
+
+def record_stage(pipeline: str, stage: str, seconds: float):
+    STAGE_SECONDS.labels(pipeline, stage).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((f"{pipeline}-{stage}", seconds))
+
+
+@contextmanager
+def timed(pipeline: str, stage: str):
+    """Time the enclosed block as one observation of a pipeline stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(pipeline, stage, time.perf_counter() - start)
+
+
+def timed_iter(iterable: Iterable, pipeline: str, stage: str) -> Iterator:
+    """
+    Iterate a lazy producer, recording the total time spent inside it (not in the consumer)
+    as one observation once it is exhausted
+    """
+    iterator = iter(iterable)
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        record_stage(pipeline, stage, elapsed)
+
+
+async def timed_aiter(iterable: AsyncIterable, pipeline: str, stage: str, first_stage: str = None) -> AsyncIterator:
+    """
+    Async counterpart of timed_iter; first_stage, if given, additionally records the wait
+    for the first item (e.g. time to first token of a stream)
+    """
+    iterator = iterable.__aiter__()
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+                if first_stage is not None:
+                    record_stage(pipeline, first_stage, elapsed)
+                    first_stage = None
+            yield item
+    finally:
+        record_stage(pipeline, stage, elapsed)
+
+
+@contextmanager
+def startup_phase(phase: str):
+    """
+    Time the enclosed import or initialization as a phase of this worker's startup (clients
+    created on first use record theirs when that happens); see startup_report
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_startup_phase(phase, time.perf_counter() - start)
+
+
+def record_startup_phase(phase: str, seconds: float):
+    _startup_phases[phase] = seconds
+    STARTUP_SECONDS.labels(phase).set(seconds)
+    logger.info(f"Startup phase '{phase}' took {seconds:.3f}s")
+
+
+def startup_report() -> Dict[str, float]:
+    """Seconds spent in each startup phase timed so far"""
+    return dict(_startup_phases)
+
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    """Format stage timings as a Server-Timing header; repeated stages are summed"""
+    totals: Dict[str, float] = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
+
+
+def record_tokens(provider: str, input_tokens: int, output_tokens: int):
+    if input_tokens:
+        GENERATION_TOKENS.labels(provider, "input").inc(input_tokens)
+    if output_tokens:
+        GENERATION_TOKENS.labels(provider, "output").inc(output_tokens)
+
+
+class CacheCollector:
+    """Exports hit/miss counters and sizes of the caches, read from their stats() at scrape time"""
+
+    def __init__(self):
+        self.caches: Dict[str, Callable[[], Optional[dict]]] = {}
+
+    def collect(self):
+        hits = CounterMetricFamily("rag_cache_hits", "Cache hits", labels=["cache"])
+        misses = CounterMetricFamily("rag_cache_misses", "Cache misses", labels=["cache"])
+        hit_ratio = GaugeMetricFamily("rag_cache_hit_ratio", "Cache hit ratio since start", labels=["cache"])
+        entries = GaugeMetricFamily("rag_cache_entries", "Entries currently cached", labels=["cache"])
+        for name, get_stats in self.caches.items():
+            stats = get_stats()
+            if stats is None:
+                continue
+            hits.add_metric([name], stats.get("hits", stats.get("memory_hits", 0) + stats.get("disk_hits", 0)))
+            misses.add_metric([name], stats["misses"])
+            hit_ratio.add_metric([name], stats["hit_rate"])
+            entries.add_metric([name], stats["entries"])
+        yield from (hits, misses, hit_ratio, entries)
+
+
+CACHES = CacheCollector()
+REGISTRY.register(CACHES)
+
+
+def watch_cache(name: str, cache):
+    """Export a cache's stats() on /metrics (a None cache is skipped)"""
+    CACHES.caches[name] = lambda: cache.stats() if cache is not None else None
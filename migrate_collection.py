@@ -0,0 +1,47 @@
+"""
+Re-create the Qdrant collection under the current schema (vector size, BM25 sparse vectors,
+quantization, on-disk vectors, HNSW parameters) and switch the collection alias to it.
+
+Documents uploaded while the copy runs are carried over, but the migration refuses to start while
+the API server's ingestion queue has queued or running jobs.
+
+Usage: python migrate_collection.py [--drop-old] [--reembed] [--api-url URL] [--force]
+"""
+import argparse
+import logging
+import httpx
+from config import Config
+from qdrant_manager import QdrantManager
+from local_embedding_manager import get_embedding_manager
+
+
+def ingestion_busy(api_url: str) -> bool:
+    """Whether the API server has ingestion jobs queued or running; False if no server answers"""
+    try:
+        response = httpx.get(f"{api_url.rstrip('/')}/ingestion/stats", timeout=10)
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        logging.warning(f"Could not check the ingestion queue at {api_url}: {e}")
+        return False
+    stats = response.json()
+    return bool(stats["queued"] or stats["jobs"].get("running"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drop-old", action="store_true", help="Delete the previous collection after the switch")
+    parser.add_argument("--reembed", action="store_true",
+                        help="Re-embed every chunk with the configured embedding backend, e.g. after switching models")
+    parser.add_argument("--api-url", default="http://localhost:8000",
+                        help="API server whose ingestion queue must be idle (default: http://localhost:8000)")
+    parser.add_argument("--force", action="store_true", help="Migrate even while documents are being ingested")
+    args = parser.parse_args()
+    if Config.VECTOR_STORE != "qdrant":
+        parser.error("Only Qdrant collections can be migrated; delete the local index and re-ingest instead")
+
+    logging.basicConfig(level=logging.INFO)
+    if not args.force and ingestion_busy(args.api_url):
+        parser.error("Documents are being ingested; wait until the ingestion queue is empty or pass --force")
+    new_name = QdrantManager().migrate_collection(embedder=get_embedding_manager(), drop_old=args.drop_old,
+                                                  reembed=args.reembed)
+    print(f"Collection migrated to '{new_name}'")
@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+from config import Config
+from metrics import PROVIDER_CIRCUIT_OPEN, PROVIDER_EVENTS, timed, timed_aiter
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing provider. After failure_threshold consecutive failures the circuit
+    opens and calls are refused for reset_seconds; then it is half-open and lets a single probe
+    call through, whose outcome closes the circuit again or reopens it for another period.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = None, reset_seconds: float = None):
+        self.name = name
+        self.failure_threshold = failure_threshold or Config.CIRCUIT_FAILURE_THRESHOLD
+        self.reset_seconds = Config.CIRCUIT_RESET_SECONDS if reset_seconds is None else reset_seconds
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; in the half-open state this claims the single probe"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.probe_in_flight:
+            self.probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info(f"Circuit for {self.name} closed")
+            PROVIDER_CIRCUIT_OPEN.labels(self.name).set(0)
+        self.failures = 0
+        self.opened_at = None
+        self.probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.probe_in_flight or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(f"Circuit for {self.name} opened after {self.failures} consecutive failures")
+                PROVIDER_EVENTS.labels(self.name, "circuit_open").inc()
+                PROVIDER_CIRCUIT_OPEN.labels(self.name).set(1)
+            self.opened_at = time.monotonic()
+        self.probe_in_flight = False
+
+    def release(self):
+        """Give back a probe whose call was abandoned without an outcome (e.g. a cancelled hedge)"""
+        self.probe_in_flight = False
+
+
+class LatencyWindow:
+    """Latencies of a provider's most recent calls"""
+
+    def __init__(self, size: int = None):
+        self.samples = deque(maxlen=size or Config.ROUTER_LATENCY_WINDOW)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def p95(self) -> Optional[float]:
+        """95th percentile of the window, or None until ROUTER_MIN_SAMPLES calls were seen"""
+        if len(self.samples) < Config.ROUTER_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+
+class Provider:
+    def __init__(self, name: str, manager):
+        self.name = name
+        self.manager = manager
+        self.breaker = CircuitBreaker(name)
+        self.latency = LatencyWindow()
+
+
+class ProviderRouter:
+    """
+    Routes generation calls across providers (Cohere, Gemini) given as {name: manager}, each with
+    a generate_response(prompt, history) method. Providers are tried in order of preference: with
+    ROUTER_POLICY=preferred the provider the request asked for comes first, with "latency" the one
+    with the lowest live p95. A call that fails falls back to the next provider, and providers
+    whose circuit breaker is open are skipped.
+    """
+
+    def __init__(self, managers: Dict[str, object]):
+        self.providers = [Provider(name, manager) for name, manager in managers.items() if manager is not None]
+        if not self.providers:
+            logger.warning("No generation provider is configured (set COHERE_API_KEY or GEMINI_API_KEY)")
+
+    def unavailable(self) -> Exception:
+        """The error for a call no provider could be tried for"""
+        if not self.providers:
+            return Exception("No generation provider is configured (set COHERE_API_KEY or GEMINI_API_KEY)")
+        return Exception("No generation provider available (all circuits open)")
+
+    def candidates(self, preferred: str = None) -> List[Provider]:
+        """Providers in the order they should be tried (circuit state is checked when calling)"""
+        providers = list(self.providers)
+        if Config.ROUTER_POLICY == "latency":
+            # Providers without enough samples yet sort first, so every provider gets measured
+            providers.sort(key=lambda provider: provider.latency.p95() or 0.0)
+        elif Config.ROUTER_POLICY == "preferred":
+            providers.sort(key=lambda provider: provider.name != preferred)
+        else:
+            raise ValueError(f"Unknown router policy: {Config.ROUTER_POLICY}")
+        return providers
+
+    def generate(self, prompt: str, preferred: str = None, history: List[dict] = None) -> Tuple[str, str]:
+        """
+        Generate a response following the conversation's earlier turns (history), returning it
+        with the name of the provider that produced it
+        """
+        last_error = None
+        for provider in self.candidates(preferred):
+            if not provider.breaker.allow():
+                continue
+            if last_error is not None:
+                PROVIDER_EVENTS.labels(provider.name, "fallback").inc()
+            start = time.perf_counter()
+            try:
+                with timed("chat", f"generate_{provider.name}"):
+                    answer = provider.manager.generate_response(prompt, history)
+            except Exception as e:
+                provider.breaker.record_failure()
+                PROVIDER_EVENTS.labels(provider.name, "failure").inc()
+                logger.warning(f"Generation with {provider.name} failed: {str(e)}")
+                last_error = e
+                continue
+            provider.latency.record(time.perf_counter() - start)
+            provider.breaker.record_success()
+            return answer, provider.name
+        raise last_error or self.unavailable()
+
+    def stats(self) -> dict:
+        return {
+            provider.name: {
+                "circuit": provider.breaker.state,
+                "consecutive_failures": provider.breaker.failures,
+                "p95_ms": None if provider.latency.p95() is None else 1000 * provider.latency.p95(),
+                "samples": len(provider.latency.samples),
+            }
+            for provider in self.providers
+        }
+
+
+class AsyncProviderRouter(ProviderRouter):
+    """
+    Asyncio counterpart of ProviderRouter that can also hedge: with ROUTER_HEDGE, if the first
+    provider hasn't answered within ROUTER_HEDGE_DELAY_MS (0 means its live p95), the next one is
+    called as well, and whichever answers first wins while the other call is cancelled.
+    """
+
+    def hedge_delay(self, provider: Provider) -> Optional[float]:
+        """Seconds to wait on provider before hedging, or None to not hedge"""
+        if not Config.ROUTER_HEDGE:
+            return None
+        if Config.ROUTER_HEDGE_DELAY_MS > 0:
+            return Config.ROUTER_HEDGE_DELAY_MS / 1000
+        return provider.latency.p95()
+
+    async def _call(self, provider: Provider, prompt: str, history: List[dict] = None) -> str:
+        start = time.perf_counter()
+        try:
+            with timed("chat", f"generate_{provider.name}"):
+                answer = await provider.manager.generate_response(prompt, history)
+        except asyncio.CancelledError:
+            # Only counted: the time until the other call won is not this provider's latency, and
+            # would drag its p95 (and so the hedge delay) down
+            PROVIDER_EVENTS.labels(provider.name, "cancelled").inc()
+            provider.breaker.release()
+            raise
+        except Exception as e:
+            provider.breaker.record_failure()
+            PROVIDER_EVENTS.labels(provider.name, "failure").inc()
+            logger.warning(f"Generation with {provider.name} failed: {str(e)}")
+            raise
+        provider.latency.record(time.perf_counter() - start)
+        provider.breaker.record_success()
+        return answer
+
+    async def generate(self, prompt: str, preferred: str = None, history: List[dict] = None) -> Tuple[str, str]:
+        """
+        Generate a response following the conversation's earlier turns (history), returning it
+        with the name of the provider that produced it
+        """
+        waiting = self.candidates(preferred)
+        in_flight: Dict[asyncio.Future, Provider] = {}
+        last_error = None
+
+        def launch(event: str = None) -> Optional[Provider]:
+            while waiting:
+                provider = waiting.pop(0)
+                if provider.breaker.allow():
+                    if event is not None:
+                        PROVIDER_EVENTS.labels(provider.name, event).inc()
+                    in_flight[asyncio.ensure_future(self._call(provider, prompt, history))] = provider
+                    return provider
+            return None
+
+        launch()
+        try:
+            while in_flight:
+                # Hedge on the provider now in flight, which is a fallback once the first one has failed
+                delay = self.hedge_delay(next(iter(in_flight.values()))) if waiting and len(in_flight) == 1 else None
+                done, _ = await asyncio.wait(in_flight, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    launch("hedge")
+                    continue
+                for task in done:
+                    provider = in_flight.pop(task)
+                    try:
+                        return task.result(), provider.name
+                    except Exception as e:
+                        last_error = e
+                        if not in_flight:
+                            launch("fallback")
+        finally:
+            for task in in_flight:
+                task.cancel()
+        raise last_error or self.unavailable()
+
+    async def stream(self, prompt: str, preferred: str = None, history: List[dict] = None):
+        """
+        Yield (text, provider name) pairs as the response is generated. A provider failing before its
+        first token falls back to the next one; once text has been sent the error is raised. Streams are not
+        hedged, since two half-sent answers can't be reconciled. The provider's latency sample is
+        its time to the first token.
+        """
+        last_error = None
+        for provider in self.candidates(preferred):
+            if not provider.breaker.allow():
+                continue
+            if last_error is not None:
+                PROVIDER_EVENTS.labels(provider.name, "fallback").inc()
+            upstream = provider.manager.stream_response(prompt, history)
+            # Time spent waiting on the provider, excluding the time the client takes to read each token
+            stream = timed_aiter(upstream, "chat", f"generate_{provider.name}", f"first_token_{provider.name}")
+            started = False
+            start = time.perf_counter()
+            try:
+                async for text in stream:
+                    if not started:
+                        provider.latency.record(time.perf_counter() - start)
+                        started = True
+                    yield text, provider.name
+            except Exception as e:
+                provider.breaker.record_failure()
+                PROVIDER_EVENTS.labels(provider.name, "failure").inc()
+                logger.warning(f"Streaming with {provider.name} failed: {str(e)}")
+                if started:
+                    raise
+                last_error = e
+                continue
+            finally:
+                # Also runs when the consumer stops early, without counting that as a failure
+                provider.breaker.release()
+                await stream.aclose()
+                await upstream.aclose()
+            provider.breaker.record_success()
+            return
+        raise last_error or self.unavailable()
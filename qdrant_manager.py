@@ -1,69 +1,604 @@
-from qdrant_client import QdrantClient
+import httpx
+from qdrant_client import QdrantClient, AsyncQdrantClient
 from qdrant_client.http import models
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Set
 import logging
+import time
 from config import Config
+from sparse_encoder import BM25Encoder, SparseVector
+from vector_store import AsyncVectorStore, SearchRequest, VectorStore
 
 logger = logging.getLogger(__name__)
 
-class QdrantManager:
-    def __init__(self):
-        # Initialize Qdrant client
-        self.client = QdrantClient(
-            url=Config.QDRANT_URL,
-            api_key=Config.QDRANT_API_KEY,
-            port=Config.QDRANT_PORT
+
+def client_options() -> Dict[str, Any]:
+    """
+    Qdrant client arguments: gRPC when preferred, and a keep-alive connection pool (the client
+    otherwise disables keep-alive for localhost and opens a connection per request)
+    """
+    return {
+        "url": Config.QDRANT_URL,
+        "api_key": Config.QDRANT_API_KEY,
+        "port": Config.QDRANT_PORT,
+        "grpc_port": Config.QDRANT_GRPC_PORT,
+        "prefer_grpc": Config.QDRANT_PREFER_GRPC,
+        "limits": httpx.Limits(
+            max_connections=Config.QDRANT_POOL_SIZE,
+            max_keepalive_connections=Config.QDRANT_POOL_SIZE,
+            keepalive_expiry=Config.HTTP_KEEPALIVE_EXPIRY
+        ),
+    }
+
+
+# Payload fields that searches filter on. Indexed fields are filtered during the HNSW traversal
+# instead of by post-filtering; the tenant index additionally co-locates each tenant's points.
+PAYLOAD_INDEXES = {
+    "tenant": models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True),
+    "source": models.PayloadSchemaType.KEYWORD,
+    "page": models.PayloadSchemaType.INTEGER,
+    "chunk_index": models.PayloadSchemaType.INTEGER,
+    "uploaded_at": models.PayloadSchemaType.INTEGER,
+}
+
+
+def tenant_condition(tenant: Optional[str]) -> models.Condition:
+    """Condition matching one tenant's points, or the points stored without a tenant"""
+    if tenant is None:
+        return models.IsEmptyCondition(is_empty=models.PayloadField(key="tenant"))
+    return models.FieldCondition(key="tenant", match=models.MatchValue(value=tenant))
+
+
+def source_filter(source: str, tenant: Optional[str] = None) -> models.Filter:
+    """Filter matching the points of one source document of a tenant"""
+    return models.Filter(
+        must=[models.FieldCondition(key="source", match=models.MatchValue(value=source)), tenant_condition(tenant)]
+    )
+
+
+def search_filter(filters: Optional[Dict[str, Any]]) -> Optional[models.Filter]:
+    """
+    Build the search filter for a request's filters: "tenant", "sources" (any of a list of
+    source names) and an "uploaded_after" / "uploaded_before" range of Unix timestamps
+    """
+    if not filters:
+        return None
+    must = []
+    if filters.get("tenant") is not None:
+        must.append(tenant_condition(filters["tenant"]))
+    if filters.get("sources"):
+        must.append(models.FieldCondition(key="source", match=models.MatchAny(any=list(filters["sources"]))))
+    if filters.get("uploaded_after") is not None or filters.get("uploaded_before") is not None:
+        must.append(models.FieldCondition(key="uploaded_at", range=models.Range(
+            gte=filters.get("uploaded_after"), lte=filters.get("uploaded_before")
+        )))
+    return models.Filter(must=must) if must else None
+
+
+def collection_params() -> Dict[str, Any]:
+    """
+    Collection schema for the active embedding model: vector size from Config.EMBEDDING_DIMENSION,
+    HNSW parameters, optional on-disk original vectors and optional scalar/binary quantization
+    """
+    quantization_config = None
+    if Config.QUANTIZATION == "scalar":
+        quantization_config = models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(
+                type=models.ScalarType.INT8,
+                quantile=0.99,
+                always_ram=True
+            )
         )
+    elif Config.QUANTIZATION == "binary":
+        quantization_config = models.BinaryQuantization(
+            binary=models.BinaryQuantizationConfig(always_ram=True)
+        )
+    elif Config.QUANTIZATION != "none":
+        raise ValueError(f"Unknown QUANTIZATION: {Config.QUANTIZATION}. Use none, scalar or binary.")
+
+    # BM25 sparse vectors; Qdrant applies the IDF weighting at query time
+    sparse_vectors_config = None
+    if Config.HYBRID_SEARCH:
+        sparse_vectors_config = {
+            Config.SPARSE_VECTOR_NAME: models.SparseVectorParams(modifier=models.Modifier.IDF)
+        }
+
+    return {
+        "vectors_config": models.VectorParams(
+            size=Config.EMBEDDING_DIMENSION,
+            distance=models.Distance.COSINE,
+            on_disk=Config.VECTORS_ON_DISK
+        ),
+        "sparse_vectors_config": sparse_vectors_config,
+        "hnsw_config": models.HnswConfigDiff(m=Config.HNSW_M, ef_construct=Config.HNSW_EF_CONSTRUCT),
+        "quantization_config": quantization_config,
+    }
+
+
+def search_params() -> Optional[models.SearchParams]:
+    """
+    Search parameters: with quantization, oversample candidates from the quantized index and
+    rescore them with the original vectors
+    """
+    if Config.QUANTIZATION == "none":
+        return None
+    return models.SearchParams(
+        quantization=models.QuantizationSearchParams(
+            rescore=Config.SEARCH_RESCORE,
+            oversampling=Config.SEARCH_OVERSAMPLING
+        )
+    )
+
+
+def versioned_collection_name(alias: str) -> str:
+    """Name for a new physical collection behind the alias"""
+    return f"{alias}_{time.strftime('%Y%m%d%H%M%S')}"
+
+
+def vector_size(collection_info) -> int:
+    """Dimension of the (unnamed) dense vector of a collection"""
+    return collection_info.config.params.vectors.size
+
+
+def has_sparse_vectors(collection_info) -> bool:
+    """Whether a collection stores the BM25 sparse vectors used for hybrid search"""
+    return Config.SPARSE_VECTOR_NAME in (collection_info.config.params.sparse_vectors or {})
+
+
+def point_batch(ids: List[str], vectors: List[List[float]], payloads: List[Dict[str, Any]],
+                sparse_vectors: Optional[List[SparseVector]] = None) -> models.Batch:
+    """Build an upsert batch, adding the sparse vectors next to the dense ones when given"""
+    if sparse_vectors is None:
+        return models.Batch(ids=ids, vectors=vectors, payloads=payloads)
+    return models.Batch(
+        ids=ids,
+        vectors={
+            "": vectors,
+            Config.SPARSE_VECTOR_NAME: [
+                models.SparseVector(indices=indices, values=values) for indices, values in sparse_vectors
+            ],
+        },
+        payloads=payloads
+    )
+
+
+def set_payload_batches(ids: List[str], payloads: List[Dict[str, Any]],
+                        batch_size: int = 1000) -> Iterator[List[models.SetPayloadOperation]]:
+    """Per-point payload updates, grouped into batch_update_points requests of batch_size operations"""
+    for start in range(0, len(ids), batch_size):
+        yield [
+            models.SetPayloadOperation(set_payload=models.SetPayload(payload=payload, points=[point_id]))
+            for point_id, payload in zip(ids[start:start + batch_size], payloads[start:start + batch_size])
+        ]
+
+
+def query_request(query_vector: List[float], limit: int, sparse_query: Optional[SparseVector],
+                  query_filter: Optional[models.Filter] = None) -> Dict[str, Any]:
+    """
+    query_points arguments: a plain dense search, or with a sparse query, dense and BM25 candidates
+    prefetched in the same request and merged server-side with reciprocal-rank fusion. The filter
+    is applied inside each prefetch, so both candidate lists only hold matching points.
+    """
+    if not sparse_query or not sparse_query[0]:
+        return {"query": query_vector, "limit": limit, "search_params": search_params(), "query_filter": query_filter}
+    indices, values = sparse_query
+    prefetch_limit = max(limit, Config.HYBRID_PREFETCH_LIMIT)
+    return {
+        "prefetch": [
+            models.Prefetch(query=query_vector, limit=prefetch_limit, params=search_params(), filter=query_filter),
+            models.Prefetch(
+                query=models.SparseVector(indices=indices, values=values),
+                using=Config.SPARSE_VECTOR_NAME,
+                limit=prefetch_limit,
+                filter=query_filter
+            ),
+        ],
+        "query": models.FusionQuery(fusion=models.Fusion.RRF),
+        "limit": limit,
+        "query_filter": query_filter,
+    }
+
+
+def batch_query_request(query_vector: List[float], limit: int, sparse_query: Optional[SparseVector],
+                        query_filter: Optional[models.Filter] = None) -> models.QueryRequest:
+    """The same search as query_request, as one entry of a query_batch_points call"""
+    request = query_request(query_vector, limit, sparse_query, query_filter)
+    return models.QueryRequest(params=request.pop("search_params", None), filter=request.pop("query_filter"),
+                               with_payload=True, **request)
+
+
+class QdrantRequests:
+    """
+    Collection state and request building shared by QdrantManager and AsyncQdrantManager, which
+    only send the requests with their blocking or async client
+    """
+    client_class = QdrantClient
+
+    def __init__(self, client=None):
+        super().__init__()
+        # Initialize the Qdrant client, unless a shared one is given
+        self.client = client or self.client_class(**client_options())
         self.collection_name = Config.COLLECTION_NAME
-    
+        # Whether the collection stores sparse vectors; confirmed by create_collection
+        self.sparse_enabled = Config.HYBRID_SEARCH
+
+    def _alias_target(self, aliases) -> Optional[str]:
+        """The physical collection the collection alias points to in a get_aliases response, if any"""
+        for alias in aliases.aliases:
+            if alias.alias_name == self.collection_name:
+                return alias.collection_name
+        return None
+
+    def _alias_request(self, physical_name: str, replace: bool = False) -> Dict[str, Any]:
+        """update_collection_aliases arguments pointing the alias to physical_name, atomically replacing it if it exists"""
+        operations = [models.CreateAliasOperation(create_alias=models.CreateAlias(
+            collection_name=physical_name, alias_name=self.collection_name
+        ))]
+        if replace:
+            operations.insert(0, models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=self.collection_name)))
+        return {"change_aliases_operations": operations}
+
+    def _opened(self, collection_info):
+        """Adopt the schema of the existing collection, warning about what doesn't match the configuration"""
+        self.sparse_enabled = Config.HYBRID_SEARCH and has_sparse_vectors(collection_info)
+        if Config.HYBRID_SEARCH and not self.sparse_enabled:
+            logger.warning(f"Collection '{self.collection_name}' has no sparse vectors; hybrid search is "
+                           f"disabled until it is re-created with migrate_collection.py")
+        if vector_size(collection_info) != Config.EMBEDDING_DIMENSION:
+            logger.warning(
+                f"Collection '{self.collection_name}' stores {vector_size(collection_info)}-dim vectors but "
+                f"{Config.ACTIVE_EMBEDDING_MODEL} produces {Config.EMBEDDING_DIMENSION}-dim vectors; "
+                f"run migrate_collection.py to re-create it"
+            )
+
+    @staticmethod
+    def _missing_payload_indexes(collection_name: str, payload_schema: Optional[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """create_payload_index arguments for each of the PAYLOAD_INDEXES not in payload_schema"""
+        for field_name, field_schema in PAYLOAD_INDEXES.items():
+            if field_name not in (payload_schema or {}):
+                yield {"collection_name": collection_name, "field_name": field_name, "field_schema": field_schema}
+
+    def _upsert_request(self, vectors: List[List[float]], payloads: List[Dict[str, Any]], ids: List[str],
+                        sparse_vectors: Optional[List[SparseVector]] = None) -> Dict[str, Any]:
+        return {
+            "collection_name": self.collection_name,
+            "points": point_batch(ids, vectors, payloads, sparse_vectors if self.sparse_enabled else None),
+        }
+
+    def _query_request(self, query_vector: List[float], limit: int, sparse_query: Optional[SparseVector],
+                       filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "collection_name": self.collection_name,
+            "with_payload": True,
+            **query_request(query_vector, limit, sparse_query if self.sparse_enabled else None, search_filter(filters)),
+        }
+
+    def _batch_query_request(self, requests: List[SearchRequest]) -> Dict[str, Any]:
+        return {
+            "collection_name": self.collection_name,
+            "requests": [
+                batch_query_request(query_vector, limit, sparse_query if self.sparse_enabled else None, search_filter(filters))
+                for query_vector, limit, sparse_query, filters in requests
+            ],
+        }
+
+    def _source_ids_request(self, source: str, tenant: Optional[str], offset=None,
+                            collection_name: str = None) -> Dict[str, Any]:
+        """scroll arguments for a page of the IDs of a tenant's source"""
+        return {
+            "collection_name": collection_name or self.collection_name,
+            "scroll_filter": source_filter(source, tenant),
+            "limit": 1000,
+            "offset": offset,
+            "with_payload": False,
+            "with_vectors": False,
+        }
+
+    def _set_payload_requests(self, ids: List[str], payloads: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for operations in set_payload_batches(ids, payloads):
+            yield {"collection_name": self.collection_name, "update_operations": operations}
+
+    def _delete_request(self, ids: List[str], collection_name: str = None) -> Dict[str, Any]:
+        return {"collection_name": collection_name or self.collection_name, "points_selector": models.PointIdsList(points=ids)}
+
+
+class QdrantManager(QdrantRequests, VectorStore):
+    def _resolve_alias(self) -> Optional[str]:
+        """Return the physical collection the collection alias points to, if it is an alias"""
+        return self._alias_target(self.client.get_aliases())
+
     def create_collection(self):
-        """Create the collection if it doesn't exist"""
-        try:
-            self.client.get_collection(self.collection_name)
+        """
+        Create the collection if it doesn't exist. New collections are created under a versioned
+        physical name with COLLECTION_NAME as an alias, so they can later be migrated with an alias swap.
+        """
+        # Only a missing collection is created: any other error propagates rather than
+        # repointing the alias away from the existing data
+        if self.client.collection_exists(self.collection_name):
             logger.info(f"Collection '{self.collection_name}' already exists")
-        except:
-            # Create collection with vector size of 4096 (Cohere's embedding dimension)
-            self.client.create_collection(
-                collection_name=self.collection_name,
-                vectors_config=models.VectorParams(size=4096, distance=models.Distance.COSINE),
-            )
-            logger.info(f"Created collection '{self.collection_name}'")
-    
-    def insert_vectors(self, vectors: List[List[float]], payloads: List[Dict[str, Any]], ids: List[str]):
-        """Insert vectors into the collection"""
-        self.client.upsert(
-            collection_name=self.collection_name,
-            points=models.Batch(
-                ids=ids,
-                vectors=vectors,
-                payloads=payloads
+        else:
+            physical_name = versioned_collection_name(self.collection_name)
+            self.client.create_collection(collection_name=physical_name, **collection_params())
+            self.client.update_collection_aliases(**self._alias_request(physical_name))
+            logger.info(f"Created collection '{physical_name}' with alias '{self.collection_name}'")
+
+        collection_info = self.client.get_collection(self.collection_name)
+        self.create_payload_indexes(self.collection_name, collection_info.payload_schema)
+        self._opened(collection_info)
+
+    def create_payload_indexes(self, collection_name: str, payload_schema: Optional[Dict[str, Any]] = None):
+        """
+        Create the PAYLOAD_INDEXES missing from a collection (payload_schema lists the existing ones).
+        An index that already exists, e.g. created meanwhile by another worker, is left as it is.
+        """
+        for request in self._missing_payload_indexes(collection_name, payload_schema):
+            try:
+                self.client.create_payload_index(**request)
+            except Exception:
+                if request["field_name"] not in self.client.get_collection(collection_name).payload_schema:
+                    raise
+                logger.info(f"Payload index on '{request['field_name']}' already exists")
+                continue
+            logger.info(f"Created payload index on '{request['field_name']}'")
+
+    def migrate_collection(self, embedder=None, batch_size: int = 256, drop_old: bool = False,
+                           reembed: bool = False, catch_up_passes: int = 3) -> str:
+        """
+        Re-create the collection under the current schema: build a new physical collection, copy
+        every point into it, then repoint the alias. Vectors are copied as-is unless the dimension
+        changed or reembed is set (e.g. after switching embedding models), in which case they are
+        re-embedded from their content with embedder.
+        Documents ingested while the copy runs are carried over by catch-up passes over the points
+        uploaded since the previous pass, which also drop the chunks those re-uploads removed.
+        Documents written after the last pass, or whose ingestion started before the migration,
+        can still be missed, so migrate_collection.py refuses to run while ingestion is busy.
+        """
+        old_name = self._resolve_alias() or self.collection_name
+        old_size = vector_size(self.client.get_collection(old_name))
+        reembed = reembed or old_size != Config.EMBEDDING_DIMENSION
+        if reembed and embedder is None:
+            raise ValueError(f"Re-embedding {old_size}-dim vectors as {Config.EMBEDDING_DIMENSION}-dim vectors requires an embedder")
+
+        new_name = versioned_collection_name(self.collection_name)
+        self.client.create_collection(collection_name=new_name, **collection_params())
+        self.create_payload_indexes(new_name)
+        logger.info(f"Migrating '{old_name}' to '{new_name}' ({'re-embedding' if reembed else 'copying vectors'})")
+
+        since = int(time.time())
+        self._copy_points(old_name, new_name, embedder if reembed else None, batch_size)
+        for _ in range(catch_up_passes):
+            pass_started = int(time.time())
+            if not self._catch_up(old_name, new_name, since, embedder if reembed else None, batch_size):
+                break
+            since = pass_started
+
+        if old_name != self.collection_name:
+            # Atomic switch: readers see either the old or the new collection, never neither
+            self.client.update_collection_aliases(**self._alias_request(new_name, replace=True))
+        else:
+            # A legacy collection occupies the alias name, so it can only be dropped once the new
+            # collection holds all of its points; the name doesn't resolve until the alias exists
+            self.client.delete_collection(old_name)
+            try:
+                self.client.update_collection_aliases(**self._alias_request(new_name))
+            except Exception:
+                logger.error(f"Deleted '{old_name}' but could not create its alias; the points are in '{new_name}'")
+                raise
+        logger.info(f"Alias '{self.collection_name}' now points to '{new_name}'")
+
+        if drop_old and old_name != self.collection_name:
+            self.client.delete_collection(old_name)
+            logger.info(f"Deleted previous collection '{old_name}'")
+        return new_name
+
+    def _copy_points(self, old_name: str, new_name: str, embedder=None, batch_size: int = 256,
+                     scroll_filter: Optional[models.Filter] = None, documents: Optional[set] = None) -> int:
+        """
+        Copy the points of old_name matching scroll_filter into new_name, re-embedding their
+        content with embedder if given; returns the number of points copied and adds the
+        (source, tenant) of each to documents, if given
+        """
+        sparse_encoder = BM25Encoder() if Config.HYBRID_SEARCH else None
+        copied = 0
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=old_name,
+                scroll_filter=scroll_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=[""] if embedder is None else False
             )
-        )
+            if points:
+                contents = [point.payload.get("content", "") for point in points]
+                if embedder is not None:
+                    # A scroll page can exceed the embedding API's per-request limit
+                    vectors = [
+                        vector
+                        for start in range(0, len(contents), Config.EMBED_BATCH_SIZE)
+                        for vector in embedder.embed_texts(contents[start:start + Config.EMBED_BATCH_SIZE])
+                    ]
+                else:
+                    # Collections with sparse vectors return named vectors; the dense one is unnamed
+                    vectors = [point.vector.get("") if isinstance(point.vector, dict) else point.vector for point in points]
+                sparse_vectors = [sparse_encoder.encode_document(content) for content in contents] if sparse_encoder else None
+                self.client.upsert(
+                    collection_name=new_name,
+                    points=point_batch([point.id for point in points], vectors, [point.payload for point in points], sparse_vectors)
+                )
+                if documents is not None:
+                    documents.update((point.payload.get("source"), point.payload.get("tenant")) for point in points)
+                copied += len(points)
+                logger.info(f"Migrated {copied} points")
+            if offset is None:
+                return copied
+
+    def _catch_up(self, old_name: str, new_name: str, since: int, embedder=None, batch_size: int = 256) -> int:
+        """
+        Copy the points uploaded to old_name since the given time into new_name, and delete the
+        chunks of those documents that old_name no longer has; returns the number of points copied
+        """
+        uploaded_since = models.Filter(must=[
+            models.FieldCondition(key="uploaded_at", range=models.Range(gte=since))
+        ])
+        documents = set()
+        copied = self._copy_points(old_name, new_name, embedder, batch_size, uploaded_since, documents)
+        for source, tenant in documents:
+            stale_ids = (self._source_point_ids(new_name, source, tenant)
+                         - self._source_point_ids(old_name, source, tenant))
+            if stale_ids:
+                self.client.delete(**self._delete_request(list(stale_ids), new_name))
+        logger.info(f"Caught up {copied} points of {len(documents)} documents uploaded during the migration")
+        return copied
+
+    def _source_point_ids(self, collection_name: str, source: str, tenant: Optional[str] = None) -> Set[str]:
+        """Return the IDs of all points stored in a collection for a tenant's source"""
+        point_ids = set()
+        offset = None
+        while True:
+            points, offset = self.client.scroll(**self._source_ids_request(source, tenant, offset, collection_name))
+            point_ids.update(str(point.id) for point in points)
+            if offset is None:
+                return point_ids
+
+    def insert_vectors(self, vectors: List[List[float]], payloads: List[Dict[str, Any]], ids: List[str],
+                       sparse_vectors: Optional[List[SparseVector]] = None):
+        """Insert vectors (and their BM25 sparse vectors, if given) into the collection"""
+        self.client.upsert(**self._upsert_request(vectors, payloads, ids, sparse_vectors))
         logger.info(f"Inserted {len(vectors)} vectors into collection")
-    
-    def search_vectors(self, query_vector: List[float], limit: int = 5):
-        """Search for similar vectors in the collection"""
-        search_results = self.client.search(
-            collection_name=self.collection_name,
-            query_vector=query_vector,
-            limit=limit,
-            with_payload=True
-        )
-        return search_results
-    
+
+    def search_vectors(self, query_vector: List[float], limit: int = 5, sparse_query: Optional[SparseVector] = None,
+                       filters: Optional[Dict[str, Any]] = None):
+        """
+        Search for similar vectors in the collection, fused with BM25 matches when sparse_query is
+        given, among the points matching filters (see search_filter)
+        """
+        return self.client.query_points(**self._query_request(query_vector, limit, sparse_query, filters)).points
+
+    def search_batch(self, requests: List[SearchRequest]) -> List[list]:
+        """Run several (query_vector, limit, sparse_query, filters) searches in one request"""
+        responses = self.client.query_batch_points(**self._batch_query_request(requests))
+        return [response.points for response in responses]
+
+    def get_source_point_ids(self, source: str, tenant: Optional[str] = None) -> Set[str]:
+        """Return the IDs of all points stored for a tenant's source (its chunk manifest)"""
+        return self._source_point_ids(self.collection_name, source, tenant)
+
+    def set_payload(self, ids: List[str], payloads: List[Dict[str, Any]]):
+        """Merge fields into the payloads of existing points, keeping their vectors"""
+        for request in self._set_payload_requests(ids, payloads):
+            self.client.batch_update_points(**request)
+        logger.info(f"Updated the payloads of {len(ids)} points")
+
+    def delete_points(self, ids: List[str]):
+        """Delete points by ID"""
+        self.client.delete(**self._delete_request(ids))
+        logger.info(f"Deleted {len(ids)} vectors from collection")
+
     def delete_collection(self):
         """Delete the collection (useful for testing/resetting)"""
         try:
-            self.client.delete_collection(self.collection_name)
+            self.client.delete_collection(self._resolve_alias() or self.collection_name)
             logger.info(f"Deleted collection '{self.collection_name}'")
         except Exception as e:
             logger.error(f"Error deleting collection: {e}")
-    
+
     def get_collection_info(self):
         """Get information about the collection"""
         try:
-            collection_info = self.client.get_collection(self.collection_name)
-            return collection_info
+            return self.client.get_collection(self.collection_name)
+        except Exception as e:
+            logger.error(f"Error getting collection info: {e}")
+            return None
+
+
+class AsyncQdrantManager(QdrantRequests, AsyncVectorStore):
+    client_class = AsyncQdrantClient
+
+    async def _resolve_alias(self) -> Optional[str]:
+        """Return the physical collection the collection alias points to, if it is an alias"""
+        return self._alias_target(await self.client.get_aliases())
+
+    async def create_collection(self):
+        """
+        Create the collection if it doesn't exist, under a versioned physical name with
+        COLLECTION_NAME as an alias (see QdrantManager.create_collection)
+        """
+        # Only a missing collection is created: any other error propagates rather than
+        # repointing the alias away from the existing data
+        if await self.client.collection_exists(self.collection_name):
+            logger.info(f"Collection '{self.collection_name}' already exists")
+        else:
+            physical_name = versioned_collection_name(self.collection_name)
+            await self.client.create_collection(collection_name=physical_name, **collection_params())
+            await self.client.update_collection_aliases(**self._alias_request(physical_name))
+            logger.info(f"Created collection '{physical_name}' with alias '{self.collection_name}'")
+
+        collection_info = await self.client.get_collection(self.collection_name)
+        await self.create_payload_indexes(self.collection_name, collection_info.payload_schema)
+        self._opened(collection_info)
+
+    async def create_payload_indexes(self, collection_name: str, payload_schema: Optional[Dict[str, Any]] = None):
+        """Create the PAYLOAD_INDEXES missing from a collection (see QdrantManager.create_payload_indexes)"""
+        for request in self._missing_payload_indexes(collection_name, payload_schema):
+            try:
+                await self.client.create_payload_index(**request)
+            except Exception:
+                if request["field_name"] not in (await self.client.get_collection(collection_name)).payload_schema:
+                    raise
+                logger.info(f"Payload index on '{request['field_name']}' already exists")
+                continue
+            logger.info(f"Created payload index on '{request['field_name']}'")
+
+    async def insert_vectors(self, vectors: List[List[float]], payloads: List[Dict[str, Any]], ids: List[str],
+                             sparse_vectors: Optional[List[SparseVector]] = None):
+        """Insert vectors (and their BM25 sparse vectors, if given) into the collection"""
+        await self.client.upsert(**self._upsert_request(vectors, payloads, ids, sparse_vectors))
+        logger.info(f"Inserted {len(vectors)} vectors into collection")
+
+    async def search_vectors(self, query_vector: List[float], limit: int = 5, sparse_query: Optional[SparseVector] = None,
+                             filters: Optional[Dict[str, Any]] = None):
+        """Search for similar vectors in the collection (see QdrantManager.search_vectors)"""
+        return (await self.client.query_points(**self._query_request(query_vector, limit, sparse_query, filters))).points
+
+    async def search_batch(self, requests: List[SearchRequest]) -> List[list]:
+        """Run several (query_vector, limit, sparse_query, filters) searches in one request"""
+        responses = await self.client.query_batch_points(**self._batch_query_request(requests))
+        return [response.points for response in responses]
+
+    async def get_source_point_ids(self, source: str, tenant: Optional[str] = None) -> Set[str]:
+        """Return the IDs of all points stored for a tenant's source (its chunk manifest)"""
+        point_ids = set()
+        offset = None
+        while True:
+            points, offset = await self.client.scroll(**self._source_ids_request(source, tenant, offset))
+            point_ids.update(str(point.id) for point in points)
+            if offset is None:
+                return point_ids
+
+    async def set_payload(self, ids: List[str], payloads: List[Dict[str, Any]]):
+        """Merge fields into the payloads of existing points, keeping their vectors"""
+        for request in self._set_payload_requests(ids, payloads):
+            await self.client.batch_update_points(**request)
+        logger.info(f"Updated the payloads of {len(ids)} points")
+
+    async def delete_points(self, ids: List[str]):
+        """Delete points by ID"""
+        await self.client.delete(**self._delete_request(ids))
+        logger.info(f"Deleted {len(ids)} vectors from collection")
+
+    async def delete_collection(self):
+        """Delete the collection (useful for testing/resetting)"""
+        try:
+            await self.client.delete_collection(await self._resolve_alias() or self.collection_name)
+            logger.info(f"Deleted collection '{self.collection_name}'")
+        except Exception as e:
+            logger.error(f"Error deleting collection: {e}")
+
+    async def get_collection_info(self):
+        """Get information about the collection"""
+        try:
+            return await self.client.get_collection(self.collection_name)
         except Exception as e:
             logger.error(f"Error getting collection info: {e}")
-            return None
\ No newline at end of file
+            return None
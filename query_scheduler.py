@@ -0,0 +1,122 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from config import Config
+from vector_store import SearchRequest
+from sparse_encoder import SparseVector
+
+logger = logging.getLogger(__name__)
+
+
+class BatchStats:
+    """Batch-size distribution and queueing delay (submit to dispatch) of a MicroBatcher"""
+
+    def __init__(self):
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes = Counter()
+        self.total_delay = 0.0
+        self.max_delay = 0.0
+
+    def record(self, delays: List[float]):
+        self.batches += 1
+        self.items += len(delays)
+        self.batch_sizes[len(delays)] += 1
+        self.total_delay += sum(delays)
+        self.max_delay = max(self.max_delay, max(delays))
+
+    def as_dict(self) -> dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "average_batch_size": self.items / self.batches if self.batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "average_queue_delay_ms": 1000 * self.total_delay / self.items if self.items else 0.0,
+            "max_queue_delay_ms": 1000 * self.max_delay,
+        }
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent awaits into batches. Items submitted within max_wait_ms of the first
+    pending item (or until max_batch_size are pending) are handed to process_batch together,
+    and each caller gets the result at its own position.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], Awaitable[List[Any]]],
+                 max_batch_size: int = None, max_wait_ms: float = None):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size or Config.QUERY_BATCH_MAX_SIZE
+        self.max_wait = (Config.QUERY_BATCH_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms) / 1000
+        self.stats = BatchStats()
+        self._pending: List[Tuple[Any, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.perf_counter()))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        # Callers that were cancelled while waiting drop out of the batch
+        batch = [entry for entry in batch if not entry[1].done()]
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[Any, asyncio.Future, float]]):
+        dispatched = time.perf_counter()
+        self.stats.record([dispatched - enqueued for _, _, enqueued in batch])
+        try:
+            results = await self.process_batch([item for item, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+class QueryScheduler:
+    """
+    Coalesces the query embeddings and vector searches of concurrent chats: queries arriving
+    together are embedded with one embed_texts call, and their searches sent as one batched
+    Qdrant request, with every result fanned back out to the chat awaiting it.
+    """
+
+    def __init__(self, embedding_manager, qdrant_manager, max_batch_size: int = None, max_wait_ms: float = None):
+        self.embedding_manager = embedding_manager
+        self.qdrant_manager = qdrant_manager
+        self.embed_batcher = MicroBatcher(self._embed_batch, max_batch_size, max_wait_ms)
+        self.search_batcher = MicroBatcher(self._search_batch, max_batch_size, max_wait_ms)
+
+    async def embed_query(self, query: str) -> List[float]:
+        return await self.embed_batcher.submit(query)
+
+    async def search_vectors(self, query_vector: List[float], limit: int = 5, sparse_query: Optional[SparseVector] = None,
+                             filters: Optional[Dict[str, Any]] = None):
+        return await self.search_batcher.submit((query_vector, limit, sparse_query, filters))
+
+    async def _embed_batch(self, queries: List[str]) -> List[List[float]]:
+        return await self.embedding_manager.embed_texts(queries, input_type="search_query")
+
+    async def _search_batch(self, requests: List[SearchRequest]) -> list:
+        return await self.qdrant_manager.search_batch(requests)
+
+    def stats(self) -> dict:
+        return {"embed": self.embed_batcher.stats.as_dict(), "search": self.search_batcher.stats.as_dict()}
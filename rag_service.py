@@ -1,117 +1,604 @@
+import asyncio
+import contextvars
+import functools
+import hashlib
+import json
 import logging
-from typing import List, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 import uuid
 from config import Config
-from qdrant_manager import QdrantManager
-from document_processor import DocumentProcessor
-from cohere_manager import CohereManager
+from vector_store import get_vector_store
+from chunker import Chunk
+from context_builder import build_context
+from conversation_store import Conversation, ConversationStore, normalize_history, retrieval_query
+from document_processor import DocumentProcessor, shutdown_pdf_process_pool
+from cohere_manager import CohereManager, AsyncCohereManager
+from ingestion_pipeline import IngestionPipeline, AsyncIngestionPipeline
+from local_embedding_manager import get_embedding_manager
+from semantic_cache import CachedAnswer, SemanticAnswerCache
+from provider_router import ProviderRouter, AsyncProviderRouter
+from query_scheduler import QueryScheduler
+from sparse_encoder import BM25Encoder
+from metrics import timed, timed_iter
+from reranker import candidate_depth, get_reranker, needs_rerank, relative_cutoff, select_results
 
 logger = logging.getLogger(__name__)
 
+NO_CONTEXT_ANSWER = "I couldn't find any relevant information to answer your question. Please try uploading some documents first."
+
+
+def chunk_point_id(source: str, content_hash: str, tenant: Optional[str] = None) -> str:
+    """
+    Deterministic point ID for a chunk: the same content from the same source (of the same
+    tenant) always maps to the same UUID, so re-uploads overwrite rather than duplicate
+    """
+    key = f"{source}\x00{content_hash}" if tenant is None else f"{tenant}\x00{source}\x00{content_hash}"
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, key))
+
+
+def build_records(chunks, filename: str, sparse_encoder: BM25Encoder = None, tenant: Optional[str] = None,
+                  uploaded_at: Optional[int] = None):
+    """
+    Pair each chunk with its content-derived point ID, its payload and, when a sparse
+    encoder is given, its BM25 sparse vector. Chunks are Chunks, whose document offsets and
+    page are stored so neighbouring hits can be merged into one passage, or plain strings.
+    The payload also carries the tenant, the chunk's position in the document and the upload time.
+    """
+    uploaded_at = int(time.time()) if uploaded_at is None else uploaded_at
+    for chunk_index, chunk in enumerate(chunks):
+        text = chunk.text if isinstance(chunk, Chunk) else chunk
+        content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        payload = {
+            "content": text,
+            "source": filename,
+            "content_hash": content_hash,
+            "chunk_index": chunk_index,
+            "uploaded_at": uploaded_at,
+        }
+        if tenant is not None:
+            payload["tenant"] = tenant
+        if isinstance(chunk, Chunk):
+            payload["start"] = chunk.start
+            payload["end"] = chunk.end
+            if chunk.page is not None:
+                payload["page"] = chunk.page
+        sparse_vector = sparse_encoder.encode_document(text) if sparse_encoder is not None else None
+        yield chunk_point_id(filename, content_hash, tenant), payload, sparse_vector
+
+
+def filter_scope(filters: Optional[Dict[str, Any]]) -> str:
+    """Canonical form of search filters, so cached answers are only reused within the same scope"""
+    return json.dumps(filters, sort_keys=True) if filters else ""
+
+
+# Payload fields that can change while a chunk's content, and so its point ID, stays the same
+REFRESHED_FIELDS = ("chunk_index", "uploaded_at", "start", "end", "page")
+
+
+def changed_records(records, existing_ids: Set[str], seen_ids: Set[str], unchanged: Optional[Dict[str, dict]] = None):
+    """
+    Drop records that are already stored (unchanged chunks) or repeated within the document.
+    Every distinct point ID is added to seen_ids, so existing_ids - seen_ids are the stale points,
+    and the REFRESHED_FIELDS of each unchanged chunk to unchanged, if given, to update their payloads.
+    """
+    for record in records:
+        point_id = record[0]
+        if point_id in seen_ids:
+            continue
+        seen_ids.add(point_id)
+        if point_id not in existing_ids:
+            yield record
+        elif unchanged is not None:
+            payload = record[1]
+            unchanged[point_id] = {field: payload[field] for field in REFRESHED_FIELDS if field in payload}
+
+
+def build_prompt(context: str, query: str) -> str:
+    """
+    Prepare the generation prompt from the retrieved context and the user's question
+    """
+    return f"""
+            You are a helpful AI assistant. Use the following context to answer the user's question.
+            If the context doesn't contain the information needed to answer the question, say so.
+
+            Context:
+            {context}
+
+            Question: {query}
+
+            Answer:
+            """
+
+
+@dataclass
+class Chat:
+    """One chat request as it moves through retrieval and generation"""
+    query: str
+    provider: str  # the provider asked for; the router may fall back to another one
+    filters: Optional[Dict[str, Any]]
+    conversation: Optional[Conversation]
+    turns: List[dict]
+    search_query: str
+    query_embedding: Optional[List[float]] = None
+    search_results: Optional[list] = None
+    # Whether search_results were searched for rather than reused from the session
+    searched: bool = False
+
+    @property
+    def scope(self) -> str:
+        return filter_scope(self.filters)
+
+
+def is_fused(sparse_query) -> bool:
+    """Whether a search fuses dense and BM25 hits by rank (RRF), so its scores aren't similarities"""
+    return bool(sparse_query and sparse_query[0])
+
+
+def rerank_shortlist(candidates: list, fused: bool = False) -> Optional[list]:
+    """
+    The candidates worth reranking, best first, or None when the best hits already stand out
+    """
+    scores = [candidate.score for candidate in candidates]
+    if not needs_rerank(scores, fused):
+        return None
+    return candidates[:candidate_depth(scores, fused)]
+
+
+def select_unranked(candidates: list, fused: bool = False) -> list:
+    """
+    The search hits kept without reranking, filtered by relative score cutoff and token budget
+    """
+    scores = [candidate.score for candidate in candidates]
+    return select_results(candidates, scores, cutoff=relative_cutoff(scores, fused))
+
+
 class RAGService:
-    def __init__(self):
-        self.qdrant_manager = QdrantManager()
+    """
+    Blocking RAG service. The retrieval, caching, session and prompt logic lives here; the
+    async variant only overrides the calls that do I/O.
+    """
+
+    asynchronous = False
+    # Thread pool for blocking work (async service only)
+    executor = None
+
+    def __init__(self, qdrant_manager=None, cohere_manager=None, gemini_manager=None, embedding_manager=None):
+        self.qdrant_manager = qdrant_manager or get_vector_store(asynchronous=self.asynchronous)
         self.document_processor = DocumentProcessor()
-        self.cohere_manager = CohereManager()
+        self.cohere_manager = cohere_manager or (AsyncCohereManager() if self.asynchronous else CohereManager())
+        self.embedding_manager = embedding_manager or get_embedding_manager(self.cohere_manager,
+                                                                            asynchronous=self.asynchronous)
+        pipeline_class = AsyncIngestionPipeline if self.asynchronous else IngestionPipeline
+        self.ingestion_pipeline = pipeline_class(self.embedding_manager, self.qdrant_manager)
+        self.answer_cache = SemanticAnswerCache() if Config.SEMANTIC_CACHE_ENABLED else None
+        self.conversations = ConversationStore()
+        # BM25 vectors are only computed for a store that keeps them (not the local index)
+        self.sparse_encoder = BM25Encoder() if Config.HYBRID_SEARCH and self.store_sparse_enabled() else None
+        self.reranker = get_reranker(self.executor, asynchronous=self.asynchronous, cohere_manager=self.cohere_manager)
 
-        # Initialize Gemini manager if available
-        try:
-            from gemini_manager import GeminiManager
-            self.gemini_manager = GeminiManager()
-            self.gemini_available = True
-        except ImportError:
-            logger.warning("Gemini manager not available")
-            self.gemini_available = False
+        # Initialize Gemini manager if configured; its SDK is imported on first use
+        if gemini_manager is not None:
+            self.gemini_manager = gemini_manager
+        elif Config.GEMINI_API_KEY:
+            from gemini_manager import AsyncGeminiManager, GeminiManager, sdk_installed
+            manager_class = AsyncGeminiManager if self.asynchronous else GeminiManager
+            self.gemini_manager = manager_class() if sdk_installed() else None
+            if self.gemini_manager is None:
+                logger.warning("Gemini manager not available")
+        else:
             self.gemini_manager = None
+        self.gemini_available = self.gemini_manager is not None
+
+        # Only configured providers generate (without COHERE_API_KEY, embeddings may still be local)
+        cohere_manager = self.cohere_manager if getattr(self.cohere_manager, "configured", True) else None
+        router_class = AsyncProviderRouter if self.asynchronous else ProviderRouter
+        self.router = router_class({"cohere": cohere_manager, "gemini": self.gemini_manager})
+
+    def preferred_provider(self, use_gemini: bool) -> str:
+        return "gemini" if use_gemini and self.gemini_available else "cohere"
+
+    def store_sparse_enabled(self) -> bool:
+        """Whether the vector store keeps BM25 sparse vectors (a collection created without them doesn't)"""
+        return getattr(self.qdrant_manager, "sparse_enabled", False)
+
+    def active_sparse_encoder(self) -> Optional[BM25Encoder]:
+        """The BM25 encoder to encode chunks and queries with, or None when searching dense vectors only"""
+        return self.sparse_encoder if self.store_sparse_enabled() else None
 
-    def process_and_store_document(self, file_path: str, filename: str) -> dict:
+    def sparse_query(self, query: str):
         """
-        Process a document and store its embeddings in Qdrant
+        BM25 query vector for hybrid search, or None when searching dense vectors only
         """
-        try:
-            # Process document into chunks
-            chunks = self.document_processor.process_document(file_path, filename)
+        sparse_encoder = self.active_sparse_encoder()
+        return sparse_encoder.encode_query(query) if sparse_encoder is not None else None
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.embedding_manager.embed_query(query)
+
+    def search_vectors(self, query_embedding: List[float], limit: int, sparse_query=None,
+                       filters: Optional[Dict[str, Any]] = None) -> list:
+        return self.qdrant_manager.search_vectors(query_embedding, limit=limit, sparse_query=sparse_query,
+                                                  filters=filters)
+
+    def search(self, query: str, query_embedding: List[float], filters: Optional[Dict[str, Any]] = None) -> list:
+        """
+        Find the chunks to answer a query from. Without a reranker this is the top RETRIEVAL_LIMIT
+        hits; with one, a wider candidate set is retrieved and, unless the best hits already stand
+        out, reranked and filtered by score cutoff and token budget. Only chunks matching filters
+        (tenant, sources, upload time range) are searched.
+        """
+        sparse_query = self.sparse_query(query)
+        if self.reranker is None:
+            with timed("chat", "search"):
+                return self.search_vectors(query_embedding, Config.RETRIEVAL_LIMIT, sparse_query, filters)
 
-            # Prepare data for Qdrant
-            payloads = []
-            vectors = []
-            ids = []
+        with timed("chat", "search"):
+            candidates = self.search_vectors(query_embedding, Config.RERANK_CANDIDATES, sparse_query, filters)
+        shortlist = rerank_shortlist(candidates, is_fused(sparse_query))
+        if shortlist is None:
+            return select_unranked(candidates, is_fused(sparse_query))
+        with timed("chat", "rerank"):
+            rerank_scores = self.reranker.rerank(query, [candidate.payload.get("content", "") for candidate in shortlist])
+        return select_results(shortlist, rerank_scores)
 
-            for i, chunk in enumerate(chunks):
-                # Generate embedding using Cohere
-                embedding = self.cohere_manager.embed_texts([chunk], input_type="search_document")[0]
+    def _changed_records(self, file_path: str, filename: str, tenant: Optional[str], existing_ids: Set[str],
+                         seen_ids: Set[str], unchanged: Dict[str, dict]):
+        """
+        Lazily process a document into the records of its new or changed chunks
+        """
+        chunks = self.document_processor.iter_document_chunks(file_path, filename)
+        records = build_records(chunks, filename, self.active_sparse_encoder(), tenant)
+        records = changed_records(records, existing_ids, seen_ids, unchanged)
+        return timed_iter(records, "ingest", "parse_chunk")
 
-                payloads.append({
-                    "content": chunk,
-                    "source": filename,
-                })
-                vectors.append(embedding)
-                ids.append(str(uuid.uuid4()))  # Using UUIDs for proper Qdrant point IDs
+    def _stored(self, filename: str, seen_ids: Set[str], chunks_added: int, stale_ids: List[str]) -> dict:
+        """
+        Drop what an earlier version of the document made stale and summarise the upload
+        """
+        # Answers that cited a removed chunk are stale, and with new chunks so is every answer from an earlier
+        # version of this document; an edit that only removed chunks keeps the answers from the rest of it
+        if self.answer_cache is not None:
+            if stale_ids:
+                self.answer_cache.invalidate_point_ids(stale_ids)
+            if chunks_added:
+                self.answer_cache.invalidate_sources([filename])
+        # Chunks retrieved for conversations from an earlier version of this document are now stale
+        if chunks_added or stale_ids:
+            self.conversations.invalidate_sources([filename])
 
-            # Upload to Qdrant
-            self.qdrant_manager.insert_vectors(vectors, payloads, ids)
+        return {
+            "message": f"Successfully processed {filename}",
+            "chunks_indexed": len(seen_ids),
+            "chunks_added": chunks_added,
+            "chunks_unchanged": len(seen_ids) - chunks_added,
+            "chunks_removed": len(stale_ids)
+        }
 
-            return {
-                "message": f"Successfully processed {filename}",
-                "chunks_indexed": len(chunks)
-            }
+    def process_and_store_document(self, file_path: str, filename: str, tenant: Optional[str] = None) -> dict:
+        """
+        Process a document and store its embeddings in the vector store, as one of tenant's documents if given
+        """
+        try:
+            # Chunks already stored for this source of the tenant (from an earlier upload)
+            existing_ids = self.qdrant_manager.get_source_point_ids(filename, tenant)
+            seen_ids = set()
+            unchanged = {}
+            records = self._changed_records(file_path, filename, tenant, existing_ids, seen_ids, unchanged)
+
+            # Embed only new or changed chunks in batches and write each batch to the vector store as it
+            # completes, so only the batches in flight are held in memory
+            chunks_added = self.ingestion_pipeline.run(records)
+
+            # Unchanged chunks keep their vectors, but may have moved within the document
+            if unchanged:
+                self.qdrant_manager.set_payload(list(unchanged), list(unchanged.values()))
+
+            # Remove chunks that are no longer part of the document, after the new ones are in place
+            stale_ids = list(existing_ids - seen_ids)
+            if stale_ids:
+                self.qdrant_manager.delete_points(stale_ids)
+
+            return self._stored(filename, seen_ids, chunks_added, stale_ids)
 
         except Exception as e:
             logger.error(f"Error in process_and_store_document: {str(e)}")
             raise e
 
-    def retrieve_and_generate(self, query: str, use_gemini: bool = False) -> Tuple[str, List[str]]:
+    def _start_chat(self, query: str, use_gemini: bool, filters: Optional[Dict[str, Any]],
+                    history: Optional[List[dict]], session_id: Optional[str]) -> Chat:
+        """
+        A follow-up in a conversation, given as the client's history or kept server-side under
+        session_id, is searched for together with the previous question
+        """
+        conversation = self.conversations.session(session_id) if session_id else None
+        turns = conversation.history() if conversation is not None else normalize_history(history)
+        return Chat(query, self.preferred_provider(use_gemini), filters, conversation, turns, retrieval_query(turns, query))
+
+    def _cached_answer(self, chat: Chat) -> Optional[CachedAnswer]:
+        """
+        The answer the requested provider gave to a near-duplicate question recently, if any. A
+        follow-up's answer depends on the conversation, so it is neither looked up nor cached.
+        """
+        if self.answer_cache is None or chat.turns:
+            return None
+        cached = self.answer_cache.lookup(chat.query_embedding, chat.provider, chat.scope)
+        if cached is not None and chat.conversation is not None:
+            self.conversations.record(chat.conversation, chat.query, cached.answer)
+        return cached
+
+    def _session_results(self, chat: Chat) -> Optional[list]:
+        """
+        The chunks retrieved earlier in the session, if close enough to the query to reuse
+        """
+        if chat.conversation is None:
+            return None
+        return self.conversations.reusable_results(chat.conversation, chat.query_embedding, chat.scope)
+
+    def _prompt(self, chat: Chat) -> Tuple[str, List[str], str]:
+        """
+        Extract relevant context from the search results and prepare the prompt
+        """
+        with timed("chat", "prompt"):
+            context, sources = build_context(chat.search_results)
+            return context, sources, build_prompt(context, chat.query)
+
+    def _finish_chat(self, chat: Chat, answer: str, sources: List[str], provider: Optional[str] = None):
+        """
+        Cache the answer under the provider that generated it, if any (and unless it follows up on
+        earlier turns), and record it in the conversation
+        """
+        if provider is not None and self.answer_cache is not None and not chat.turns:
+            self.answer_cache.store(chat.query_embedding, answer, sources, [result.id for result in chat.search_results],
+                                    provider, chat.scope)
+        if chat.conversation is not None:
+            self.conversations.record(chat.conversation, chat.query, answer, chat.query_embedding,
+                                      chat.search_results if chat.searched else None, chat.scope)
+
+    def retrieve_and_generate(self, query: str, use_gemini: bool = False, filters: Optional[Dict[str, Any]] = None,
+                              history: Optional[List[dict]] = None,
+                              session_id: Optional[str] = None) -> Tuple[str, List[str]]:
         """
-        Retrieve relevant documents and generate a response
+        Retrieve relevant documents (among those matching filters) and generate a response.
+        A follow-up in a conversation, given as the client's history or kept server-side under
+        session_id, is searched for together with the previous question and answered with the
+        earlier turns as chat history. In a session, a follow-up close enough to the question the
+        last chunks were retrieved for reuses them instead of searching again.
         """
         try:
-            # Generate embedding for the query using Cohere (for retrieval)
-            query_embedding = self.cohere_manager.embed_query(query)
-
-            # Search in Qdrant for relevant documents
-            search_results = self.qdrant_manager.search_vectors(query_embedding, limit=5)
-
-            # Extract relevant context from search results
-            context_parts = []
-            sources = []
-            for result in search_results:
-                if result.payload:
-                    content = result.payload.get("content", "")
-                    source = result.payload.get("source", "Unknown")
-                    context_parts.append(content)
-                    if source not in sources:
-                        sources.append(source)
-
-            # Format context for the model
-            context = "\n\n".join(context_parts)
+            chat = self._start_chat(query, use_gemini, filters, history, session_id)
+
+            # Generate embedding for the query (for retrieval)
+            with timed("chat", "embed"):
+                chat.query_embedding = self.embed_query(chat.search_query)
+
+            cached = self._cached_answer(chat)
+            if cached is not None:
+                return cached.answer, cached.sources
+
+            # Reuse the chunks retrieved earlier in the session, or search the vector store for relevant documents
+            chat.search_results = self._session_results(chat)
+            if chat.search_results is None:
+                chat.searched = True
+                chat.search_results = self.search(chat.search_query, chat.query_embedding, filters)
+
+            context, sources, prompt = self._prompt(chat)
 
             # If no context found, return a default response
             if not context:
-                return "I couldn't find any relevant information to answer your question. Please try uploading some documents first.", []
+                answer, sources, provider = NO_CONTEXT_ANSWER, [], None
+            else:
+                # The requested model is preferred; the router falls back to the other one on failure
+                answer, provider = self.router.generate(prompt, chat.provider, chat.turns)
 
-            # Prepare the prompt
-            prompt = f"""
-            You are a helpful AI assistant. Use the following context to answer the user's question.
-            If the context doesn't contain the information needed to answer the question, say so.
+            self._finish_chat(chat, answer, sources, provider)
+            return answer, sources
 
-            Context:
-            {context}
+        except Exception as e:
+            logger.error(f"Error in retrieve_and_generate: {str(e)}")
+            raise e
 
-            Question: {query}
 
-            Answer:
-            """
+class AsyncRAGService(RAGService):
+    """
+    Event-loop friendly RAG service: network calls go through the async Cohere, Gemini and
+    Qdrant clients, and CPU-bound document parsing runs on a bounded thread pool.
+    """
+
+    asynchronous = True
+
+    def __init__(self, qdrant_manager=None, cohere_manager=None, gemini_manager=None, embedding_manager=None):
+        self.executor = ThreadPoolExecutor(max_workers=Config.BLOCKING_POOL_SIZE, thread_name_prefix="rag-blocking")
+        super().__init__(qdrant_manager, cohere_manager, gemini_manager, embedding_manager)
+        # Coalesces concurrent chats' query embeddings and searches into batched calls
+        self.query_scheduler = QueryScheduler(self.embedding_manager, self.qdrant_manager) if Config.QUERY_BATCHING else None
+
+    async def embed_query(self, query: str) -> List[float]:
+        """
+        Embed a query, batched with concurrent queries when query batching is enabled
+        """
+        if self.query_scheduler is not None:
+            return await self.query_scheduler.embed_query(query)
+        return await self.embedding_manager.embed_query(query)
+
+    async def search_vectors(self, query_embedding: List[float], limit: int, sparse_query=None,
+                             filters: Optional[Dict[str, Any]] = None) -> list:
+        """
+        Search the vector store, batched with concurrent searches when query batching is enabled
+        """
+        if self.query_scheduler is not None:
+            return await self.query_scheduler.search_vectors(query_embedding, limit, sparse_query, filters)
+        return await self.qdrant_manager.search_vectors(query_embedding, limit=limit, sparse_query=sparse_query,
+                                                        filters=filters)
+
+    async def search(self, query: str, query_embedding: List[float], filters: Optional[Dict[str, Any]] = None) -> list:
+        sparse_query = self.sparse_query(query)
+        if self.reranker is None:
+            with timed("chat", "search"):
+                return await self.search_vectors(query_embedding, Config.RETRIEVAL_LIMIT, sparse_query, filters)
+
+        with timed("chat", "search"):
+            candidates = await self.search_vectors(query_embedding, Config.RERANK_CANDIDATES, sparse_query, filters)
+        shortlist = rerank_shortlist(candidates, is_fused(sparse_query))
+        if shortlist is None:
+            return select_unranked(candidates, is_fused(sparse_query))
+        with timed("chat", "rerank"):
+            rerank_scores = await self.reranker.rerank(query, [candidate.payload.get("content", "") for candidate in shortlist])
+        return select_results(shortlist, rerank_scores)
+
+    async def run_blocking(self, func, *args):
+        """
+        Run a blocking call on the bounded thread pool and await its result
+        """
+        loop = asyncio.get_running_loop()
+        # Run in a copy of the caller's context so stage timings still reach its request
+        return await loop.run_in_executor(self.executor, functools.partial(contextvars.copy_context().run, func, *args))
+
+    async def iter_blocking(self, iterable, block_size: int):
+        """
+        Iterate a blocking iterator from the event loop, advancing it on the thread pool
+        block_size items at a time
+        """
+        iterator = iter(iterable)
+        while True:
+            block = await self.run_blocking(list, islice(iterator, block_size))
+            if not block:
+                return
+            for item in block:
+                yield item
+
+    async def process_and_store_document(self, file_path: str, filename: str, tenant: Optional[str] = None,
+                                         on_progress: Callable[[dict], None] = None) -> dict:
+        """
+        Process a document and store its embeddings in the vector store, as one of tenant's documents if given.
+        on_progress, if given, is called with the chunk counts so far as batches are stored.
+        """
+        try:
+            # Chunks already stored for this source of the tenant (from an earlier upload)
+            existing_ids = await self.qdrant_manager.get_source_point_ids(filename, tenant)
+            seen_ids = set()
+            unchanged = {}
+
+            # Parsing, chunking and hashing are CPU-bound, so pull records from the thread pool
+            records = self._changed_records(file_path, filename, tenant, existing_ids, seen_ids, unchanged)
+            records = self.iter_blocking(records, self.ingestion_pipeline.batch_size)
+
+            # Embed only new or changed chunks in batches and write each batch to the vector store as it
+            # completes, so only the batches in flight are held in memory
+            def report(added: int):
+                if on_progress is not None:
+                    on_progress({"chunks_parsed": len(seen_ids), "chunks_added": added})
+
+            chunks_added = await self.ingestion_pipeline.run(records, on_progress=report)
+
+            # Unchanged chunks keep their vectors, but may have moved within the document
+            if unchanged:
+                await self.qdrant_manager.set_payload(list(unchanged), list(unchanged.values()))
+
+            # Remove chunks that are no longer part of the document, after the new ones are in place
+            stale_ids = list(existing_ids - seen_ids)
+            if stale_ids:
+                await self.qdrant_manager.delete_points(stale_ids)
+
+            return self._stored(filename, seen_ids, chunks_added, stale_ids)
+
+        except Exception as e:
+            logger.error(f"Error in process_and_store_document: {str(e)}")
+            raise e
+
+    async def retrieve_and_generate(self, query: str, use_gemini: bool = False, filters: Optional[Dict[str, Any]] = None,
+                                    history: Optional[List[dict]] = None,
+                                    session_id: Optional[str] = None) -> Tuple[str, List[str]]:
+        try:
+            chat = self._start_chat(query, use_gemini, filters, history, session_id)
+
+            # Generate embedding for the query (for retrieval)
+            with timed("chat", "embed"):
+                chat.query_embedding = await self.embed_query(chat.search_query)
+
+            cached = self._cached_answer(chat)
+            if cached is not None:
+                return cached.answer, cached.sources
+
+            # Reuse the chunks retrieved earlier in the session, or search the vector store for relevant documents
+            chat.search_results = self._session_results(chat)
+            if chat.search_results is None:
+                chat.searched = True
+                chat.search_results = await self.search(chat.search_query, chat.query_embedding, filters)
 
-            # Choose the model based on the parameter
-            if use_gemini and self.gemini_available:
-                # Generate response using Gemini
-                answer = self.gemini_manager.generate_response(prompt)
+            context, sources, prompt = self._prompt(chat)
+
+            # If no context found, return a default response
+            if not context:
+                answer, sources, provider = NO_CONTEXT_ANSWER, [], None
             else:
-                # Generate response using Cohere (default)
-                answer = self.cohere_manager.generate_response(prompt)
+                # The requested model is preferred; the router falls back to the other one on failure
+                answer, provider = await self.router.generate(prompt, chat.provider, chat.turns)
 
+            self._finish_chat(chat, answer, sources, provider)
             return answer, sources
 
         except Exception as e:
             logger.error(f"Error in retrieve_and_generate: {str(e)}")
-            raise e
\ No newline at end of file
+            raise e
+
+    async def retrieve_and_stream(self, query: str, use_gemini: bool = False, filters: Optional[Dict[str, Any]] = None,
+                                  history: Optional[List[dict]] = None, session_id: Optional[str] = None):
+        """
+        Retrieve relevant documents (among those matching filters), then stream the response.
+        Yields a "sources" event as soon as retrieval finishes, "token" events as text arrives
+        and a final "done" event. Closing the generator early closes the upstream provider stream.
+        Follow-ups in a conversation are handled as in retrieve_and_generate.
+        """
+        chat = self._start_chat(query, use_gemini, filters, history, session_id)
+
+        # Generate embedding for the query (for retrieval)
+        with timed("chat", "embed"):
+            chat.query_embedding = await self.embed_query(chat.search_query)
+
+        cached = self._cached_answer(chat)
+        if cached is not None:
+            yield {"type": "sources", "sources": cached.sources}
+            yield {"type": "token", "text": cached.answer}
+            yield {"type": "done"}
+            return
+
+        chat.search_results = self._session_results(chat)
+        if chat.search_results is None:
+            chat.searched = True
+            chat.search_results = await self.search(chat.search_query, chat.query_embedding, filters)
+        context, sources, prompt = self._prompt(chat)
+        yield {"type": "sources", "sources": sources}
+
+        if not context:
+            self._finish_chat(chat, NO_CONTEXT_ANSWER, [])
+            yield {"type": "token", "text": NO_CONTEXT_ANSWER}
+            yield {"type": "done"}
+            return
+
+        stream = self.router.stream(prompt, chat.provider, chat.turns)
+        parts = []
+        provider = None
+        try:
+            async for text, provider in stream:
+                parts.append(text)
+                yield {"type": "token", "text": text}
+        finally:
+            await stream.aclose()
+
+        # Only a fully streamed answer is worth caching or keeping in the conversation
+        if parts:
+            self._finish_chat(chat, "".join(parts).strip(), sources, provider)
+        yield {"type": "done"}
+
+    def close(self):
+        """
+        Release the blocking thread pool, the local embedding worker and the PDF extraction processes
+        """
+        self.executor.shutdown(wait=False)
+        if hasattr(self.embedding_manager, "close"):
+            self.embedding_manager.close()
+        shutdown_pdf_process_pool()
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import math
+import threading
+from typing import List, Sequence
+from config import Config
+from cohere_manager import CohereManager, AsyncCohereManager
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough prompt-token count of a text (about four characters per token for English)"""
+    return max(1, len(text) // 4)
+
+
+def candidate_depth(scores: Sequence[float], fused: bool = False) -> int:
+    """
+    How many retrieval candidates are worth reranking: those scoring within RERANK_DEPTH_RATIO
+    of the best one, clamped to [RERANK_MIN_CANDIDATES, RERANK_CANDIDATES]. A query with a few
+    clear winners gets a shallow depth, a query with a flat score distribution a deep one.
+    Fused (RRF) scores only reflect ranks, so their ratios say nothing and every candidate is kept.
+    """
+    if fused or not scores or scores[0] <= 0:
+        return min(len(scores), Config.RERANK_CANDIDATES)
+    close = sum(1 for score in scores if score >= scores[0] * Config.RERANK_DEPTH_RATIO)
+    return min(len(scores), Config.RERANK_CANDIDATES, max(close, Config.RERANK_MIN_CANDIDATES))
+
+
+def relative_cutoff(scores: Sequence[float], fused: bool = False) -> float:
+    """
+    Score threshold for candidates close enough to the best one, used when the rerank is skipped.
+    Nothing is cut when all candidates fit in RETRIEVAL_LIMIT (as without a reranker) or from fused scores.
+    """
+    if fused or len(scores) <= Config.RETRIEVAL_LIMIT:
+        return -math.inf
+    return min(scores[0], scores[0] * Config.RERANK_DEPTH_RATIO)
+
+
+def needs_rerank(scores: Sequence[float], fused: bool = False) -> bool:
+    """
+    Whether reranking could change which chunks reach the prompt. When no more than
+    RETRIEVAL_LIMIT candidates score close to the best one, the retrieval order already
+    separates them from the rest, and the expensive rerank call is skipped. Fused (RRF)
+    scores can't show that, so more than RETRIEVAL_LIMIT of them are always reranked.
+    """
+    if len(scores) <= Config.RETRIEVAL_LIMIT:
+        return False
+    if fused or scores[0] <= 0:
+        return True
+    return scores[Config.RETRIEVAL_LIMIT] >= scores[0] * Config.RERANK_DEPTH_RATIO
+
+
+def select_results(results: list, scores: Sequence[float], cutoff: float = None, token_budget: int = None) -> list:
+    """
+    Order results by score and keep those scoring at least cutoff, up to RETRIEVAL_LIMIT
+    results and token_budget estimated prompt tokens
+    """
+    cutoff = Config.RERANK_SCORE_CUTOFF if cutoff is None else cutoff
+    token_budget = token_budget or Config.RERANK_TOKEN_BUDGET
+    selected = []
+    tokens = 0
+    for score, result in sorted(zip(scores, results), key=lambda pair: pair[0], reverse=True):
+        if score < cutoff or len(selected) >= Config.RETRIEVAL_LIMIT:
+            break
+        tokens += estimate_tokens(result.payload.get("content", ""))
+        # The best result is always kept, even if it alone exceeds the budget
+        if selected and tokens > token_budget:
+            break
+        selected.append(result)
+    return selected
+
+
+class CohereReranker:
+    """Scores (query, document) pairs with Cohere's rerank endpoint; scores are relevance in [0, 1]"""
+
+    def __init__(self, cohere_manager: CohereManager = None):
+        # The manager's client is shared, and only created on first use
+        self.cohere_manager = cohere_manager or CohereManager()
+
+    def rerank(self, query: str, documents: List[str]) -> List[float]:
+        """
+        Return one relevance score per document, in document order
+        """
+        response = self.cohere_manager.client.rerank(model=Config.RERANK_MODEL, query=query, documents=documents)
+        scores = [0.0] * len(documents)
+        for result in response.results:
+            scores[result.index] = result.relevance_score
+        return scores
+
+
+class AsyncCohereReranker:
+    def __init__(self, cohere_manager: AsyncCohereManager = None):
+        self.cohere_manager = cohere_manager or AsyncCohereManager()
+
+    async def rerank(self, query: str, documents: List[str]) -> List[float]:
+        """
+        Return one relevance score per document, in document order, without blocking the event loop
+        """
+        response = await self.cohere_manager.client.rerank(model=Config.RERANK_MODEL, query=query, documents=documents)
+        scores = [0.0] * len(documents)
+        for result in response.results:
+            scores[result.index] = result.relevance_score
+        return scores
+
+
+class CrossEncoderReranker:
+    """
+    Scores (query, document) pairs with a local sentence-transformers cross-encoder. The model
+    is loaded on first use; logits are squashed to [0, 1] so the same cutoff applies as for Cohere.
+    """
+
+    def __init__(self, model_name: str = None):
+        self.model_name = model_name or Config.CROSS_ENCODER_MODEL
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        with self._lock:
+            if self._model is None:
+                self._model = self._load()
+            return self._model
+
+    def _load(self):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError:
+            raise ImportError("The 'sentence-transformers' package is required for RERANKER=cross-encoder")
+        logger.info(f"Loading cross-encoder '{self.model_name}'")
+        return CrossEncoder(self.model_name)
+
+    def rerank(self, query: str, documents: List[str]) -> List[float]:
+        """
+        Return one relevance score per document, in document order
+        """
+        logits = self.model.predict([(query, document) for document in documents])
+        return [1 / (1 + math.exp(-float(logit))) for logit in logits]
+
+
+class AsyncCrossEncoderReranker(CrossEncoderReranker):
+    """Runs the cross-encoder on an executor so inference doesn't block the event loop"""
+
+    def __init__(self, executor, model_name: str = None):
+        super().__init__(model_name)
+        self.executor = executor
+
+    async def rerank(self, query: str, documents: List[str]) -> List[float]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, CrossEncoderReranker.rerank, self, query, documents)
+
+
+def get_reranker(executor=None, asynchronous: bool = False, cohere_manager=None):
+    """
+    Build the reranker named by Config.RERANKER: "none", "cohere" or "cross-encoder".
+    Async rerankers are returned when asynchronous is set; the cross-encoder then runs on executor.
+    The Cohere reranker shares cohere_manager's client when given.
+    """
+    name = Config.RERANKER
+    if name == "none":
+        return None
+    if name == "cohere":
+        return AsyncCohereReranker(cohere_manager) if asynchronous else CohereReranker(cohere_manager)
+    if name == "cross-encoder":
+        return AsyncCrossEncoderReranker(executor) if asynchronous else CrossEncoderReranker()
+    raise ValueError(f"Unknown reranker: {name}")
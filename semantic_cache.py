@@ -0,0 +1,149 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+import numpy as np
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    sources: List[str]
+    point_ids: List[str]
+    provider: str  # the provider that generated the answer
+    scope: str
+    created_at: float
+
+
+class SemanticAnswerCache:
+    """
+    Answer cache keyed on query-vector similarity. A query whose embedding has cosine similarity
+    >= threshold with a cached query (answered by the requested provider, in the same search scope)
+    reuses its answer.
+    Vectors live in a preallocated float32 matrix so a lookup is one matrix-vector product.
+    """
+
+    def __init__(self, threshold: float = None, max_entries: int = None, ttl: float = None):
+        self.threshold = Config.SEMANTIC_CACHE_THRESHOLD if threshold is None else threshold
+        self.max_entries = max_entries or Config.SEMANTIC_CACHE_MAX_ENTRIES
+        self.ttl = Config.SEMANTIC_CACHE_TTL if ttl is None else ttl
+        self.hits = 0
+        self.misses = 0
+        self._matrix: Optional[np.ndarray] = None
+        self._valid = np.zeros(self.max_entries, dtype=bool)
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._free_slots = list(range(self.max_entries - 1, -1, -1))
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, query_vector: List[float], provider: str = "", scope: str = "") -> Optional[CachedAnswer]:
+        """
+        Return the cached answer for the most similar query above the threshold, if any. Only
+        answers generated by provider under the same scope (e.g. the search filters) are considered.
+        """
+        with self._lock:
+            if self._matrix is None or not self._entries:
+                self.misses += 1
+                return None
+            query = self._normalize(query_vector)
+            if query.shape[0] != self._matrix.shape[1]:
+                self.misses += 1
+                return None
+            scores = self._matrix @ query
+            scores[~self._valid] = -np.inf
+            now = time.time()
+            # Walk candidates from most to least similar, skipping expired, other-provider and other-scope entries
+            for slot in np.argsort(-scores):
+                if scores[slot] < self.threshold:
+                    break
+                entry = self._entries[int(slot)]
+                if self.ttl and now - entry.created_at > self.ttl:
+                    self._remove(int(slot))
+                    continue
+                if entry.provider != provider or entry.scope != scope:
+                    continue
+                self._entries.move_to_end(int(slot))
+                self.hits += 1
+                return entry
+            self.misses += 1
+            return None
+
+    def store(self, query_vector: List[float], answer: str, sources: List[str], point_ids: List[str],
+              provider: str = "", scope: str = ""):
+        """
+        Cache an answer generated by provider together with the query embedding and the points it cited
+        """
+        query = self._normalize(query_vector)
+        with self._lock:
+            if self._matrix is None:
+                self._matrix = np.zeros((self.max_entries, query.shape[0]), dtype=np.float32)
+            elif query.shape[0] != self._matrix.shape[1]:
+                # The embedding model changed; vectors of different sizes can't be compared
+                self._clear()
+                self._matrix = np.zeros((self.max_entries, query.shape[0]), dtype=np.float32)
+            if not self._free_slots:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+            slot = self._free_slots.pop()
+            self._matrix[slot] = query
+            self._valid[slot] = True
+            self._entries[slot] = CachedAnswer(
+                answer, list(sources), [str(i) for i in point_ids], provider, scope, time.time()
+            )
+
+    def invalidate_sources(self, sources: Iterable[str]) -> int:
+        """
+        Drop every entry that cited one of the given sources (e.g. after a re-upload)
+        """
+        sources = set(sources)
+        return self._invalidate(lambda entry: not sources.isdisjoint(entry.sources))
+
+    def invalidate_point_ids(self, point_ids: Iterable[str]) -> int:
+        """
+        Drop every entry that cited one of the given points (e.g. after they were deleted)
+        """
+        point_ids = {str(i) for i in point_ids}
+        return self._invalidate(lambda entry: not point_ids.isdisjoint(entry.point_ids))
+
+    def _invalidate(self, predicate) -> int:
+        with self._lock:
+            stale = [slot for slot, entry in self._entries.items() if predicate(entry)]
+            for slot in stale:
+                self._remove(slot)
+        if stale:
+            logger.info(f"Invalidated {len(stale)} cached answers")
+        return len(stale)
+
+    def _remove(self, slot: int):
+        del self._entries[slot]
+        self._valid[slot] = False
+        self._free_slots.append(slot)
+
+    def _clear(self):
+        for slot in list(self._entries):
+            self._remove(slot)
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+        }
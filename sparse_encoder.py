@@ -0,0 +1,64 @@
+import re
+import zlib
+from collections import Counter
+from typing import List, Tuple
+from config import Config
+
+# Keeps identifiers such as part numbers ("ab-1234"), versions ("2.5.1") and error codes intact
+TOKEN_PATTERN = re.compile(r"[0-9a-z]+(?:[-_.:/][0-9a-z]+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have how i if in into is it its of on or "
+    "that the their there these this to was were what when where which who why will with you your".split()
+)
+
+# A sparse vector as parallel lists of term indices and weights
+SparseVector = Tuple[List[int], List[float]]
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase and split text into terms. Compound identifiers are kept whole and also
+    split into their parts, so "AB-1234" matches both "ab-1234" and "1234".
+    """
+    terms = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        terms.append(token)
+        if not token.isalnum():
+            terms.extend(part for part in re.split(r"[-_.:/]", token) if part and part not in STOPWORDS)
+    return terms
+
+
+def term_index(term: str) -> int:
+    """Stable 31-bit index of a term (Python's hash() is salted per process)"""
+    return zlib.crc32(term.encode("utf-8")) & 0x7FFFFFFF
+
+
+class BM25Encoder:
+    """
+    Encodes text as BM25 term-frequency vectors for Qdrant sparse search. Documents get the
+    saturated, length-normalized TF part of BM25; the IDF part is applied by Qdrant at query
+    time (the sparse vector is configured with the IDF modifier), so it stays correct as the
+    corpus changes without re-encoding anything.
+    """
+
+    def __init__(self, k1: float = None, b: float = None, avg_doc_length: float = None):
+        self.k1 = Config.BM25_K1 if k1 is None else k1
+        self.b = Config.BM25_B if b is None else b
+        self.avg_doc_length = avg_doc_length or Config.BM25_AVG_DOC_LENGTH
+
+    def encode_document(self, text: str) -> SparseVector:
+        terms = tokenize(text)
+        length_norm = self.k1 * (1 - self.b + self.b * len(terms) / self.avg_doc_length)
+        weights = {}
+        for term, frequency in Counter(terms).items():
+            index = term_index(term)
+            # Hash collisions between distinct terms are merged
+            weights[index] = weights.get(index, 0.0) + frequency * (self.k1 + 1) / (frequency + length_norm)
+        return list(weights), list(weights.values())
+
+    def encode_query(self, text: str) -> SparseVector:
+        indices = sorted({term_index(term) for term in tokenize(text)})
+        return indices, [1.0] * len(indices)
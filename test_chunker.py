@@ -0,0 +1,76 @@
+"""
+Unit tests for the single-pass Chunker
+"""
+import pytest
+from chunker import Chunker, CharTokenizer, RegexTokenizer
+
+TEXT = "\n\n".join(
+    " ".join(f"Sentence {p}.{s} mentions part AB-{p}{s} and its seal." for s in range(8))
+    for p in range(20)
+)
+
+
+def pages_of(text: str, size: int):
+    return [(number, text[start:start + size]) for number, start in enumerate(range(0, len(text), size), start=1)]
+
+
+@pytest.mark.parametrize("tokenizer,chunk_size,chunk_overlap", [
+    (CharTokenizer(), 300, 60),
+    (CharTokenizer(), 100, 0),
+    (RegexTokenizer(), 40, 8),
+])
+@pytest.mark.parametrize("page_size", [50, 333, 100000])
+def test_iter_chunks_matches_split(tokenizer, chunk_size, chunk_overlap, page_size):
+    chunker = Chunker(chunk_size, chunk_overlap, tokenizer)
+    spans = [(span.start, span.end) for span in chunker.split(TEXT)]
+    chunks = list(chunker.iter_chunks(pages_of(TEXT, page_size)))
+
+    assert [(chunk.start, chunk.end) for chunk in chunks] == spans
+
+
+def test_offsets_round_trip_to_source_text():
+    chunker = Chunker(300, 60, CharTokenizer())
+    chunks = list(chunker.iter_chunks(pages_of(TEXT, 333)))
+
+    assert chunks
+    for chunk in chunks:
+        assert TEXT[chunk.start:chunk.end] == chunk.text
+        assert chunk.text == chunk.text.strip()
+
+
+def test_chunks_respect_size_and_overlap():
+    chunk_size, chunk_overlap = 300, 60
+    spans = Chunker(chunk_size, chunk_overlap, CharTokenizer()).split(TEXT)
+
+    assert len(spans) > 1
+    for previous, span in zip(spans, spans[1:]):
+        assert span.end - span.start <= chunk_size
+        # The next chunk starts chunk_overlap characters before the previous one's (untrimmed) end
+        assert previous.end - chunk_overlap <= span.start < previous.end
+    # Together the chunks cover every non-whitespace character
+    covered = set()
+    for span in spans:
+        covered.update(range(span.start, span.end))
+    assert all(i in covered for i, char in enumerate(TEXT) if not char.isspace())
+
+
+def test_chunks_end_at_sentence_breaks():
+    spans = Chunker(300, 60, CharTokenizer()).split(TEXT)
+
+    for span in spans[:-1]:
+        assert TEXT[span.end - 1] in ".!?;\n"
+
+
+def test_chunk_pages_are_the_page_they_start_on():
+    pages = pages_of(TEXT, 500)
+    page_starts = [(number, (number - 1) * 500) for number, _ in pages]
+
+    for chunk in Chunker(300, 60, CharTokenizer()).iter_chunks(pages):
+        expected = max(number for number, start in page_starts if start <= chunk.start)
+        assert chunk.page == expected
+
+
+def test_blank_text_has_no_chunks():
+    chunker = Chunker(100, 20, CharTokenizer())
+    assert chunker.split("  \n\n \t ") == []
+    assert list(chunker.iter_chunks([(1, ""), (2, "   ")])) == []
@@ -0,0 +1,80 @@
+"""
+Unit tests for context assembly: merging chunks by offsets, near-duplicate removal and the token budget
+"""
+from types import SimpleNamespace
+from context_builder import Passage, build_context, merge_passages, shingles
+
+DOCUMENT = "The quick brown fox jumps over the lazy dog.\nThen it runs away into the forest."
+
+
+def passage(rank, start, end, source="a.txt", text=None, uploaded_at=1):
+    return Passage(rank, source, start, end, DOCUMENT[start:end] if text is None else text, uploaded_at)
+
+
+def hit(content, source="a.txt", start=None, end=None, uploaded_at=1):
+    return SimpleNamespace(payload={"content": content, "source": source, "start": start, "end": end,
+                                    "uploaded_at": uploaded_at})
+
+
+def test_overlapping_chunks_are_spliced_once():
+    merged = merge_passages([passage(1, 30, 60), passage(0, 0, 40)])
+    assert merged == [Passage(0, "a.txt", 0, 60, DOCUMENT[:60], 1)]
+
+
+def test_adjacent_chunks_are_joined_across_the_trimmed_gap():
+    # The chunker trimmed the newline at offset 44 between the two chunks
+    merged = merge_passages([passage(0, 0, 44), passage(1, 45, len(DOCUMENT))])
+    assert [p.text for p in merged] == [DOCUMENT]
+
+
+def test_contained_chunk_is_absorbed():
+    assert merge_passages([passage(1, 10, 20), passage(0, 0, 40)]) == [passage(0, 0, 40)]
+
+
+def test_stale_offsets_are_not_merged():
+    # A chunk kept from an earlier version of the document: same offsets, different text
+    stale = passage(1, 30, 60, text="an older wording of the sentence")
+    assert len(merge_passages([passage(0, 0, 40), stale])) == 2
+    # Adjacent chunks of different uploads
+    assert len(merge_passages([passage(0, 0, 44), passage(1, 45, len(DOCUMENT), uploaded_at=2)])) == 2
+    # A contained chunk whose text isn't there
+    assert len(merge_passages([passage(0, 0, 40), passage(1, 10, 20, text="elsewhere")])) == 2
+
+
+def test_chunks_of_other_sources_or_without_offsets_are_kept_apart():
+    merged = merge_passages([passage(0, 0, 40), passage(1, 30, 60, source="b.txt"),
+                             Passage(2, "a.txt", None, None, "no offsets")])
+    assert [(p.rank, p.source) for p in merged] == [(0, "a.txt"), (1, "b.txt"), (2, "a.txt")]
+
+
+def test_shingles_are_word_trigrams():
+    assert shingles("One two, THREE four") == {("one", "two", "three"), ("two", "three", "four")}
+    assert shingles("two words") == {("two", "words")}
+    assert shingles("") == set()
+
+
+def test_build_context_merges_hits_and_lists_sources_by_relevance():
+    context, sources = build_context([hit(DOCUMENT[30:60], start=30, end=60), hit("Other text.", "b.txt"),
+                                      hit(DOCUMENT[:40], start=0, end=40)], token_budget=1000)
+    assert context == DOCUMENT[:60] + "\n\nOther text."
+    assert sources == ["a.txt", "b.txt"]
+
+
+def test_build_context_drops_near_duplicates():
+    context, sources = build_context([hit("the fox jumps over the dog"), hit("THE FOX jumps over the dog!", "b.txt"),
+                                      hit("a different passage altogether", "c.txt")],
+                                     token_budget=1000, dedup_threshold=0.8)
+    assert context == "the fox jumps over the dog\n\na different passage altogether"
+    assert sources == ["a.txt", "c.txt"]
+
+
+def test_build_context_skips_passages_over_budget_but_keeps_smaller_ones():
+    context, sources = build_context([hit("a" * 40), hit("b" * 40, "b.txt"), hit("c" * 8, "c.txt")],
+                                     token_budget=13, dedup_threshold=1.0)
+    assert context == "a" * 40 + "\n\n" + "c" * 8
+    assert sources == ["a.txt", "c.txt"]
+
+
+def test_build_context_truncates_the_top_passage_at_a_word_boundary():
+    context, _ = build_context([hit("word " * 20), hit("more", "b.txt")], token_budget=5)
+    assert context == "word word word word ..."
@@ -0,0 +1,130 @@
+"""
+Unit tests for server-side conversations: the history window, session expiry and eviction,
+reuse of retrieved chunks and their invalidation on re-upload
+"""
+from types import SimpleNamespace
+import numpy as np
+import pytest
+import conversation_store
+from benchmarks.stubs import FakeCohereManager, FakeQdrantManager
+from config import Config
+from conversation_store import ConversationStore, normalize_history, retrieval_query, window
+from rag_service import RAGService
+
+
+def rotated(angle: float, dimension: int = 4):
+    """A unit vector whose cosine similarity with [1, 0, ...] is cos(angle)"""
+    vector = [0.0] * dimension
+    vector[0], vector[1] = np.cos(angle), np.sin(angle)
+    return vector
+
+
+def exchanges(count: int):
+    turns = []
+    for i in range(count):
+        turns += [{"role": "user", "text": f"question {i}"}, {"role": "assistant", "text": f"answer {i}"}]
+    return turns
+
+
+def hit(source: str):
+    return SimpleNamespace(id=source, score=1.0, payload={"content": source, "source": source})
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(conversation_store.time, "time", lambda: now[0])
+    return now
+
+
+def test_window_keeps_the_last_exchanges():
+    kept = window(exchanges(5), max_turns=2, token_budget=1000)
+    assert [turn["text"] for turn in kept] == ["question 3", "answer 3", "question 4", "answer 4"]
+
+
+def test_window_stops_at_the_token_budget_and_starts_with_a_user_turn():
+    turns = exchanges(2)
+    turns[3]["text"] = "a" * 40
+    # The long answer (10 tokens) and "question 1" (2) fit, nothing earlier does
+    assert [turn["text"] for turn in window(turns, max_turns=5, token_budget=12)] == ["question 1", "a" * 40]
+    # Only the assistant's answer fits: a window never starts with one
+    assert window(turns, max_turns=5, token_budget=10) == []
+
+
+def test_normalize_history_maps_roles_and_skips_unusable_messages():
+    history = [{"role": "Human", "content": "hi"}, {"role": "chatbot", "message": "hello"},
+               {"role": "system", "text": "ignored"}, {"role": "user", "text": ""}, {"role": "ai", "text": 3}]
+    assert normalize_history(history) == [{"role": "user", "text": "hi"}, {"role": "assistant", "text": "hello"}]
+
+
+def test_retrieval_query_prepends_the_previous_question():
+    assert retrieval_query(exchanges(2), "and the second?") == "question 1\nand the second?"
+    assert retrieval_query([], "first question") == "first question"
+
+
+def test_record_keeps_only_the_window(monkeypatch):
+    monkeypatch.setattr(Config, "CONVERSATION_WINDOW_TURNS", 2)
+    store = ConversationStore(max_sessions=10, ttl=0)
+    conversation = store.session("s1")
+    for i in range(4):
+        store.record(conversation, f"question {i}", f"answer {i}")
+    assert conversation.turns == exchanges(4)[-4:]
+
+
+def test_idle_sessions_expire_after_ttl(clock):
+    store = ConversationStore(max_sessions=10, ttl=60)
+    store.record(store.session("s1"), "question", "answer")
+
+    clock[0] += 59
+    assert store.session("s1").turns
+    clock[0] += 61
+    assert store.session("s1").turns == []
+
+
+def test_least_recently_used_session_is_evicted():
+    store = ConversationStore(max_sessions=2, ttl=0)
+    for session_id in ("s1", "s2"):
+        store.record(store.session(session_id), "question", "answer")
+    store.session("s1")
+    store.session("s3")
+
+    assert store.stats()["entries"] == 2
+    assert store.session("s1").turns
+    assert store.session("s2").turns == []
+
+
+def test_results_are_reused_above_the_threshold_in_the_same_scope():
+    store = ConversationStore(max_sessions=10, ttl=0, reuse_threshold=0.9)
+    conversation = store.session("s1")
+    store.record(conversation, "question", "answer", rotated(0.0), [hit("a.txt")], scope="acme")
+
+    assert store.reusable_results(conversation, rotated(np.arccos(0.95)), "acme") == [hit("a.txt")]
+    assert store.reusable_results(conversation, rotated(np.arccos(0.85)), "acme") is None
+    assert store.reusable_results(conversation, rotated(0.0), "globex") is None
+    assert store.reusable_results(conversation, rotated(0.0, dimension=8), "acme") is None
+    stats = store.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 3)
+
+
+def test_answers_without_a_search_keep_the_earlier_results():
+    store = ConversationStore(max_sessions=10, ttl=0, reuse_threshold=0.9)
+    conversation = store.session("s1")
+    store.record(conversation, "question", "answer", rotated(0.0), [hit("a.txt")])
+    store.record(conversation, "follow-up", "cached answer")
+
+    assert store.reusable_results(conversation, rotated(0.0)) == [hit("a.txt")]
+
+
+def test_reupload_invalidates_the_sessions_that_used_the_source():
+    service = RAGService(FakeQdrantManager(0), FakeCohereManager(0, 0), embedding_manager=FakeCohereManager(0, 0))
+    store = service.conversations = ConversationStore(max_sessions=10, ttl=0, reuse_threshold=0.9)
+    for session_id, source in (("s1", "a.txt"), ("s2", "b.txt")):
+        store.record(store.session(session_id), "question", "answer", rotated(0.0), [hit(source)])
+
+    # Unchanged re-uploads keep the retrieved chunks
+    service._stored("a.txt", {"p1"}, 0, [])
+    assert store.reusable_results(store.session("s1"), rotated(0.0)) is not None
+
+    service._stored("a.txt", {"p1"}, 1, [])
+    assert store.reusable_results(store.session("s1"), rotated(0.0)) is None
+    assert store.reusable_results(store.session("s2"), rotated(0.0)) == [hit("b.txt")]
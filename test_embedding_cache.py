@@ -0,0 +1,125 @@
+"""
+Unit tests for the embedding cache tiers: LRU eviction by size, TTL expiry and the SQLite store
+"""
+import asyncio
+from array import array
+import pytest
+import embedding_cache
+from embedding_cache import ENTRY_OVERHEAD_BYTES, EmbeddingCache, LRUEmbeddingStore, SQLiteEmbeddingStore, make_cache_key
+
+DIMENSION = 4
+ENTRY_BYTES = 4 * DIMENSION + ENTRY_OVERHEAD_BYTES
+
+
+def vector(value: float) -> array:
+    return array("f", [value] * DIMENSION)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A manual clock for both the LRU (monotonic) and SQLite (wall-clock) TTLs"""
+    now = [1000.0]
+    monkeypatch.setattr(embedding_cache.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(embedding_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_cache_key_normalizes_text_but_not_model_or_input_type():
+    key = make_cache_key("What is  RAG?", "embed-v3", "search_query")
+    assert make_cache_key("what is rag?", "embed-v3", "search_query") == key
+    assert make_cache_key("What is RAG?", "embed-v4", "search_query") != key
+    assert make_cache_key("What is RAG?", "embed-v3", "search_document") != key
+
+
+def test_lru_evicts_least_recently_used_beyond_max_bytes():
+    store = LRUEmbeddingStore(max_bytes=3 * ENTRY_BYTES, ttl=0)
+    for key in "abc":
+        store.put(key, vector(1.0))
+    store.get("a")  # a is now the most recently used
+    store.put("d", vector(1.0))
+
+    assert store.get("b") is None
+    assert all(store.get(key) is not None for key in "acd")
+    assert len(store) == 3 and store.size_bytes == 3 * ENTRY_BYTES
+
+
+def test_lru_replacing_a_key_keeps_size_accounting():
+    store = LRUEmbeddingStore(max_bytes=10 * ENTRY_BYTES, ttl=0)
+    store.put("a", vector(1.0))
+    store.put("a", vector(2.0))
+
+    assert len(store) == 1 and store.size_bytes == ENTRY_BYTES
+    assert list(store.get("a")) == [2.0] * DIMENSION
+
+
+def test_lru_skips_entries_larger_than_the_cache():
+    store = LRUEmbeddingStore(max_bytes=ENTRY_BYTES - 1, ttl=0)
+    store.put("a", vector(1.0))
+    assert len(store) == 0 and store.get("a") is None
+
+
+def test_lru_entries_expire_after_ttl(clock):
+    store = LRUEmbeddingStore(max_bytes=10 * ENTRY_BYTES, ttl=60)
+    store.put("a", vector(1.0))
+
+    clock[0] += 59
+    assert store.get("a") is not None
+    clock[0] += 2
+    assert store.get("a") is None
+    assert len(store) == 0 and store.size_bytes == 0
+
+
+def test_sqlite_store_round_trips_and_persists(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    store = SQLiteEmbeddingStore(path, ttl=0)
+    store.put_many([("a", vector(0.5)), ("b", vector(1.5))])
+    store.close()
+
+    reopened = SQLiteEmbeddingStore(path, ttl=0)
+    assert list(reopened.get("a")) == [0.5] * DIMENSION
+    assert list(reopened.get("b")) == [1.5] * DIMENSION
+    assert reopened.get("c") is None
+    reopened.close()
+
+
+def test_sqlite_entries_expire_after_ttl(tmp_path, clock):
+    store = SQLiteEmbeddingStore(str(tmp_path / "embeddings.sqlite"), ttl=60)
+    store.put_many([("a", vector(1.0))])
+
+    clock[0] += 61
+    assert store.get("a") is None
+    # The expired row was deleted, so it stays gone even without a TTL
+    store.ttl = 0
+    assert store.get("a") is None
+    store.close()
+
+
+def test_two_tier_cache_promotes_disk_hits_into_memory(tmp_path):
+    cache = EmbeddingCache(max_bytes=10 * ENTRY_BYTES, ttl=0, disk_path=str(tmp_path / "embeddings.sqlite"))
+    keys, vectors, missing = cache.lookup(["one", "two"], "model", "search_document")
+    assert missing == [0, 1]
+    cache.fill(keys, vectors, missing, [[1.0] * DIMENSION, [2.0] * DIMENSION])
+
+    cache.memory.clear()
+    _, vectors, missing = cache.lookup(["one", "two", "three"], "model", "search_document")
+    assert missing == [2]
+    assert vectors[:2] == [[1.0] * DIMENSION, [2.0] * DIMENSION]
+    assert (cache.disk_hits, len(cache.memory)) == (2, 2)
+
+    cache.lookup(["one"], "model", "search_document")
+    assert (cache.memory_hits, cache.disk_hits, cache.misses) == (1, 2, 3)
+    cache.disk.close()
+
+
+def test_async_lookup_and_fill_match_the_sync_ones(tmp_path):
+    cache = EmbeddingCache(max_bytes=10 * ENTRY_BYTES, ttl=0, disk_path=str(tmp_path / "embeddings.sqlite"))
+
+    async def run():
+        keys, vectors, missing = await cache.alookup(["one", "two"], "model", "search_query")
+        filled = await cache.afill(keys, vectors, missing, [[1.0] * DIMENSION, [2.0] * DIMENSION])
+        return filled, await cache.alookup(["two"], "model", "search_query")
+
+    filled, (_, vectors, missing) = asyncio.run(run())
+    assert filled == [[1.0] * DIMENSION, [2.0] * DIMENSION]
+    assert (vectors, missing) == ([[2.0] * DIMENSION], [])
+    cache.disk.close()
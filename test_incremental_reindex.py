@@ -0,0 +1,129 @@
+"""
+Unit tests for incremental re-indexing: a re-upload embeds only new chunks, refreshes the payloads
+of unchanged ones and deletes stale ones, per tenant (LocalVectorStore and a fake embedder)
+"""
+import asyncio
+import pytest
+import rag_service
+from benchmarks.stubs import EMBEDDING_DIM, AsyncFakeCohereManager, FakeCohereManager
+from chunker import Chunk
+from config import Config
+from local_vector_store import AsyncLocalVectorStore, LocalVectorStore
+from rag_service import AsyncRAGService, RAGService
+
+
+class FakeDocumentProcessor:
+    """Chunks every document into the texts it was given, laid out one after another"""
+
+    def __init__(self, texts):
+        self.texts = texts
+
+    def iter_document_chunks(self, file_path, filename):
+        start = 0
+        for text in self.texts:
+            yield Chunk(start, start + len(text), None, text)
+            start += len(text)
+
+
+@pytest.fixture(autouse=True)
+def config(monkeypatch):
+    monkeypatch.setattr(Config, "EMBEDDING_DIMENSION", EMBEDDING_DIM)
+    monkeypatch.setattr(Config, "SEMANTIC_CACHE_ENABLED", False)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A manual wall clock for the chunks' upload times"""
+    now = [1000.0]
+    monkeypatch.setattr(rag_service.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalVectorStore(path=str(tmp_path / "index"))
+    store.create_collection()
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def service(store):
+    embedder = FakeCohereManager(0, 0)
+    return RAGService(store, embedder, embedding_manager=embedder)
+
+
+def upload(service, texts, tenant=None, filename="doc.txt"):
+    service.document_processor = FakeDocumentProcessor(texts)
+    return service.process_and_store_document("unused", filename, tenant)
+
+
+def stored(store, tenant=None, filename="doc.txt"):
+    """The stored payloads of a tenant's document, by content"""
+    hits = store.search_vectors([1.0] * EMBEDDING_DIM, limit=100, filters={"sources": [filename], "tenant": tenant})
+    return {hit.payload["content"]: hit.payload for hit in hits if hit.payload.get("tenant") == tenant}
+
+
+def counts(result):
+    return result["chunks_added"], result["chunks_unchanged"], result["chunks_removed"]
+
+
+def test_reupload_of_an_unchanged_document_embeds_nothing(service, store):
+    assert counts(upload(service, ["alpha", "beta", "gamma"])) == (3, 0, 0)
+    embed_calls = service.embedding_manager.embed_calls
+
+    assert counts(upload(service, ["alpha", "beta", "gamma"])) == (0, 3, 0)
+    assert service.embedding_manager.embed_calls == embed_calls
+    assert set(stored(store)) == {"alpha", "beta", "gamma"}
+
+
+def test_reupload_embeds_added_chunks_and_deletes_stale_ones(service, store):
+    upload(service, ["alpha", "beta", "gamma"])
+
+    assert counts(upload(service, ["alpha", "delta", "gamma", "alpha"])) == (1, 2, 1)
+    assert set(stored(store)) == {"alpha", "delta", "gamma"}
+    assert store.get_collection_info().points_count == 3
+
+
+def test_reupload_refreshes_the_payloads_of_moved_chunks(service, store, clock):
+    upload(service, ["alpha", "beta"])
+    clock[0] += 60
+
+    upload(service, ["delta", "alpha", "beta"])
+    payloads = stored(store)
+    assert [(payloads[text]["chunk_index"], payloads[text]["start"], payloads[text]["end"])
+            for text in ("delta", "alpha", "beta")] == [(0, 0, 5), (1, 5, 10), (2, 10, 14)]
+    assert {payload["uploaded_at"] for payload in payloads.values()} == {1060}
+
+
+def test_manifests_are_scoped_by_tenant(service, store):
+    assert counts(upload(service, ["alpha", "beta"], tenant="acme")) == (2, 0, 0)
+    # The same document of another tenant is stored (and embedded) separately
+    assert counts(upload(service, ["alpha", "beta"], tenant="globex")) == (2, 0, 0)
+
+    # Editing one tenant's copy leaves the other's alone
+    assert counts(upload(service, ["alpha"], tenant="acme")) == (0, 1, 1)
+    assert set(stored(store, "acme")) == {"alpha"}
+    assert set(stored(store, "globex")) == {"alpha", "beta"}
+    assert store.get_source_point_ids("doc.txt") == set()
+
+
+def test_async_reupload_matches_the_sync_one(store, clock):
+    embedder = AsyncFakeCohereManager(0, 0)
+    service = AsyncRAGService(AsyncLocalVectorStore(store), embedder, embedding_manager=embedder)
+
+    async def run():
+        service.document_processor = FakeDocumentProcessor(["alpha", "beta", "gamma"])
+        await service.process_and_store_document("unused", "doc.txt")
+        clock[0] += 60
+        service.document_processor = FakeDocumentProcessor(["delta", "gamma", "alpha"])
+        return await service.process_and_store_document("unused", "doc.txt")
+
+    try:
+        assert counts(asyncio.run(run())) == (1, 2, 1)
+    finally:
+        service.close()
+    payloads = stored(store)
+    assert set(payloads) == {"delta", "gamma", "alpha"}
+    assert [payloads[text]["chunk_index"] for text in ("delta", "gamma", "alpha")] == [0, 1, 2]
+    assert {payload["uploaded_at"] for payload in payloads.values()} == {1060}
@@ -0,0 +1,180 @@
+"""
+Unit tests for IngestionPipeline and AsyncIngestionPipeline with a fake embedder and vector store
+(no network access)
+"""
+import asyncio
+import threading
+import time
+import pytest
+import ingestion_pipeline
+from ingestion_pipeline import AsyncIngestionPipeline, IngestionPipeline, backoff_delay, make_batches
+
+
+def make_records(count: int):
+    return [(f"id-{i}", {"content": f"chunk {i}"}, None) for i in range(count)]
+
+
+class CountingEmbedder:
+    """Counts embed calls and the most calls in flight at once; texts in fail_texts fail the first failures calls"""
+
+    def __init__(self, latency: float = 0.01, fail_texts=(), failures: int = 0):
+        self.latency = latency
+        self.fail_texts = set(fail_texts)
+        self.failures = failures
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._failed = 0
+        self._lock = threading.Lock()
+
+    def _enter(self, texts):
+        with self._lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            fail = self._failed < self.failures and not self.fail_texts.isdisjoint(texts)
+            if fail:
+                self._failed += 1
+        return fail
+
+    def _exit(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def embed_texts(self, texts, input_type="search_document"):
+        fail = self._enter(texts)
+        try:
+            time.sleep(self.latency)
+            if fail:
+                raise Exception("Transient embedding failure")
+            return [[float(len(text)), 1.0] for text in texts]
+        finally:
+            self._exit()
+
+
+class AsyncCountingEmbedder(CountingEmbedder):
+    async def embed_texts(self, texts, input_type="search_document"):
+        fail = self._enter(texts)
+        try:
+            await asyncio.sleep(self.latency)
+            if fail:
+                raise Exception("Transient embedding failure")
+            return [[float(len(text)), 1.0] for text in texts]
+        finally:
+            self._exit()
+
+
+class RecordingStore:
+    def __init__(self):
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def insert_vectors(self, vectors, payloads, ids, sparse_vectors=None):
+        assert len(vectors) == len(payloads) == len(ids)
+        with self._lock:
+            self.batches.append(list(ids))
+
+    @property
+    def ids(self):
+        return sorted(point_id for batch in self.batches for point_id in batch)
+
+
+class AsyncRecordingStore(RecordingStore):
+    async def insert_vectors(self, vectors, payloads, ids, sparse_vectors=None):
+        RecordingStore.insert_vectors(self, vectors, payloads, ids, sparse_vectors)
+
+
+@pytest.fixture
+def backoffs(monkeypatch):
+    """Record each (attempt, base) backoff and don't actually wait"""
+    delays = []
+
+    def record(attempt, base):
+        delays.append((attempt, base))
+        return 0.0
+
+    monkeypatch.setattr(ingestion_pipeline, "backoff_delay", record)
+    return delays
+
+
+def test_make_batches_sizes():
+    assert [len(batch) for batch in make_batches(make_records(10), 4)] == [4, 4, 2]
+    assert list(make_batches([], 4)) == []
+
+
+def test_backoff_delay_bounds():
+    for attempt in range(5):
+        for _ in range(50):
+            assert 0 <= backoff_delay(attempt, 0.5) <= 0.5 * 2 ** attempt
+
+
+def test_run_embeds_and_stores_every_batch():
+    embedder, store = CountingEmbedder(), RecordingStore()
+    pipeline = IngestionPipeline(embedder, store, batch_size=4, max_concurrency=2)
+
+    assert pipeline.run(make_records(10)) == 10
+    assert embedder.calls == 3
+    assert sorted(len(batch) for batch in store.batches) == [2, 4, 4]
+    assert store.ids == sorted(f"id-{i}" for i in range(10))
+
+
+def test_run_never_exceeds_concurrency_limit():
+    embedder, store = CountingEmbedder(latency=0.02), RecordingStore()
+    pipeline = IngestionPipeline(embedder, store, batch_size=2, max_concurrency=3)
+
+    assert pipeline.run(make_records(40)) == 40
+    assert embedder.calls == 20
+    assert 1 < embedder.max_in_flight <= 3
+
+
+def test_run_retries_failing_batch_with_backoff(backoffs):
+    embedder = CountingEmbedder(fail_texts=["chunk 5"], failures=2)
+    store = RecordingStore()
+    pipeline = IngestionPipeline(embedder, store, batch_size=4, max_concurrency=2, max_retries=3, retry_backoff=0.5)
+
+    assert pipeline.run(make_records(10)) == 10
+    assert embedder.calls == 3 + 2
+    assert backoffs == [(0, 0.5), (1, 0.5)]
+    assert store.ids == sorted(f"id-{i}" for i in range(10))
+
+
+def test_run_raises_once_retries_are_exhausted(backoffs):
+    embedder = CountingEmbedder(fail_texts=["chunk 0"], failures=10)
+    pipeline = IngestionPipeline(embedder, RecordingStore(), batch_size=4, max_concurrency=1, max_retries=2)
+
+    with pytest.raises(Exception, match="Transient embedding failure"):
+        pipeline.run(make_records(4))
+    assert embedder.calls == 3
+    assert [attempt for attempt, _ in backoffs] == [0, 1]
+
+
+def test_async_run_embeds_and_stores_every_batch():
+    embedder, store = AsyncCountingEmbedder(), AsyncRecordingStore()
+    pipeline = AsyncIngestionPipeline(embedder, store, batch_size=4, max_concurrency=2)
+    progress = []
+
+    assert asyncio.run(pipeline.run(make_records(10), on_progress=progress.append)) == 10
+    assert embedder.calls == 3
+    assert store.ids == sorted(f"id-{i}" for i in range(10))
+    assert progress[-1] == 10
+
+
+def test_async_run_never_exceeds_concurrency_limit():
+    embedder, store = AsyncCountingEmbedder(latency=0.01), AsyncRecordingStore()
+    pipeline = AsyncIngestionPipeline(embedder, store, batch_size=2, max_concurrency=3)
+
+    assert asyncio.run(pipeline.run(make_records(40))) == 40
+    assert embedder.calls == 20
+    assert embedder.max_in_flight == 3
+
+
+def test_async_run_retries_failing_batch_with_backoff(backoffs):
+    embedder = AsyncCountingEmbedder(fail_texts=["chunk 5"], failures=2)
+    store = AsyncRecordingStore()
+    pipeline = AsyncIngestionPipeline(embedder, store, batch_size=4, max_concurrency=2, max_retries=3,
+                                      retry_backoff=0.5)
+
+    assert asyncio.run(pipeline.run(make_records(10))) == 10
+    assert embedder.calls == 3 + 2
+    assert backoffs == [(0, 0.5), (1, 0.5)]
+    assert store.ids == sorted(f"id-{i}" for i in range(10))
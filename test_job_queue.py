@@ -0,0 +1,112 @@
+"""
+Unit tests for IngestionQueue ordering (priority, per-tenant fairness) and job lifecycle
+"""
+import asyncio
+import os
+import tempfile
+import pytest
+from job_queue import IngestionQueue, QueueFullError
+
+
+class RecordingService:
+    """Stands in for AsyncRAGService; records the order documents are processed in"""
+
+    def __init__(self, fail_on=()):
+        self.processed = []
+        self.fail_on = set(fail_on)
+
+    async def process_and_store_document(self, path, filename, tenant=None, on_progress=None):
+        self.processed.append((tenant, filename))
+        if on_progress is not None:
+            on_progress({"chunks_parsed": 1, "chunks_added": 1})
+        await asyncio.sleep(0)
+        if filename in self.fail_on:
+            raise ValueError(f"Cannot parse {filename}")
+        return {"message": f"Successfully processed {filename}"}
+
+
+def spool(directory: str, name: str) -> str:
+    path = os.path.join(directory, name)
+    with open(path, "w") as f:
+        f.write("content")
+    return path
+
+
+async def drain(queue: IngestionQueue, uploads):
+    """Submit all uploads before starting a single worker, then wait until every job finished"""
+    jobs = [await queue.submit(*upload) for upload in uploads]
+    queue.start()
+    while any(job.finished_at is None for job in jobs):
+        await asyncio.sleep(0.001)
+    await queue.close()
+    return jobs
+
+
+@pytest.fixture
+def spool_dir():
+    with tempfile.TemporaryDirectory() as directory:
+        yield directory
+
+
+def test_higher_priority_jobs_go_first(spool_dir):
+    service = RecordingService()
+    queue = IngestionQueue(service, workers=1)
+    uploads = [(spool(spool_dir, name), name, "acme", priority)
+               for name, priority in (("low.txt", 0), ("high.txt", 5), ("mid.txt", 1), ("low2.txt", 0))]
+
+    asyncio.run(drain(queue, uploads))
+    assert [filename for _, filename in service.processed] == ["high.txt", "mid.txt", "low.txt", "low2.txt"]
+
+
+def test_tenants_take_turns_at_equal_priority(spool_dir):
+    service = RecordingService()
+    queue = IngestionQueue(service, workers=1)
+    # One tenant's bulk upload is queued before another tenant's single document
+    uploads = [(spool(spool_dir, f"bulk{i}.txt"), f"bulk{i}.txt", "bulk", 0) for i in range(4)]
+    uploads += [(spool(spool_dir, f"small{i}.txt"), f"small{i}.txt", "small", 0) for i in range(2)]
+
+    asyncio.run(drain(queue, uploads))
+    assert service.processed == [
+        ("bulk", "bulk0.txt"), ("small", "small0.txt"),
+        ("bulk", "bulk1.txt"), ("small", "small1.txt"),
+        ("bulk", "bulk2.txt"), ("bulk", "bulk3.txt"),
+    ]
+
+
+def test_priority_wins_over_tenant_fairness(spool_dir):
+    service = RecordingService()
+    queue = IngestionQueue(service, workers=1)
+    uploads = [(spool(spool_dir, "a0.txt"), "a0.txt", "a", 0), (spool(spool_dir, "a1.txt"), "a1.txt", "a", 3),
+               (spool(spool_dir, "b0.txt"), "b0.txt", "b", 0)]
+
+    asyncio.run(drain(queue, uploads))
+    # a's high-priority job goes first even though b is waiting; then b, served less recently, is next
+    assert [filename for _, filename in service.processed] == ["a1.txt", "b0.txt", "a0.txt"]
+
+
+def test_job_status_result_and_spool_cleanup(spool_dir):
+    service = RecordingService(fail_on=["bad.txt"])
+    queue = IngestionQueue(service, workers=1)
+    good, bad = spool(spool_dir, "good.txt"), spool(spool_dir, "bad.txt")
+
+    good_job, bad_job = asyncio.run(drain(queue, [(good, "good.txt"), (bad, "bad.txt")]))
+    assert good_job.status == "succeeded"
+    assert good_job.result == {"message": "Successfully processed good.txt"}
+    assert good_job.progress == {"chunks_parsed": 1, "chunks_added": 1}
+    assert bad_job.status == "failed" and bad_job.error == "Cannot parse bad.txt"
+    assert not os.path.exists(good) and not os.path.exists(bad)
+    assert queue.stats()["jobs"] == {"succeeded": 1, "failed": 1}
+
+
+def test_submit_rejects_jobs_when_full(spool_dir):
+    async def fill():
+        queue = IngestionQueue(RecordingService(), workers=1, max_queued=2)
+        for i in range(2):
+            await queue.submit(spool(spool_dir, f"{i}.txt"), f"{i}.txt")
+        with pytest.raises(QueueFullError):
+            await queue.submit(spool(spool_dir, "extra.txt"), "extra.txt")
+        await queue.close()
+
+    asyncio.run(fill())
+    # Closing dropped the queued jobs together with their spooled files
+    assert os.listdir(spool_dir) == ["extra.txt"]
@@ -0,0 +1,185 @@
+"""
+Unit tests for the embedded LocalVectorStore: upsert, search, filters, delete and reopening from disk
+"""
+import asyncio
+import numpy as np
+import pytest
+from config import Config
+import local_vector_store
+from local_vector_store import AsyncLocalVectorStore, IndexInUseError, LocalVectorStore
+
+DIMENSION = 8
+
+
+def unit(index: int, dimension: int = DIMENSION):
+    vector = [0.0] * dimension
+    vector[index] = 1.0
+    return vector
+
+
+def payload(source: str, tenant: str = None, uploaded_at: int = 0, content: str = ""):
+    point = {"content": content or source, "source": source, "uploaded_at": uploaded_at}
+    if tenant is not None:
+        point["tenant"] = tenant
+    return point
+
+
+@pytest.fixture(autouse=True)
+def small_index(monkeypatch):
+    monkeypatch.setattr(Config, "EMBEDDING_DIMENSION", DIMENSION)
+    monkeypatch.setattr(Config, "LOCAL_IVF_MIN_POINTS", 0)
+
+
+@pytest.fixture(params=["float32", "int8"])
+def store(request, tmp_path):
+    store = LocalVectorStore(path=str(tmp_path / "index"), dtype=request.param)
+    store.create_collection()
+    yield store
+    store.close()
+
+
+def test_search_returns_nearest_points_first(store):
+    store.insert_vectors([unit(0), unit(1), [1.0, 1.0] + [0.0] * (DIMENSION - 2)],
+                         [payload("a.txt"), payload("b.txt"), payload("c.txt")], ["a", "b", "c"])
+
+    hits = store.search_vectors(unit(0), limit=2)
+    assert [hit.id for hit in hits] == ["a", "c"]
+    assert hits[0].score == pytest.approx(1.0, abs=0.01)
+    assert hits[1].score == pytest.approx(np.sqrt(0.5), abs=0.01)
+    assert hits[0].payload["source"] == "a.txt"
+
+
+def test_upsert_overwrites_an_existing_point(store):
+    store.insert_vectors([unit(0)], [payload("a.txt", content="old")], ["a"])
+    store.insert_vectors([unit(1)], [payload("a.txt", content="new")], ["a"])
+
+    assert store.points_count == 1
+    hits = store.search_vectors(unit(1), limit=5)
+    assert [(hit.id, hit.payload["content"]) for hit in hits] == [("a", "new")]
+    assert hits[0].score == pytest.approx(1.0, abs=0.01)
+
+
+def test_filters_by_tenant_source_and_upload_time(store):
+    store.insert_vectors(
+        [unit(0)] * 4,
+        [payload("a.txt", "acme", 100), payload("b.txt", "acme", 200), payload("a.txt", "globex", 300),
+         payload("a.txt", None, 400)],
+        ["acme-a", "acme-b", "globex-a", "shared-a"],
+    )
+
+    def ids(filters):
+        return sorted(hit.id for hit in store.search_vectors(unit(0), limit=10, filters=filters))
+
+    assert ids(None) == ["acme-a", "acme-b", "globex-a", "shared-a"]
+    assert ids({"tenant": "acme"}) == ["acme-a", "acme-b"]
+    assert ids({"tenant": "initech"}) == []
+    assert ids({"sources": ["a.txt"]}) == ["acme-a", "globex-a", "shared-a"]
+    assert ids({"tenant": "acme", "sources": ["b.txt"]}) == ["acme-b"]
+    assert ids({"uploaded_after": 200, "uploaded_before": 300}) == ["acme-b", "globex-a"]
+
+
+def test_source_point_ids_are_per_tenant(store):
+    store.insert_vectors([unit(0)] * 3, [payload("a.txt", "acme"), payload("a.txt", "acme"), payload("a.txt")],
+                         ["p1", "p2", "p3"])
+
+    assert store.get_source_point_ids("a.txt", "acme") == {"p1", "p2"}
+    assert store.get_source_point_ids("a.txt") == {"p3"}
+    assert store.get_source_point_ids("b.txt", "acme") == set()
+
+
+def test_delete_removes_points_and_reuses_their_rows(store):
+    store.insert_vectors([unit(0), unit(1)], [payload("a.txt"), payload("b.txt")], ["a", "b"])
+
+    store.delete_points(["a"])
+    assert store.points_count == 1
+    assert [hit.id for hit in store.search_vectors(unit(0), limit=5)] == ["b"]
+    assert store.get_source_point_ids("a.txt") == set()
+
+    store.insert_vectors([unit(2)], [payload("c.txt")], ["c"])
+    assert store.count == 2
+    assert [hit.id for hit in store.search_vectors(unit(2), limit=1)] == ["c"]
+
+
+def test_reopen_from_disk_keeps_points_payloads_and_deletions(tmp_path):
+    path = str(tmp_path / "index")
+    store = LocalVectorStore(path=path, dtype="int8")
+    store.create_collection()
+    store.insert_vectors([unit(i) for i in range(4)], [payload(f"{i}.txt", "acme") for i in range(4)],
+                         [f"p{i}" for i in range(4)])
+    store.delete_points(["p1"])
+    store.close()
+
+    reopened = LocalVectorStore(path=path)
+    reopened.create_collection()
+    try:
+        assert reopened.dtype == np.int8
+        assert reopened.points_count == 3
+        assert reopened.get_collection_info().points_count == 3
+        hits = reopened.search_vectors(unit(2), limit=1, filters={"tenant": "acme"})
+        assert [(hit.id, hit.payload["source"]) for hit in hits] == [("p2", "2.txt")]
+        # The deleted point's row is free again
+        reopened.insert_vectors([unit(5)], [payload("5.txt")], ["p5"])
+        assert reopened.count == 4
+    finally:
+        reopened.close()
+
+
+@pytest.mark.skipif(local_vector_store.fcntl is None, reason="the index is only locked where fcntl exists")
+def test_index_can_only_be_open_once(tmp_path):
+    path = str(tmp_path / "index")
+    store = LocalVectorStore(path=path)
+    store.create_collection()
+
+    # flock locks conflict between separately opened files, even within one process
+    with pytest.raises(IndexInUseError):
+        LocalVectorStore(path=path).create_collection()
+    store.close()
+    other = LocalVectorStore(path=path)
+    other.create_collection()
+    other.close()
+
+
+def test_index_grows_beyond_its_initial_capacity(store):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(1500, DIMENSION)).tolist()
+    store.insert_vectors(vectors, [payload("bulk.txt")] * 1500, [f"p{i}" for i in range(1500)])
+
+    assert store.points_count == 1500
+    assert store.search_vectors(vectors[1234], limit=1)[0].id == "p1234"
+
+
+def test_ivf_index_finds_exact_matches(store, monkeypatch):
+    monkeypatch.setattr(Config, "LOCAL_IVF_NPROBE", 4)
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(400, DIMENSION)).tolist()
+    store.insert_vectors(vectors, [payload("bulk.txt")] * 400, [f"p{i}" for i in range(400)])
+
+    store.build_index(lists=8)
+    assert store.get_collection_info().ivf_lists == 8
+    found = sum(store.search_vectors(vectors[i], limit=1)[0].id == f"p{i}" for i in range(0, 400, 10))
+    assert found >= 36
+
+
+def test_batch_search_matches_single_searches(store):
+    store.insert_vectors([unit(i) for i in range(4)], [payload(f"{i}.txt", "acme" if i % 2 else None) for i in range(4)],
+                         [f"p{i}" for i in range(4)])
+    requests = [(unit(0), 2, None, None), (unit(1), 1, None, {"tenant": "acme"}), (unit(3), 3, None, None)]
+
+    batched = store.search_batch(requests)
+    assert batched == [store.search_vectors(vector, limit, filters=filters) for vector, limit, _, filters in requests]
+
+
+def test_async_store_round_trip(tmp_path):
+    async def run():
+        store = AsyncLocalVectorStore(LocalVectorStore(path=str(tmp_path / "index")))
+        await store.create_collection()
+        await store.insert_vectors([unit(0), unit(1)], [payload("a.txt"), payload("b.txt")], ["a", "b"])
+        hits = await store.search_vectors(unit(1), limit=1)
+        await store.delete_points(["b"])
+        remaining = await store.get_source_point_ids("b.txt")
+        await store.close()
+        return hits, remaining
+
+    hits, remaining = asyncio.run(run())
+    assert [hit.id for hit in hits] == ["b"]
+    assert remaining == set()
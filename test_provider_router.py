@@ -0,0 +1,212 @@
+"""
+Unit tests for CircuitBreaker, ProviderRouter and AsyncProviderRouter with fake providers
+"""
+import asyncio
+import pytest
+import provider_router
+from config import Config
+from provider_router import AsyncProviderRouter, CircuitBreaker, ProviderRouter
+
+
+class FakeProvider:
+    def __init__(self, name: str, fail: bool = False, latency: float = 0.0):
+        self.name = name
+        self.fail = fail
+        self.latency = latency
+        self.calls = 0
+
+    def generate_response(self, prompt, history=None):
+        self.calls += 1
+        if self.fail:
+            raise Exception(f"{self.name} is down")
+        return f"answer from {self.name}"
+
+
+class AsyncFakeProvider(FakeProvider):
+    async def generate_response(self, prompt, history=None):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            raise Exception(f"{self.name} is down")
+        return f"answer from {self.name}"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A manual monotonic clock for the circuit breakers"""
+    now = [1000.0]
+    monkeypatch.setattr(provider_router.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.fixture(autouse=True)
+def router_config(monkeypatch):
+    monkeypatch.setattr(Config, "ROUTER_POLICY", "preferred")
+    monkeypatch.setattr(Config, "ROUTER_HEDGE", False)
+    monkeypatch.setattr(Config, "CIRCUIT_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(Config, "CIRCUIT_RESET_SECONDS", 30.0)
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_seconds=10)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_breaker_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_seconds=10)
+
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_breaker_half_opens_after_cooldown_with_a_single_probe(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=10)
+    breaker.record_failure()
+
+    clock[0] += 9.9
+    assert breaker.state == "open"
+    clock[0] += 0.1
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow()
+
+
+def test_breaker_failed_probe_reopens_the_circuit(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=10)
+    breaker.record_failure()
+    clock[0] += 10
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock[0] += 10
+    assert breaker.state == "half-open"
+
+
+def test_breaker_released_probe_can_be_retried(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_seconds=10)
+    breaker.record_failure()
+    clock[0] += 10
+    assert breaker.allow()
+
+    breaker.release()
+    assert breaker.allow()
+
+
+def test_router_prefers_the_requested_provider():
+    cohere, gemini = FakeProvider("cohere"), FakeProvider("gemini")
+    router = ProviderRouter({"cohere": cohere, "gemini": gemini})
+
+    assert router.generate("prompt", "gemini") == ("answer from gemini", "gemini")
+    assert router.generate("prompt", "cohere") == ("answer from cohere", "cohere")
+
+
+def test_router_falls_back_in_order():
+    first, second, third = FakeProvider("first", fail=True), FakeProvider("second", fail=True), FakeProvider("third")
+    router = ProviderRouter({"first": first, "second": second, "third": third})
+
+    assert router.generate("prompt", "first") == ("answer from third", "third")
+    assert (first.calls, second.calls, third.calls) == (1, 1, 1)
+
+
+def test_router_skips_providers_with_an_open_circuit(clock):
+    cohere, gemini = FakeProvider("cohere", fail=True), FakeProvider("gemini")
+    router = ProviderRouter({"cohere": cohere, "gemini": gemini})
+
+    for _ in range(3):
+        assert router.generate("prompt", "cohere")[1] == "gemini"
+    # The circuit opened after CIRCUIT_FAILURE_THRESHOLD failures
+    assert cohere.calls == 2
+    assert router.stats()["cohere"]["circuit"] == "open"
+
+    # After the cooldown one probe goes to the recovered provider and closes its circuit
+    cohere.fail = False
+    clock[0] += Config.CIRCUIT_RESET_SECONDS
+    assert router.generate("prompt", "cohere") == ("answer from cohere", "cohere")
+    assert router.stats()["cohere"]["circuit"] == "closed"
+
+
+def test_router_raises_when_every_circuit_is_open(clock):
+    router = ProviderRouter({"cohere": FakeProvider("cohere", fail=True)})
+
+    for _ in range(2):
+        with pytest.raises(Exception, match="cohere is down"):
+            router.generate("prompt")
+    with pytest.raises(Exception, match="all circuits open"):
+        router.generate("prompt")
+
+
+def test_latency_policy_tries_the_fastest_provider_first(monkeypatch):
+    monkeypatch.setattr(Config, "ROUTER_POLICY", "latency")
+    router = ProviderRouter({"slow": FakeProvider("slow"), "fast": FakeProvider("fast")})
+    slow, fast = router.providers
+    for _ in range(20):
+        slow.latency.record(1.0)
+        fast.latency.record(0.1)
+
+    assert [provider.name for provider in router.candidates("slow")] == ["fast", "slow"]
+
+
+def test_async_router_falls_back_in_order():
+    first, second = AsyncFakeProvider("first", fail=True), AsyncFakeProvider("second")
+    router = AsyncProviderRouter({"first": first, "second": second})
+
+    assert asyncio.run(router.generate("prompt", "first")) == ("answer from second", "second")
+    assert (first.calls, second.calls) == (1, 1)
+
+
+def test_async_router_hedges_slow_provider_without_recording_cancelled_latency(monkeypatch):
+    monkeypatch.setattr(Config, "ROUTER_HEDGE", True)
+    monkeypatch.setattr(Config, "ROUTER_HEDGE_DELAY_MS", 20)
+    slow, fast = AsyncFakeProvider("slow", latency=1.0), AsyncFakeProvider("fast", latency=0.01)
+    router = AsyncProviderRouter({"slow": slow, "fast": fast})
+
+    assert asyncio.run(router.generate("prompt", "slow")) == ("answer from fast", "fast")
+    stats = router.stats()
+    assert stats["fast"]["samples"] == 1
+    # The cancelled attempt only ran until the hedge won, which is not the slow provider's latency
+    assert stats["slow"]["samples"] == 0
+    assert stats["slow"]["circuit"] == "closed"
+
+
+def test_async_router_hedges_the_fallback_on_its_own_latency(monkeypatch):
+    monkeypatch.setattr(Config, "ROUTER_HEDGE", True)
+    monkeypatch.setattr(Config, "ROUTER_HEDGE_DELAY_MS", 0)
+    first, second, third = (AsyncFakeProvider("first", fail=True), AsyncFakeProvider("second", latency=1.0),
+                            AsyncFakeProvider("third"))
+    router = AsyncProviderRouter({"first": first, "second": second, "third": third})
+    for provider, seconds in zip(router.providers, (5.0, 0.01, 0.01)):
+        for _ in range(Config.ROUTER_MIN_SAMPLES):
+            provider.latency.record(seconds)
+
+    # The fallback to second is hedged after second's p95, not after the failed first provider's
+    assert asyncio.run(router.generate("prompt", "first")) == ("answer from third", "third")
+    assert (first.calls, second.calls, third.calls) == (1, 1, 1)
+
+
+def test_async_router_stream_records_time_to_first_token():
+    class StreamingProvider(AsyncFakeProvider):
+        async def stream_response(self, prompt, history=None):
+            await asyncio.sleep(self.latency)
+            for token in ("answer ", "from ", self.name):
+                yield token
+
+    router = AsyncProviderRouter({"slow": StreamingProvider("slow", latency=0.05)})
+
+    async def collect():
+        return [token async for token, _ in router.stream("prompt")]
+
+    assert "".join(asyncio.run(collect())) == "answer from slow"
+    samples = router.providers[0].latency.samples
+    assert len(samples) == 1 and samples[0] >= 0.05
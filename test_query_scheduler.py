@@ -0,0 +1,112 @@
+"""
+Unit tests for MicroBatcher and QueryScheduler: flushing on size and on wait, failures and cancelled callers
+"""
+import asyncio
+import pytest
+from benchmarks.stubs import AsyncFakeCohereManager, AsyncFakeQdrantManager, fake_embedding
+from query_scheduler import MicroBatcher, QueryScheduler
+
+
+class RecordingProcessor:
+    """Records each batch it's given and answers every item with its double, or fails"""
+
+    def __init__(self, latency: float = 0.0, fail: bool = False):
+        self.latency = latency
+        self.fail = fail
+        self.batches = []
+
+    async def __call__(self, items):
+        self.batches.append(list(items))
+        await asyncio.sleep(self.latency)
+        if self.fail:
+            raise Exception("Batch failed")
+        return [item * 2 for item in items]
+
+
+def test_batch_flushes_when_full_without_waiting():
+    processor = RecordingProcessor()
+    batcher = MicroBatcher(processor, max_batch_size=3, max_wait_ms=10_000)
+
+    async def run():
+        return await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(6))), timeout=1)
+
+    assert asyncio.run(run()) == [0, 2, 4, 6, 8, 10]
+    assert processor.batches == [[0, 1, 2], [3, 4, 5]]
+    assert batcher.stats.as_dict()["batch_sizes"] == {3: 2}
+
+
+def test_partial_batch_flushes_after_max_wait():
+    processor = RecordingProcessor()
+    batcher = MicroBatcher(processor, max_batch_size=10, max_wait_ms=20)
+
+    async def run():
+        first = asyncio.ensure_future(asyncio.gather(batcher.submit(1), batcher.submit(2)))
+        await asyncio.sleep(0.005)
+        assert not first.done()
+        return await first
+
+    assert asyncio.run(run()) == [2, 4]
+    assert processor.batches == [[1, 2]]
+    stats = batcher.stats.as_dict()
+    assert stats["average_batch_size"] == 2.0 and stats["max_queue_delay_ms"] >= 15
+
+
+def test_one_failure_fails_every_caller_of_the_batch():
+    batcher = MicroBatcher(RecordingProcessor(fail=True), max_batch_size=3, max_wait_ms=10)
+
+    async def run():
+        return await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert len(results) == 3
+    assert all(isinstance(result, Exception) and str(result) == "Batch failed" for result in results)
+
+
+def test_cancelled_callers_drop_out_of_the_batch():
+    processor = RecordingProcessor()
+    batcher = MicroBatcher(processor, max_batch_size=10, max_wait_ms=20)
+
+    async def run():
+        kept = asyncio.ensure_future(batcher.submit(1))
+        cancelled = asyncio.ensure_future(batcher.submit(2))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        return await kept
+
+    assert asyncio.run(run()) == 2
+    assert processor.batches == [[1]]
+
+
+def test_caller_cancelled_during_processing_leaves_the_others_their_results():
+    processor = RecordingProcessor(latency=0.02)
+    batcher = MicroBatcher(processor, max_batch_size=2, max_wait_ms=10_000)
+
+    async def run():
+        kept = asyncio.ensure_future(batcher.submit(1))
+        cancelled = asyncio.ensure_future(batcher.submit(2))
+        await asyncio.sleep(0.005)
+        cancelled.cancel()
+        return await kept
+
+    assert asyncio.run(run()) == 2
+    assert processor.batches == [[1, 2]]
+
+
+def test_scheduler_coalesces_concurrent_embeddings_and_searches():
+    embedder, store = AsyncFakeCohereManager(0, 0), AsyncFakeQdrantManager(0)
+    scheduler = QueryScheduler(embedder, store, max_batch_size=8, max_wait_ms=5)
+    queries = ["first question", "second question", "third question"]
+
+    async def run():
+        await store.insert_vectors([fake_embedding("chunk")], [{"content": "chunk"}], ["p1"])
+        vectors = await asyncio.gather(*(scheduler.embed_query(query) for query in queries))
+        results = await asyncio.gather(*(scheduler.search_vectors(vector, limit=1) for vector in vectors))
+        return vectors, results
+
+    vectors, results = asyncio.run(run())
+    assert vectors == [fake_embedding(query) for query in queries]
+    assert [[hit.id for hit in hits] for hits in results] == [["p1"]] * 3
+    assert (embedder.embed_calls, store.search_calls) == (1, 1)
+    assert scheduler.stats()["search"]["batch_sizes"] == {3: 1}
@@ -4,6 +4,7 @@ Test script for the RAG Chatbot with both Cohere and Gemini models
 import asyncio
 import requests
 import json
+import time
 from pathlib import Path
 
 # Configuration
@@ -42,13 +43,24 @@ def test_document_upload():
             files = {"file": ("sample_document.txt", f, "text/plain")}
             response = requests.post(f"{BASE_URL}/upload/", files=files)
 
-        if response.status_code == 200:
-            result = response.json()
-            print(f"   ✓ Document uploaded successfully: {result}")
-            return True
-        else:
+        if response.status_code != 202:
             print(f"   ✗ Document upload failed: {response.status_code} - {response.text}")
             return False
+
+        # Indexing happens in the background; poll the job until it is done
+        job_id = response.json()["job_id"]
+        print(f"   Document queued as job {job_id}")
+        for _ in range(120):
+            job = requests.get(f"{BASE_URL}/jobs/{job_id}").json()
+            if job["status"] == "succeeded":
+                print(f"   ✓ Document uploaded successfully: {job['result']}")
+                return True
+            if job["status"] == "failed":
+                print(f"   ✗ Document upload failed: {job['error']}")
+                return False
+            time.sleep(1)
+        print(f"   ✗ Document upload still {job['status']} after 120s")
+        return False
     except Exception as e:
         print(f"   ✗ Document upload error: {e}")
         return False
@@ -111,6 +123,55 @@ def test_gemini_chat():
         print(f"   ✗ Gemini chat error: {e}")
         return False
 
+def test_streaming_chat():
+    print("\n6. Testing streaming chat functionality...")
+    try:
+        query_data = {
+            "message": "What are some example use cases of RAG?",
+            "history": [],
+            "use_gemini": False
+        }
+
+        with requests.post(f"{BASE_URL}/chat/stream", json=query_data, stream=True) as response:
+            if response.status_code != 200:
+                print(f"   ✗ Streaming chat failed: {response.status_code} - {response.text}")
+                return False
+
+            events = [json.loads(line) for line in response.iter_lines() if line]
+
+        tokens = [event["text"] for event in events if event["type"] == "token"]
+        if events and events[0]["type"] == "sources" and events[-1]["type"] == "done":
+            print(f"   ✓ Streaming chat received {len(tokens)} token events:")
+            print(f"     Message: {''.join(tokens)[:200]}...")
+            print(f"     Sources: {events[0]['sources']}")
+            return True
+        else:
+            print(f"   ✗ Unexpected streaming events: {events[:3]}")
+            return False
+    except Exception as e:
+        print(f"   ✗ Streaming chat error: {e}")
+        return False
+
+def test_follow_up_chat():
+    print("\n7. Testing a follow-up question in a server-side session...")
+    try:
+        session_id = f"test-{int(time.time())}"
+        messages = ["What is a RAG system?", "And what are its benefits?"]
+        for message in messages:
+            response = requests.post(f"{BASE_URL}/chat/", json={"message": message, "session_id": session_id})
+            if response.status_code != 200:
+                print(f"   ✗ Follow-up chat failed: {response.status_code} - {response.text}")
+                return False
+            print(f"     {message} -> {response.json()['message'][:100]}...")
+
+        stats = requests.get(f"{BASE_URL}/cache/stats").json()["conversation"]
+        requests.delete(f"{BASE_URL}/sessions/{session_id}")
+        print(f"   ✓ Follow-up answered (chunk reuse so far: {stats['hits']} reused, {stats['misses']} searched)")
+        return True
+    except Exception as e:
+        print(f"   ✗ Follow-up chat error: {e}")
+        return False
+
 def main():
     print("Starting RAG Chatbot tests...")
 
@@ -127,6 +188,12 @@ def main():
         # Test Gemini chat functionality
         gemini_success = test_gemini_chat()
 
+        # Test streaming chat functionality
+        test_streaming_chat()
+
+        # Test a conversation kept server-side
+        test_follow_up_chat()
+
         if cohere_success and gemini_success:
             print("\n✓ All tests passed! Both Cohere and Gemini models are working correctly.")
         else:
@@ -0,0 +1,130 @@
+"""
+Unit tests for rerank triage: candidate depth, skipping the rerank when the best hits stand out,
+the relative cutoff applied instead and the final selection, for similarity and fused (RRF) scores
+"""
+import math
+from types import SimpleNamespace
+import pytest
+from benchmarks.stubs import FakeCohereManager, FakeQdrantManager
+from config import Config
+from rag_service import RAGService, rerank_shortlist, select_unranked
+from reranker import candidate_depth, needs_rerank, relative_cutoff, select_results
+
+STANDOUT = [0.9, 0.88, 0.85, 0.4, 0.35, 0.3, 0.2, 0.1]
+FLAT = [0.9, 0.89, 0.88, 0.87, 0.86, 0.85, 0.84, 0.83, 0.82, 0.81]
+FUSED = [0.5, 0.33, 0.25, 0.2, 0.17]
+
+
+def hit(point_id: str, score: float = 0.0, content: str = "text"):
+    return SimpleNamespace(id=point_id, score=score, payload={"content": content, "source": "a.txt"})
+
+
+class RecordingReranker:
+    """Scores documents by a fixed table and records each call"""
+
+    def __init__(self, scores):
+        self.scores = scores
+        self.calls = []
+
+    def rerank(self, query, documents):
+        self.calls.append(list(documents))
+        return [self.scores[document] for document in documents]
+
+
+@pytest.fixture(autouse=True)
+def rerank_config(monkeypatch):
+    monkeypatch.setattr(Config, "RETRIEVAL_LIMIT", 3)
+    monkeypatch.setattr(Config, "RERANK_CANDIDATES", 8)
+    monkeypatch.setattr(Config, "RERANK_MIN_CANDIDATES", 4)
+    monkeypatch.setattr(Config, "RERANK_DEPTH_RATIO", 0.8)
+    monkeypatch.setattr(Config, "RERANK_SCORE_CUTOFF", 0.1)
+    monkeypatch.setattr(Config, "RERANK_TOKEN_BUDGET", 1000)
+
+
+def test_candidate_depth_follows_the_score_distribution():
+    # Three hits within the ratio, raised to the minimum
+    assert candidate_depth(STANDOUT) == 4
+    # Every hit is close to the best one, capped at RERANK_CANDIDATES
+    assert candidate_depth(FLAT) == 8
+    assert candidate_depth([0.9, 0.5]) == 2
+    assert candidate_depth([]) == 0
+
+
+def test_candidate_depth_keeps_every_fused_or_non_positive_candidate():
+    assert candidate_depth(FUSED, fused=True) == 5
+    assert candidate_depth(FLAT, fused=True) == 8
+    assert candidate_depth([0.0, -0.1, -0.2, -0.3, -0.4]) == 5
+
+
+def test_needs_rerank_only_when_more_than_the_limit_are_close():
+    assert not needs_rerank(STANDOUT)
+    assert needs_rerank(FLAT)
+    # No more candidates than are kept anyway
+    assert not needs_rerank(FLAT[:3])
+    assert not needs_rerank(FUSED[:3], fused=True)
+
+
+def test_needs_rerank_always_for_fused_or_non_positive_scores():
+    assert needs_rerank(FUSED, fused=True)
+    assert needs_rerank([0.0, 0.0, 0.0, 0.0])
+
+
+def test_relative_cutoff():
+    assert relative_cutoff(STANDOUT) == pytest.approx(0.72)
+    assert relative_cutoff(STANDOUT[:3]) == -math.inf
+    assert relative_cutoff(FUSED, fused=True) == -math.inf
+    # Below zero the ratio would raise the bar above the best score
+    assert relative_cutoff([-0.5, -0.6, -0.7, -0.8]) == -0.5
+
+
+def test_select_results_orders_by_score_and_applies_cutoff_and_limit():
+    results = [hit(f"p{i}") for i in range(5)]
+    selected = select_results(results, [0.3, 0.9, 0.05, 0.6, 0.2])
+    assert [result.id for result in selected] == ["p1", "p3", "p0"]
+    assert select_results(results, [0.3, 0.9, 0.05, 0.6, 0.2], cutoff=0.5) == [results[1], results[3]]
+
+
+def test_select_results_keeps_the_best_result_over_the_token_budget():
+    results = [hit("long", content="x" * 400), hit("short", content="y" * 40), hit("third", content="z" * 40)]
+    assert [result.id for result in select_results(results, [0.9, 0.8, 0.7], token_budget=50)] == ["long"]
+    assert [result.id for result in select_results(results, [0.7, 0.9, 0.8], token_budget=50)] == ["short", "third"]
+
+
+def test_shortlist_and_unranked_selection_without_fusion():
+    standout = [hit(f"p{i}", score) for i, score in enumerate(STANDOUT)]
+    assert rerank_shortlist(standout) is None
+    assert [result.id for result in select_unranked(standout)] == ["p0", "p1", "p2"]
+
+    flat = [hit(f"p{i}", score) for i, score in enumerate(FLAT)]
+    assert [result.id for result in rerank_shortlist(flat)] == [f"p{i}" for i in range(8)]
+
+
+def test_shortlist_and_unranked_selection_with_fusion():
+    fused = [hit(f"p{i}", score) for i, score in enumerate(FUSED)]
+    assert [result.id for result in rerank_shortlist(fused, fused=True)] == [f"p{i}" for i in range(5)]
+    # Only the first RETRIEVAL_LIMIT, however far apart their ranks
+    assert [result.id for result in select_unranked(fused[:3], fused=True)] == ["p0", "p1", "p2"]
+
+
+def search_service(scores, rerank_scores=None):
+    store = FakeQdrantManager(0)
+    store.insert_vectors([[1.0]] * len(scores), [{"content": f"chunk {i}", "source": "a.txt"} for i in range(len(scores))],
+                         [f"p{i}" for i in range(len(scores))])
+    for point, score in zip(store.points.values(), scores):
+        point.score = score
+    service = RAGService(store, FakeCohereManager(0, 0), embedding_manager=FakeCohereManager(0, 0))
+    service.reranker = RecordingReranker(rerank_scores or {})
+    return service
+
+
+def test_search_skips_the_rerank_when_the_best_hits_stand_out():
+    service = search_service(STANDOUT)
+    assert [result.id for result in service.search("query", [1.0])] == ["p0", "p1", "p2"]
+    assert service.reranker.calls == []
+
+
+def test_search_reranks_a_flat_shortlist():
+    # The reranker reverses the retrieval order within the shortlist
+    service = search_service(FLAT, {f"chunk {i}": i / 10 for i in range(len(FLAT))})
+    assert [result.id for result in service.search("query", [1.0])] == ["p7", "p6", "p5"]
+    assert service.reranker.calls == [[f"chunk {i}" for i in range(8)]]
@@ -0,0 +1,135 @@
+"""
+Unit tests for SemanticAnswerCache: similarity threshold, scoping, expiry and invalidation
+"""
+import numpy as np
+import pytest
+import semantic_cache
+from benchmarks.stubs import FakeCohereManager, FakeQdrantManager
+from rag_service import RAGService, filter_scope
+from semantic_cache import SemanticAnswerCache
+
+
+def rotated(angle: float, dimension: int = 4):
+    """A unit vector whose cosine similarity with [1, 0, ...] is cos(angle)"""
+    vector = [0.0] * dimension
+    vector[0], vector[1] = np.cos(angle), np.sin(angle)
+    return vector
+
+
+QUERY = rotated(0.0)
+
+
+def test_lookup_hits_only_above_the_threshold():
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=10, ttl=0)
+    cache.store(QUERY, "answer", ["a.txt"], ["p1"])
+
+    assert cache.lookup(rotated(np.arccos(0.95))).answer == "answer"
+    assert cache.lookup(rotated(np.arccos(0.85))) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lookup_returns_the_most_similar_entry():
+    cache = SemanticAnswerCache(threshold=0.5, max_entries=10, ttl=0)
+    cache.store(rotated(0.5), "farther", ["a.txt"], ["p1"])
+    cache.store(rotated(0.1), "closer", ["a.txt"], ["p2"])
+
+    assert cache.lookup(QUERY).answer == "closer"
+
+
+def test_entries_are_scoped_by_tenant_filters():
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=10, ttl=0)
+    acme = filter_scope({"tenant": "acme"})
+    cache.store(QUERY, "acme answer", ["a.txt"], ["p1"], scope=acme)
+
+    assert cache.lookup(QUERY, scope=acme).answer == "acme answer"
+    assert cache.lookup(QUERY, scope=filter_scope({"tenant": "globex"})) is None
+    assert cache.lookup(QUERY, scope=filter_scope(None)) is None
+    # The scope doesn't depend on the order filters were given in
+    assert filter_scope({"tenant": "acme", "sources": ["a.txt"]}) == filter_scope({"sources": ["a.txt"], "tenant": "acme"})
+
+
+def test_entries_are_scoped_by_provider():
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=10, ttl=0)
+    cache.store(QUERY, "gemini answer", ["a.txt"], ["p1"], provider="gemini")
+
+    assert cache.lookup(QUERY, provider="cohere") is None
+    assert cache.lookup(QUERY, provider="gemini").answer == "gemini answer"
+
+
+class FailingGeminiManager:
+    def generate_response(self, prompt, history=None):
+        raise Exception("gemini is down")
+
+
+def test_fallback_answer_is_cached_under_the_provider_that_answered():
+    store = FakeQdrantManager(0)
+    store.insert_vectors([QUERY], [{"content": "RAG retrieves passages.", "source": "a.txt"}], ["p1"])
+    service = RAGService(store, FakeCohereManager(0, 0), FailingGeminiManager(), FakeCohereManager(0, 0))
+    service.answer_cache = SemanticAnswerCache(threshold=0.99, max_entries=10, ttl=0)
+
+    answer, _ = service.retrieve_and_generate("What is RAG?", use_gemini=True)
+    embedding = service.embed_query("What is RAG?")
+    assert service.answer_cache.lookup(embedding, provider="cohere").answer == answer
+    # A request preferring Gemini gets a fresh answer, not Cohere's
+    assert service.answer_cache.lookup(embedding, provider="gemini") is None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(semantic_cache.time, "time", lambda: now[0])
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=10, ttl=60)
+    cache.store(QUERY, "answer", ["a.txt"], ["p1"])
+
+    now[0] += 61
+    assert cache.lookup(QUERY) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_oldest_entry_is_evicted_when_full():
+    cache = SemanticAnswerCache(threshold=0.99, max_entries=2, ttl=0)
+    for i, angle in enumerate((0.0, 0.5, 1.0)):
+        cache.store(rotated(angle), f"answer {i}", ["a.txt"], [f"p{i}"])
+
+    assert cache.lookup(rotated(0.0)) is None
+    assert cache.lookup(rotated(0.5)).answer == "answer 1"
+    assert cache.lookup(rotated(1.0)).answer == "answer 2"
+
+
+def test_invalidate_by_source_and_by_point_id():
+    cache = SemanticAnswerCache(threshold=0.99, max_entries=10, ttl=0)
+    cache.store(rotated(0.0), "from a", ["a.txt"], ["p1", "p2"])
+    cache.store(rotated(0.5), "from b", ["b.txt"], ["p3"])
+    cache.store(rotated(1.0), "from a and b", ["a.txt", "b.txt"], ["p2", "p4"])
+
+    assert cache.invalidate_point_ids(["p1"]) == 1
+    assert cache.lookup(rotated(0.0)) is None
+    assert cache.lookup(rotated(1.0)) is not None
+
+    assert cache.invalidate_sources(["b.txt"]) == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_changing_embedding_dimension_clears_the_cache():
+    cache = SemanticAnswerCache(threshold=0.9, max_entries=10, ttl=0)
+    cache.store(QUERY, "answer", ["a.txt"], ["p1"])
+
+    assert cache.lookup(rotated(0.0, dimension=8)) is None
+    cache.store(rotated(0.0, dimension=8), "new answer", ["a.txt"], ["p1"])
+    assert cache.stats()["entries"] == 1
+    assert cache.lookup(rotated(0.0, dimension=8)).answer == "new answer"
+
+
+@pytest.mark.parametrize("removed,added,remaining", [
+    (["p2"], 0, ["from b"]),             # a chunk an answer cited was removed
+    (["p9"], 0, ["from a", "from b"]),   # only chunks no answer cited were removed
+    ([], 1, ["from b"]),                 # the document gained chunks
+])
+def test_reupload_invalidates_stale_answers(removed, added, remaining):
+    service = RAGService(FakeQdrantManager(0), FakeCohereManager(0, 0), embedding_manager=FakeCohereManager(0, 0))
+    service.answer_cache = SemanticAnswerCache(threshold=0.99, max_entries=10, ttl=0)
+    service.answer_cache.store(rotated(0.0), "from a", ["a.txt"], ["p1", "p2"])
+    service.answer_cache.store(rotated(1.0), "from b", ["b.txt"], ["p3"])
+
+    service._stored("a.txt", {"p1"}, added, removed)
+    cached = [service.answer_cache.lookup(rotated(angle)) for angle in (0.0, 1.0)]
+    assert [entry.answer for entry in cached if entry is not None] == remaining
@@ -0,0 +1,252 @@
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+from config import Config
+from sparse_encoder import SparseVector
+
+logger = logging.getLogger(__name__)
+
+# One search of a batch: (query_vector, limit, sparse_query, filters)
+SearchRequest = Tuple[List[float], int, Optional[SparseVector], Optional[Dict[str, Any]]]
+
+
+class ScoredPoint(NamedTuple):
+    """A search hit of a store other than Qdrant, with the same fields the service reads from Qdrant's"""
+    id: str
+    score: float
+    payload: Dict[str, Any]
+
+
+class VectorStore(ABC):
+    """
+    Storage and search of the chunk vectors and payloads: QdrantManager (a Qdrant server) or
+    LocalVectorStore (an embedded index). Searches return hits with id, score and payload, best
+    first; filters are a request's search filters ("tenant", "sources", "uploaded_after",
+    "uploaded_before"), with a tenant of None meaning the points stored without one.
+    """
+    collection_name: str
+    # Whether BM25 sparse vectors are stored and searched alongside the dense ones
+    sparse_enabled: bool
+
+    @abstractmethod
+    def create_collection(self):
+        """Create the collection if it doesn't exist, or open the existing one"""
+
+    @abstractmethod
+    def insert_vectors(self, vectors: List[List[float]], payloads: List[Dict[str, Any]], ids: List[str],
+                       sparse_vectors: Optional[List[SparseVector]] = None):
+        """Insert or overwrite points"""
+
+    @abstractmethod
+    def search_vectors(self, query_vector: List[float], limit: int = 5, sparse_query: Optional[SparseVector] = None,
+                       filters: Optional[Dict[str, Any]] = None) -> list:
+        """Search the dense vectors (fused with BM25 when sparse_query is given), best hits first"""
+
+    @abstractmethod
+    def search_batch(self, requests: List[SearchRequest]) -> List[list]:
+        """Run several (query_vector, limit, sparse_query, filters) searches at once"""
+
+    @abstractmethod
+    def get_source_point_ids(self, source: str, tenant: Optional[str] = None) -> Set[str]:
+        """Return the IDs of all points stored for a tenant's source (its chunk manifest)"""
+
+    @abstractmethod
+    def set_payload(self, ids: List[str], payloads: List[Dict[str, Any]]):
+        """Merge fields into the payloads of existing points, keeping their vectors"""
+
+    @abstractmethod
+    def delete_points(self, ids: List[str]):
+        """Delete points by ID"""
+
+    @abstractmethod
+    def delete_collection(self):
+        """Delete the collection and every point in it"""
+
+    @abstractmethod
+    def get_collection_info(self):
+        """Information about the collection, including its points_count, or None if it can't be read"""
+
+    def close(self):
+        """Release what the store holds open (shared clients are closed by their owner)"""
+
+
+class AsyncVectorStore(ABC):
+    """Asyncio counterpart of VectorStore, with the same methods as coroutines"""
+    collection_name: str
+    sparse_enabled: bool
+
+    def __init__(self):
+        self._info_cache: Optional[Tuple[float, Any]] = None
+        self._info_lock = asyncio.Lock()
+
+    @abstractmethod
+    async def create_collection(self):
+        ...
+
+    @abstractmethod
+    async def insert_vectors(self, vectors: List[List[float]], payloads: List[Dict[str, Any]], ids: List[str],
+                             sparse_vectors: Optional[List[SparseVector]] = None):
+        ...
+
+    @abstractmethod
+    async def search_vectors(self, query_vector: List[float], limit: int = 5, sparse_query: Optional[SparseVector] = None,
+                             filters: Optional[Dict[str, Any]] = None) -> list:
+        ...
+
+    @abstractmethod
+    async def search_batch(self, requests: List[SearchRequest]) -> List[list]:
+        ...
+
+    @abstractmethod
+    async def get_source_point_ids(self, source: str, tenant: Optional[str] = None) -> Set[str]:
+        ...
+
+    @abstractmethod
+    async def set_payload(self, ids: List[str], payloads: List[Dict[str, Any]]):
+        ...
+
+    @abstractmethod
+    async def delete_points(self, ids: List[str]):
+        ...
+
+    @abstractmethod
+    async def delete_collection(self):
+        ...
+
+    @abstractmethod
+    async def get_collection_info(self):
+        ...
+
+    async def get_cached_collection_info(self, max_age: float = None):
+        """
+        Collection info at most max_age seconds old (HEALTH_CACHE_TTL by default). Concurrent
+        callers share one refresh, so frequent health probes cost at most one lookup per interval.
+        """
+        max_age = Config.HEALTH_CACHE_TTL if max_age is None else max_age
+        async with self._info_lock:
+            if self._info_cache is None or time.monotonic() - self._info_cache[0] > max_age:
+                self._info_cache = (time.monotonic(), await self.get_collection_info())
+            return self._info_cache[1]
+
+    @property
+    def ready(self) -> bool:
+        """Whether the store can answer without waiting (see DeferredVectorStore)"""
+        return True
+
+    async def close(self):
+        pass
+
+
+class DeferredVectorStore(AsyncVectorStore):
+    """
+    An AsyncVectorStore opened in the background, so a worker starts serving without waiting for
+    it: open() runs opener, which builds the store (e.g. importing its client library) and creates
+    or opens its collection. Calls made before that has finished wait for it. If opening fails,
+    they raise its error, and it is tried again by the next call or after retry_seconds.
+    """
+
+    def __init__(self, opener: Callable[[], Awaitable[AsyncVectorStore]], retry_seconds: float = 5.0,
+                 sparse_enabled: bool = False):
+        super().__init__()
+        self._opener = opener
+        self.retry_seconds = retry_seconds
+        # Whether the store is expected to keep sparse vectors, until it is open and can tell
+        self._sparse_enabled = sparse_enabled
+        self._store: Optional[AsyncVectorStore] = None
+        self._opening: Optional[asyncio.Task] = None
+        self._retry: Optional[asyncio.TimerHandle] = None
+        self._closed = False
+
+    def open(self) -> asyncio.Task:
+        """Start opening the store, if it isn't open or opening already (needs the running event loop)"""
+        if self._opening is None:
+            self._opening = asyncio.ensure_future(self._open())
+            # Failures are logged by _open; callers waiting for it get them too
+            self._opening.add_done_callback(lambda task: task.cancelled() or task.exception())
+        return self._opening
+
+    async def _open(self):
+        try:
+            self._store = await self._opener()
+        except Exception as e:
+            self._opening = None
+            if not self._closed:
+                logger.error(f"Opening the vector store failed, retrying in {self.retry_seconds:g}s: {str(e)}")
+                self._retry = asyncio.get_running_loop().call_later(self.retry_seconds, self.open)
+            raise
+        except BaseException:
+            self._opening = None
+            raise
+
+    async def _get(self) -> AsyncVectorStore:
+        if self._store is None:
+            # Shielded: a caller giving up (e.g. a cancelled request) doesn't cancel the opening
+            await asyncio.shield(self.open())
+        return self._store
+
+    @property
+    def ready(self) -> bool:
+        return self._store is not None
+
+    @property
+    def sparse_enabled(self) -> bool:
+        return self._store.sparse_enabled if self._store is not None else self._sparse_enabled
+
+    async def create_collection(self):
+        await self._get()
+
+    async def insert_vectors(self, vectors: List[List[float]], payloads: List[Dict[str, Any]], ids: List[str],
+                             sparse_vectors: Optional[List[SparseVector]] = None):
+        await (await self._get()).insert_vectors(vectors, payloads, ids, sparse_vectors)
+
+    async def search_vectors(self, query_vector: List[float], limit: int = 5, sparse_query: Optional[SparseVector] = None,
+                             filters: Optional[Dict[str, Any]] = None) -> list:
+        return await (await self._get()).search_vectors(query_vector, limit, sparse_query, filters)
+
+    async def search_batch(self, requests: List[SearchRequest]) -> List[list]:
+        return await (await self._get()).search_batch(requests)
+
+    async def get_source_point_ids(self, source: str, tenant: Optional[str] = None) -> Set[str]:
+        return await (await self._get()).get_source_point_ids(source, tenant)
+
+    async def set_payload(self, ids: List[str], payloads: List[Dict[str, Any]]):
+        await (await self._get()).set_payload(ids, payloads)
+
+    async def delete_points(self, ids: List[str]):
+        await (await self._get()).delete_points(ids)
+
+    async def delete_collection(self):
+        await (await self._get()).delete_collection()
+
+    async def get_collection_info(self):
+        return await (await self._get()).get_collection_info()
+
+    async def close(self):
+        self._closed = True
+        if self._retry is not None:
+            self._retry.cancel()
+        if self._opening is not None and not self._opening.done():
+            self._opening.cancel()
+        if self._store is not None:
+            await self._store.close()
+
+
+def sparse_supported() -> bool:
+    """Whether the store selected by Config.VECTOR_STORE keeps BM25 sparse vectors (the local index doesn't)"""
+    return Config.HYBRID_SEARCH and Config.VECTOR_STORE == "qdrant"
+
+
+def get_vector_store(client=None, asynchronous: bool = False):
+    """
+    Return the vector store selected by Config.VECTOR_STORE: "qdrant", using client when given
+    (a shared QdrantClient or AsyncQdrantClient), or "local" for the embedded index
+    """
+    if Config.VECTOR_STORE == "qdrant":
+        from qdrant_manager import QdrantManager, AsyncQdrantManager
+        return AsyncQdrantManager(client) if asynchronous else QdrantManager(client)
+    if Config.VECTOR_STORE == "local":
+        from local_vector_store import LocalVectorStore, AsyncLocalVectorStore
+        return AsyncLocalVectorStore() if asynchronous else LocalVectorStore()
+    raise ValueError(f"Unknown vector store: {Config.VECTOR_STORE}")